@@ -0,0 +1 @@
+"""Reproducible benchmarks for every processing path (`python -m benchmarks.run --help`)."""
@@ -0,0 +1,225 @@
+# benchmarks/pages.py
+"""
+Page latency: cold start, upload and rerun after a widget change, per page.
+
+    python -m benchmarks.pages                          # every page, default upload size
+    python -m benchmarks.pages --pages configurator --conversations 2000 --reruns 10
+    python -m benchmarks.pages --save-baseline          # record benchmarks/pages_baseline.json
+
+Every page runs in a fresh interpreter under Streamlit's AppTest, `--repeat`
+times (best run reported). A run executes the whole script, so each time is
+from the interaction to the last element sent, except for paint:
+
+- paint: in the first run, the time until the page's first element is sent
+  (what a user of a new server process waits for before the page appears),
+- start: the whole first run with nothing uploaded, imports included,
+- upload: the run after a synthetic CSV is uploaded (reading, previews),
+- columns: the run after the input columns are picked,
+- rerun: the median run after switching the download format, which changes no
+  input: the fixed cost every interaction pays once the caches are warm.
+
+"heavy" lists the heavy libraries (pandas, pyarrow, numpy) the start run
+imported; pages load them after drawing their uploader, so they show up here
+but not in paint. With a baseline,
+any time above the tolerance is reported and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "pages_baseline.json")
+HEAVY_MODULES = ("pandas", "pyarrow", "numpy")
+STAGES = ("paint", "start", "upload", "columns", "rerun")
+
+# page -> (script, widget label prefix -> value picked after the upload)
+PAGES = {
+    "sentence_tokenizer_basic": ("streamlit_app.py", {
+        "Select ID column": "ID", "Select Text column": "Text", "Select Speaker column": "Speaker"}),
+    "sentence_tokenizer": ("pages/sentence_tokenizer_app.py", {
+        "Select **ID**": "ID", "Select **Text**": "Text", "Select **Speaker**": "Speaker"}),
+    "rolling_context": ("pages/rolling_context_app.py", {
+        "Select ID Column": "ID", "Select Text Column": "Text", "Select Speaker Column": "Speaker"}),
+    "configurator": ("pages/3_🔧_Preprocessing_Configurator.py", {
+        "ID column": "ID", "Text / Statement column": "Text", "Turn column": "Turn", "Speaker column": "Speaker"}),
+    "csv_joiner": ("pages/join_table_app.py", {
+        "Select join key from FIRST": "ID", "Select join key from SECOND": "user_id"}),
+}
+
+
+# -----------------------
+# Worker: one page in this interpreter
+# -----------------------
+def _uploads(page: str, args) -> list:
+    """(file name, CSV bytes, mime) for every uploader of the page, in order."""
+    from benchmarks.synth import make_chats, make_join_tables
+
+    def csv(name, df):
+        return (name, df.to_csv(index=False).encode("utf-8"), "text/csv")
+
+    if page == "csv_joiner":
+        left, right = make_join_tables(args.conversations * 20, max(1, args.conversations * 4), seed=args.seed)
+        return [csv("left.csv", left), csv("right.csv", right)]
+    return [csv("chats.csv", make_chats(args.conversations, seed=args.seed))]
+
+
+def _widget(at, label: str):
+    for kind in ("selectbox", "radio", "multiselect", "toggle", "number_input"):
+        for w in getattr(at, kind):
+            if w.label.startswith(label):
+                return w
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+_first_delta = []  # send time of the first element of the current run
+
+
+def _record_first_delta(enqueue):
+    def wrapper(ctx, msg):
+        if not _first_delta and msg.HasField("delta"):
+            _first_delta.append(time.perf_counter())
+        return enqueue(ctx, msg)
+    return wrapper
+
+
+def _timed_run(at) -> tuple[float, float]:
+    """(seconds for the whole run, seconds until its first element was sent)."""
+    _first_delta.clear()
+    t0 = time.perf_counter()
+    at.run()
+    seconds = time.perf_counter() - t0
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return seconds, (_first_delta[0] if _first_delta else t0 + seconds) - t0
+
+
+def measure_page(page: str, args) -> dict:
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+    from streamlit.testing.v1 import AppTest, local_script_runner
+
+    # a server compiles each page once per process; AppTest would on every run
+    shared = ScriptCache()
+    local_script_runner.ScriptCache = lambda: shared
+    ScriptRunContext.enqueue = _record_first_delta(ScriptRunContext.enqueue)
+
+    script, columns = PAGES[page]
+    heavy_before = {m for m in HEAVY_MODULES if m in sys.modules}
+    at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=args.timeout)
+    times = {}
+    times["start"], times["paint"] = _timed_run(at)
+    heavy = [m for m in HEAVY_MODULES if m in sys.modules and m not in heavy_before]
+
+    uploads = _uploads(page, args)
+    for uploader, upload in zip(at.file_uploader, uploads):
+        uploader.set_value(upload)
+    times["upload"] = _timed_run(at)[0]
+    for label, value in columns.items():
+        _widget(at, label).set_value(value)
+    times["columns"] = _timed_run(at)[0]
+
+    formats = ("Parquet", "CSV")
+    reruns = []
+    for i in range(args.reruns):
+        _widget(at, "Download format").set_value(formats[i % 2])
+        reruns.append(_timed_run(at)[0])
+    times["rerun"] = statistics.median(reruns)
+    return {"page": page, **{s: round(times[s], 4) for s in STAGES}, "heavy": heavy}
+
+
+# -----------------------
+# Driver: every page in a fresh interpreter
+# -----------------------
+def _run_worker(page: str, args) -> dict:
+    cmd = [sys.executable, "-m", "benchmarks.pages", "--worker", page,
+           "--conversations", str(args.conversations), "--reruns", str(args.reruns),
+           "--seed", str(args.seed), "--timeout", str(args.timeout)]
+    done = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    if done.returncode != 0:
+        raise RuntimeError(f"{page} failed:\n{done.stderr.strip()}")
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+
+def measure(page: str, args) -> dict:
+    runs = [_run_worker(page, args) for _ in range(args.repeat)]
+    best = {s: min(r[s] for r in runs) for s in STAGES}
+    return {"page": page, "rows": args.conversations, **best, "heavy": runs[0]["heavy"]}
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """Regression messages for (page, stage) times slower than the baseline allows."""
+    base = {(r["page"], r["rows"]): r for r in baseline}
+    problems = []
+    for r in results:
+        b = base.get((r["page"], r["rows"]))
+        if b is None:
+            continue
+        for stage in STAGES:
+            # a few milliseconds of slack: the fastest stages are at timer-noise level
+            if r[stage] > b[stage] * (1 + tolerance) + 0.005:
+                problems.append(f"{r['page']} {stage}: {r[stage]:.3f}s vs baseline {b[stage]:.3f}s")
+    return problems
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m benchmarks.pages", description=__doc__.strip().splitlines()[0])
+    p.add_argument("--pages", nargs="+", choices=list(PAGES), default=list(PAGES))
+    p.add_argument("--conversations", type=int, default=500, help="size of the synthetic upload")
+    p.add_argument("--reruns", type=int, default=5, help="widget changes timed for the rerun median")
+    p.add_argument("--repeat", type=int, default=3, help="fresh interpreters per page (best run reported)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--timeout", type=float, default=120, help="seconds allowed per script run")
+    p.add_argument("--worker", choices=list(PAGES), help=argparse.SUPPRESS)
+    p.add_argument("--output", help="write the results as JSON to this path")
+    p.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against (if it exists)")
+    p.add_argument("--save-baseline", action="store_true", help="write the results to --baseline instead of comparing")
+    p.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    return p
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.worker:
+        print(json.dumps(measure_page(args.worker, args)))
+        return 0
+
+    results = []
+    print(f"{'page':<26}" + "".join(f"{s:>9}" for s in STAGES) + "  heavy at start")
+    for page in args.pages:
+        r = measure(page, args)
+        results.append(r)
+        print(f"{page:<26}" + "".join(f"{r[s]:>9.3f}" for s in STAGES) + f"  {', '.join(r['heavy']) or '-'}",
+              flush=True)
+
+    report = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                 "args": {k: v for k, v in vars(args).items()
+                          if k not in ("output", "baseline", "save_baseline", "worker")}},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nbaseline saved to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            problems = compare(results, json.load(fh)["results"], args.tolerance)
+        if problems:
+            print("\nREGRESSIONS vs baseline:\n  " + "\n  ".join(problems))
+            return 1
+        print("\nno regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
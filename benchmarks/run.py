@@ -0,0 +1,310 @@
+# benchmarks/run.py
+"""
+Benchmark every processing path on synthetic conversations.
+
+    python -m benchmarks.run                          # all cases, default scales
+    python -m benchmarks.run --cases rolling join_inner --scales 500 2000 8000
+    python -m benchmarks.run --save-baseline          # record benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.25
+
+Each case is timed `--repeat` times (best run reported, the per-text memo
+cleared before every run so repeats measure cold runs) and then run once more
+under tracemalloc for its peak Python/numpy allocation. Throughput is input
+rows per second. The scaling exponent is the log-log slope of time against
+input size between the smallest and largest scale (1 = linear, 2 = quadratic).
+With a baseline, any case slower or hungrier than the tolerance allows is
+reported and the exit status is 1.
+"""
+import argparse
+import gc
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synth import make_chats, make_join_tables, make_posts
+from core.cache import TEXT_MEMO
+from core.join import join_frames, key_counts, partitioned_join, preflight
+from core.joinplan import execute_plan, plan_joins
+from core.keysketch import sketch_keys, sketch_preflight
+from core.preprocess import build_sweep, select_builder
+from core.rolling import rolling_context, rolling_context_sweep
+from core.spool import UploadSpool
+from core.streaming import iter_frame_batches, spooled_writer
+from core.tableio import read_table
+from core.tokenizer import tokenize_frame
+
+DEFAULT_SCALES = [250, 1_000, 4_000]  # conversations
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+# -----------------------
+# Cases: setup(scale, args) -> data; run(data) -> output rows
+# -----------------------
+def _chats(scale, args):
+    return make_chats(scale, args.turns_per_chat, args.sentences_per_turn, args.sentence_len,
+                      args.hashtag_density, args.speakers, args.seed)
+
+
+def _posts(scale, args):
+    # about as many rows as the chat cases at the same scale
+    return make_posts(scale * args.turns_per_chat, args.sentences_per_turn + 1, args.sentence_len,
+                      args.hashtag_density, args.seed)
+
+
+def _reposts(scale, args):
+    # same size as _posts, with a `--repost-share` of the texts repeated
+    return make_posts(scale * args.turns_per_chat, args.sentences_per_turn + 1, args.sentence_len,
+                      args.hashtag_density, args.seed, repost_share=args.repost_share)
+
+
+def _join_tables(scale, args):
+    n_left = scale * args.turns_per_chat
+    return make_join_tables(n_left, max(1, n_left // 5), seed=args.seed)
+
+
+class _Upload(io.BytesIO):
+    """A table as an uploaded CSV file; len() is its row count."""
+
+    def __init__(self, df):
+        super().__init__(df.to_csv(index=False).encode("utf-8"))
+        self.name = "chats.csv"
+        self.size = self.getbuffer().nbytes
+        self.rows = len(df)
+
+    def __len__(self):
+        return self.rows
+
+
+def _rolled(scale, args):
+    df = _chats(scale, args)
+    return rolling_context(df, "ID", "Text", 3, speaker_col="Speaker", speakers=df["Speaker"].unique())
+
+
+def _write(fmt):
+    def run(df):
+        return spooled_writer(fmt, preview_rows=0).write_all(iter_frame_batches(df)).rows
+    return run
+
+
+def _chats_upload(scale, args):
+    return _Upload(_chats(scale, args))
+
+
+_SPOOL = UploadSpool(os.path.join(tempfile.gettempdir(), "pa7_bench_spool"))
+
+
+def _read_spooled(upload):
+    """Spool the upload and read it memory-mapped, as the pages do."""
+    try:
+        return len(read_table(_SPOOL.spool(upload, "bench", "upload")))
+    finally:
+        _SPOOL.release_session("bench")
+
+
+def _configurator(data_type, statement_cut, whole_context=False, context_budget=None):
+    def run(df):
+        builder, params = select_builder(
+            data_type, statement_cut, "ID", "Text",
+            turn_col="Turn" if data_type == "chat" else None,
+            speaker_col="Speaker" if data_type == "chat" else None,
+            rolling_N=2, whole_context=whole_context, context_budget=context_budget,
+        )
+        return len(builder(df, **params).to_frame())  # export joins every context
+    return run
+
+
+def _sweep(df):
+    builder, params = select_builder("chat", "sentence", "ID", "Text", turn_col="Turn", speaker_col="Speaker")
+    return len(build_sweep(df, builder, range(1, 11), **params))
+
+
+def _out_of_core(tables):
+    left, right = tables
+    sources = [io.BytesIO(t.to_csv(index=False).encode("utf-8")) for t in tables]
+    return sum(len(b) for b in partitioned_join(*sources, "ID", "user_id", how="inner"))
+
+
+def _preflight(tables):
+    left, right = tables
+    return preflight(key_counts(left["ID"]), key_counts(right["user_id"]))["rows"]["inner"]
+
+
+def _sketch_preflight(tables):
+    left, right = tables
+    return sketch_preflight(sketch_keys(left["ID"]), sketch_keys(right["user_id"]))["rows"]["inner"]
+
+
+def _join_chain(tables):
+    """left ⋈ right ⋈ per-key labels, planned and run in memory."""
+    left, right = tables
+    labels = pd.DataFrame({"key": right["user_id"].unique()})
+    labels["label"] = np.arange(len(labels)) % 7
+    frames = [left, right, labels]
+    specs = [{"left": 0, "left_key": "ID", "right": 1, "right_key": "user_id", "how": "inner"},
+             {"left": 1, "left_key": "user_id", "right": 2, "right_key": "key", "how": "inner"}]
+    counts = {(s[t], s[f"{t}_key"]): key_counts(frames[s[t]][s[f"{t}_key"]]) for s in specs for t in ("left", "right")}
+    steps = plan_joins(counts, [len(f) for f in frames], specs, ["left", "right", "labels"])
+    return len(execute_plan(frames, steps, ["left", "right", "labels"]))
+
+
+CASES = {
+    "tokenize_basic": (_chats, lambda df: len(tokenize_frame(df, "ID", "Text", rules="basic"))),
+    "tokenize_page": (_chats, lambda df: len(tokenize_frame(df, "ID", "Text", "Speaker", rules="page",
+                                                            speakers=["speaker_0"]))),
+    "rolling": (_chats, lambda df: len(rolling_context(df, "ID", "Text", 3, speaker_col="Speaker",
+                                                       speakers=df["Speaker"].unique()))),
+    "rolling_sweep": (_chats, lambda df: len(rolling_context_sweep(df, "ID", "Text", range(1, 11)))),
+    "chat_sentence_rolling": (_chats, _configurator("chat", "sentence")),
+    "chat_sentence_whole": (_chats, _configurator("chat", "sentence", whole_context=True)),
+    "chat_sentence_budget": (_chats, _configurator("chat", "sentence", whole_context=True, context_budget=500)),
+    "chat_turn_rolling": (_chats, _configurator("chat", "turn")),
+    "chat_sentence_sweep": (_chats, _sweep),
+    "post_sentence": (_posts, _configurator("post", "sentence")),
+    "post_post": (_posts, _configurator("post", "turn")),
+    "post_sentence_reposts": (_reposts, _configurator("post", "sentence")),
+    "tokenize_reposts": (_reposts, lambda df: len(tokenize_frame(df, "ID", "Text", rules="page"))),
+    "join_preflight": (_join_tables, _preflight),
+    "join_preflight_sketch": (_join_tables, _sketch_preflight),
+    "join_inner": (_join_tables, lambda t: len(join_frames(*t, "ID", "user_id", how="inner"))),
+    "join_out_of_core": (_join_tables, _out_of_core),
+    "join_chain": (_join_tables, _join_chain),
+    "read_upload": (_chats_upload, lambda upload: len(read_table(upload))),
+    "read_spooled": (_chats_upload, _read_spooled),
+    "write_csv": (_rolled, _write("CSV")),
+    "write_csv_gzip": (_rolled, _write("CSV (gzip)")),
+    "write_csv_zstd": (_rolled, _write("CSV (zstd)")),
+}
+
+
+def _input_rows(data) -> int:
+    return sum(len(t) for t in data) if isinstance(data, tuple) else len(data)
+
+
+def measure(case: str, scale: int, args) -> dict:
+    setup, run = CASES[case]
+    data = setup(scale, args)
+    best = math.inf
+    for _ in range(args.repeat):
+        TEXT_MEMO.clear()
+        gc.collect()
+        t0 = time.perf_counter()
+        out_rows = run(data)
+        best = min(best, time.perf_counter() - t0)
+
+    TEXT_MEMO.clear()
+    gc.collect()
+    tracemalloc.start()
+    run(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n = _input_rows(data)
+    return {
+        "case": case, "scale": scale, "input_rows": n, "output_rows": int(out_rows),
+        "seconds": round(best, 4), "rows_per_s": round(n / best) if best else None,
+        "peak_mb": round(peak / 2**20, 1),
+    }
+
+
+# -----------------------
+# Reporting
+# -----------------------
+def scaling_exponents(results: list[dict]) -> dict:
+    """Log-log slope of seconds vs input rows between the smallest and largest scale, per case."""
+    out = {}
+    for case in dict.fromkeys(r["case"] for r in results):
+        rs = sorted((r for r in results if r["case"] == case), key=lambda r: r["input_rows"])
+        lo, hi = rs[0], rs[-1]
+        if hi["input_rows"] > lo["input_rows"] and lo["seconds"] > 0:
+            out[case] = round(math.log(hi["seconds"] / lo["seconds"]) / math.log(hi["input_rows"] / lo["input_rows"]), 2)
+    return out
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float, mem_tolerance: float) -> list[str]:
+    """Regression messages for (case, scale) pairs slower / larger than the baseline allows."""
+    base = {(r["case"], r["scale"]): r for r in baseline}
+    problems = []
+    for r in results:
+        b = base.get((r["case"], r["scale"]))
+        if b is None:
+            continue
+        if r["seconds"] > b["seconds"] * (1 + tolerance):
+            problems.append(f"{r['case']} @ {r['scale']}: {r['seconds']:.3f}s vs baseline {b['seconds']:.3f}s")
+        if r["peak_mb"] > b["peak_mb"] * (1 + mem_tolerance) + 1:
+            problems.append(f"{r['case']} @ {r['scale']}: peak {r['peak_mb']} MB vs baseline {b['peak_mb']} MB")
+        if r["output_rows"] != b["output_rows"]:
+            problems.append(f"{r['case']} @ {r['scale']}: {r['output_rows']} output rows vs baseline {b['output_rows']}")
+    return problems
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.strip().splitlines()[0])
+    p.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    p.add_argument("--scales", nargs="+", type=int, default=DEFAULT_SCALES, help="numbers of conversations")
+    p.add_argument("--turns-per-chat", type=int, default=20)
+    p.add_argument("--sentences-per-turn", type=int, default=3)
+    p.add_argument("--sentence-len", type=int, default=8, help="mean words per sentence")
+    p.add_argument("--hashtag-density", type=float, default=0.15, help="share of turns ending in hashtags")
+    p.add_argument("--speakers", type=int, default=2)
+    p.add_argument("--repost-share", type=float, default=0.6, help="share of repeated texts in the *_reposts cases")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--output", help="write the results as JSON to this path")
+    p.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against (if it exists)")
+    p.add_argument("--save-baseline", action="store_true", help="write the results to --baseline instead of comparing")
+    p.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    p.add_argument("--mem-tolerance", type=float, default=0.25, help="allowed peak-memory growth vs baseline")
+    return p
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    results = []
+    print(f"{'case':<24}{'scale':>7}{'in rows':>10}{'out rows':>11}{'seconds':>10}{'rows/s':>12}{'peak MB':>9}")
+    for case in args.cases:
+        for scale in sorted(args.scales):
+            r = measure(case, scale, args)
+            results.append(r)
+            print(f"{case:<24}{scale:>7}{r['input_rows']:>10,}{r['output_rows']:>11,}"
+                  f"{r['seconds']:>10.3f}{r['rows_per_s']:>12,}{r['peak_mb']:>9.1f}", flush=True)
+
+    exponents = scaling_exponents(results)
+    if exponents:
+        print("\nscaling exponent (1 = linear): " + ", ".join(f"{c} {e}" for c, e in exponents.items()))
+
+    report = {
+        "meta": {"python": platform.python_version(), "pandas": pd.__version__, "machine": platform.machine(),
+                 "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "save_baseline")}},
+        "results": results,
+        "scaling": exponents,
+    }
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nbaseline saved to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            problems = compare(results, json.load(fh)["results"], args.tolerance, args.mem_tolerance)
+        if problems:
+            print("\nREGRESSIONS vs baseline:\n  " + "\n  ".join(problems))
+            return 1
+        print("\nno regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
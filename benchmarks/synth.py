@@ -0,0 +1,101 @@
+# benchmarks/synth.py
+"""
+Synthetic conversations for the benchmarks.
+
+Everything is driven by one seeded numpy Generator, so the same arguments
+always give the same frame. Text looks like the chat/post exports the pages
+are used on: several sentences per turn ending in . ! or ?, optional
+trailing hashtags, the odd <br> and emoticon-only turn.
+"""
+import numpy as np
+import pandas as pd
+
+VOCAB = (
+    "hi thanks for reaching out i can help with that order refund account please let me "
+    "check the details sure what is your number it was charged twice yesterday okay great "
+    "we will send a new one today sorry about the delay no problem have a nice day"
+).split()
+TAGS = ["#help", "#refund", "#thanks", "#support", "#order", "#delay", "#fail", "#love"]
+ENDINGS = np.array([".", ".", ".", "!", "?", "..."])
+
+
+def _sentences(rng: np.random.Generator, n: int, sentence_len: int) -> np.ndarray:
+    """`n` sentences of about `sentence_len` words each."""
+    lengths = np.maximum(1, rng.poisson(sentence_len, n))
+    words = np.asarray(VOCAB, dtype=object)[rng.integers(0, len(VOCAB), int(lengths.sum()))]
+    bounds = np.cumsum(lengths)[:-1]
+    ends = ENDINGS[rng.integers(0, len(ENDINGS), n)]
+    return np.array([" ".join(w).capitalize() + e for w, e in zip(np.split(words, bounds), ends)], dtype=object)
+
+
+def make_texts(rng: np.random.Generator, n: int, sentences_per_text: int = 3, sentence_len: int = 8,
+               hashtag_density: float = 0.15) -> np.ndarray:
+    """`n` turn/post texts. `hashtag_density` is the share of texts that end in 1-3 hashtags."""
+    counts = np.maximum(1, rng.poisson(sentences_per_text, n))
+    sents = _sentences(rng, int(counts.sum()), sentence_len)
+    texts = np.array([" ".join(s) for s in np.split(sents, np.cumsum(counts)[:-1])], dtype=object)
+
+    tagged = np.flatnonzero(rng.random(n) < hashtag_density)
+    for i, k in zip(tagged, rng.integers(1, 4, len(tagged))):
+        texts[i] = texts[i] + " " + " ".join(rng.choice(TAGS, k))
+    for i in np.flatnonzero(rng.random(n) < 0.03):
+        texts[i] = texts[i].replace(". ", ".<br>", 1)
+    texts[rng.random(n) < 0.01] = ":)"
+    return texts
+
+
+def make_chats(n_conversations: int = 1_000, turns_per_chat: int = 20, sentences_per_turn: int = 3,
+               sentence_len: int = 8, hashtag_density: float = 0.15, n_speakers: int = 2,
+               seed: int = 0) -> pd.DataFrame:
+    """
+    Chat-style frame with columns ID, Turn, Speaker, Text. Turn counts vary around
+    `turns_per_chat`; speakers alternate within a conversation.
+    """
+    rng = np.random.default_rng(seed)
+    turns = np.maximum(1, rng.poisson(turns_per_chat, n_conversations))
+    ids = np.repeat(np.arange(1, n_conversations + 1), turns)
+    starts = np.repeat(np.cumsum(turns) - turns, turns)
+    turn_no = np.arange(len(ids)) - starts + 1
+    first = np.repeat(rng.integers(0, n_speakers, n_conversations), turns)
+    speakers = np.array([f"speaker_{i}" for i in range(n_speakers)], dtype=object)
+    return pd.DataFrame({
+        "ID": ids,
+        "Turn": turn_no,
+        "Speaker": speakers[(first + turn_no - 1) % n_speakers],
+        "Text": make_texts(rng, len(ids), sentences_per_turn, sentence_len, hashtag_density),
+    })
+
+
+def make_posts(n_posts: int = 10_000, sentences_per_post: int = 4, sentence_len: int = 10,
+               hashtag_density: float = 0.4, seed: int = 0, repost_share: float = 0.0,
+               n_templates: int = 500) -> pd.DataFrame:
+    """
+    Post-style frame with columns ID, Text (one row per post). A `repost_share` of the
+    posts repeat the text of one of `n_templates` posts (reposts, template replies).
+    """
+    rng = np.random.default_rng(seed)
+    texts = make_texts(rng, n_posts, sentences_per_post, sentence_len, hashtag_density)
+    reposts = np.flatnonzero(rng.random(n_posts) < repost_share)
+    texts[reposts] = texts[rng.integers(0, min(n_templates, n_posts), len(reposts))]
+    return pd.DataFrame({"ID": np.arange(1, n_posts + 1), "Text": texts})
+
+
+def make_join_tables(n_left: int = 100_000, n_keys: int = 20_000, right_per_key: float = 1.5,
+                     overlap: float = 0.8, seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Two tables for the Joiner: left has `n_left` rows over `n_keys` keys; right has
+    about `right_per_key` rows for each of a random `overlap` share of those keys
+    plus as many unmatched keys.
+    """
+    rng = np.random.default_rng(seed)
+    left = pd.DataFrame({"ID": rng.integers(0, n_keys, n_left), "Text": make_texts(rng, n_left, 2)})
+    shared = rng.choice(n_keys, int(n_keys * overlap), replace=False)
+    keys = np.concatenate([shared, np.arange(n_keys, n_keys + n_keys - len(shared))])
+    per_key = np.maximum(1, rng.poisson(right_per_key, len(keys)))
+    right_keys = np.repeat(keys, per_key)
+    right = pd.DataFrame({
+        "user_id": right_keys.astype(str),  # typed differently from the left key on purpose
+        "segment": rng.choice(["a", "b", "c"], len(right_keys)),
+        "score": rng.random(len(right_keys)),
+    })
+    return left, right
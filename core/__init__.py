@@ -0,0 +1 @@
+"""Shared processing code used by the Streamlit pages."""
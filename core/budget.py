@@ -0,0 +1,98 @@
+# core/budget.py
+"""
+Context windows bounded by a size budget instead of an item count.
+
+A context is items[start:end] of one group joined by spaces. With a budget,
+start is the earliest item of the group for which the joined context still
+fits: at most `budget` characters (separators included) or whitespace tokens.
+With prefix sums of the item sizes the cost of any window is one
+subtraction, and since start only moves forward as end does, the starts of
+all windows come from one vectorized binary search over the prefix sums
+(the two-pointer walk, done by numpy).
+
+`ContextSizes` collects the sizes of the produced contexts batch by batch,
+for the distribution shown after a build.
+"""
+import numpy as np
+import pandas as pd
+
+BUDGET_UNITS = ("chars", "tokens")
+MAX_BUDGET = 10_000_000
+SIZE_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _check_unit(unit: str) -> None:
+    if unit not in BUDGET_UNITS:
+        raise ValueError(f"Unknown budget unit {unit!r}; expected one of {BUDGET_UNITS}")
+
+
+def text_sizes(texts, unit: str = "chars") -> np.ndarray:
+    """Size of every text: characters, or whitespace-separated tokens."""
+    _check_unit(unit)
+    if unit == "chars":
+        return np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    return np.fromiter((len(t.split()) for t in texts), dtype=np.int64, count=len(texts))
+
+
+def budget_starts(items: list[str], group_start: np.ndarray, end: np.ndarray, budget: int,
+                  unit: str = "chars", min_items: int | np.ndarray = 0) -> np.ndarray:
+    """
+    Earliest start >= group_start for which " ".join(items[start:end]) fits the budget.
+    At least `min_items` items (per window or one for all) are kept even when they alone
+    exceed it (1: a statement is always part of its own context).
+    """
+    sizes = text_sizes(items, unit)
+    sep = 1 if unit == "chars" else 0  # a joining space is a character but not a token
+    # cost of items[s:e] = cum[e] - cum[s] - sep for e > s
+    cum = np.concatenate([[0], np.cumsum(sizes + sep)])
+    end = np.asarray(end, dtype=np.int64)
+    start = np.searchsorted(cum, cum[end] - sep - max(int(budget), 0), side="left")
+    start = np.minimum(start, end - min_items)
+    return np.maximum(start, np.asarray(group_start, dtype=np.int64))
+
+
+# -----------------------
+# Size distribution
+# -----------------------
+class ContextSizes:
+    """Sizes of the Context column(s) of result batches (Context, or Context_N<n> of a sweep)."""
+
+    def __init__(self, unit: str = "chars"):
+        _check_unit(unit)
+        self.unit = unit
+        self._sizes = {}  # column -> list of arrays
+
+    def observe(self, batch: pd.DataFrame) -> pd.DataFrame:
+        for col in batch.columns:
+            if col == "Context" or str(col).startswith("Context_N"):
+                texts = batch[col].to_numpy(dtype=object)
+                self._sizes.setdefault(col, []).append(text_sizes([str(t) for t in texts], self.unit))
+        return batch
+
+    def track(self, batches):
+        """Pass batches through, observing each."""
+        for batch in batches:
+            yield self.observe(batch)
+
+    def sizes(self) -> dict:
+        return {col: np.concatenate(parts) for col, parts in self._sizes.items()}
+
+    def summary(self) -> pd.DataFrame:
+        """One row per context column: contexts, mean, quantiles, max and total size."""
+        rows = []
+        for col, sizes in self.sizes().items():
+            row = {"column": col, "contexts": len(sizes), "mean": round(float(sizes.mean()), 1) if len(sizes) else 0}
+            for q in SIZE_QUANTILES:
+                row[f"p{int(q * 100)}"] = int(np.quantile(sizes, q)) if len(sizes) else 0
+            row.update(max=int(sizes.max()) if len(sizes) else 0, total=int(sizes.sum()))
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def histogram(self, column: str = None, bins: int = 20) -> pd.DataFrame:
+        """Contexts per size bin (labelled by its lower edge) for one column (default: the first)."""
+        sizes = self.sizes()
+        if not sizes:
+            return pd.DataFrame({"size": [], "contexts": []})
+        values = sizes[column or next(iter(sizes))]
+        counts, edges = np.histogram(values, bins=bins)
+        return pd.DataFrame({"size": edges[:-1].round().astype(np.int64), "contexts": counts})
@@ -0,0 +1,268 @@
+# core/cache.py
+"""
+Process-wide result cache that survives Streamlit reruns.
+
+Parsed uploads are keyed on the upload's content hash plus the parsing
+options; computed results on (input hash, function, all build parameters).
+Entries are evicted least-recently-used once either the entry limit or the
+memory budget is exceeded.
+
+`TEXT_MEMO` is a second, finer-grained cache for per-text results
+(segmentation, tokenization) keyed on the text itself, so reposts and
+template replies are split once per process however often they occur.
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core.tableio import read_table
+
+MAX_ENTRIES = 32
+MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+MEMO_ENTRIES = 500_000
+MEMO_CHARS = 100_000_000  # text + result characters held by the text memo
+HASH_MEMO_ENTRIES = 1024  # upload digests remembered (see content_hash)
+_HASH_BLOCK = 1024 * 1024
+
+
+def content_hash(source) -> str:
+    """Digest of an upload / file-like object's / file's bytes (position is restored to 0)."""
+    file_id = getattr(source, "file_id", None)
+    if file_id is not None:
+        digest = _HASH_MEMO.get(file_id)
+        if digest is not None:
+            return digest
+    h = hashlib.blake2b(digest_size=16)
+    if hasattr(source, "getbuffer"):
+        with source.getbuffer() as view:
+            h.update(view)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fh:
+            for block in iter(lambda: fh.read(_HASH_BLOCK), b""):
+                h.update(block)
+    else:
+        source.seek(0)
+        for block in iter(lambda: source.read(_HASH_BLOCK), b""):
+            h.update(block)
+        source.seek(0)
+    digest = h.hexdigest()
+    if file_id is not None:
+        _HASH_MEMO.put(file_id, digest)
+    return digest
+
+
+def make_key(*parts, **params) -> tuple:
+    """Hashable cache key from positional parts and keyword params (containers are frozen to tuples)."""
+    def freeze(v):
+        if isinstance(v, dict):
+            return tuple(sorted((k, freeze(x)) for k, x in v.items()))
+        if isinstance(v, (set, frozenset)):
+            return tuple(sorted(map(repr, v)))
+        if isinstance(v, (list, tuple)):
+            return tuple(freeze(x) for x in v)
+        return v
+    return tuple(parts) + tuple(sorted((k, freeze(v)) for k, v in params.items()))
+
+
+def estimate_size(value, _seen: set | None = None) -> int:
+    """
+    Approximate in-memory size of a cached value in bytes. An object held several times
+    within the value (e.g. a TEXT_MEMO result shared by repeated texts) counts once; one
+    shared with other entries or the memo counts in each, so the total is an upper bound.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    nbytes = getattr(value, "nbytes", None)  # numpy arrays, and our own result types report their size
+    if isinstance(nbytes, (int, np.integer)):
+        return int(nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v, seen) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v, seen) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Size-bounded LRU mapping with hit/miss counters. Values must be treated as read-only."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, size: int | None = None) -> None:
+        size = estimate_size(value) if size is None else size
+        with self._lock:
+            if key in self._data:
+                self.bytes -= self._data.pop(key)[1]
+            if size > self.max_bytes:
+                return  # never cache something larger than the whole budget
+            self._data[key] = (value, size)
+            self.bytes += size
+            while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, old_size) = self._data.popitem(last=False)
+                self.bytes -= old_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for `key`, computing and storing it on a miss."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+
+CACHE = LRUCache()
+_HASH_MEMO = LRUCache(max_entries=HASH_MEMO_ENTRIES)  # Streamlit upload file_id -> digest, so reruns don't re-hash
+
+
+class TextMemo:
+    """
+    Bounded LRU memo of per-text results, keyed on (namespace, text). A namespace names
+    the function and its options, e.g. ("segment_text", True, True). Results are shared,
+    not copied: every occurrence of a text gets the same object, so treat them as read-only.
+    """
+
+    def __init__(self, max_entries: int = MEMO_ENTRIES, max_chars: int = MEMO_CHARS):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._data = {}  # (namespace, text) -> (result, chars); dict order is the LRU order
+        self._lock = threading.Lock()
+        self.chars = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @staticmethod
+    def _chars(text: str, result) -> int:
+        if isinstance(result, (list, tuple)):
+            return len(text) + sum(len(r) for r in result if isinstance(r, str))
+        return len(text) + (len(result) if isinstance(result, str) else 0)
+
+    def map(self, namespace, texts: list, compute) -> list:
+        """
+        Result for every item of `texts`, in order. `compute(missing)` gets the distinct
+        texts not in the memo and returns their results in the same order. Only str
+        texts are stored; other values (NaN, None) are computed on every call.
+        """
+        results = {}
+        missing = []
+        with self._lock:
+            for text in dict.fromkeys(texts):
+                key = (namespace, text)
+                entry = self._data.pop(key, None) if isinstance(text, str) else None
+                if entry is None:
+                    missing.append(text)
+                else:
+                    self._data[key] = entry  # re-insert = most recently used
+                    results[text] = entry[0]
+            self.hits += len(texts) - len(missing)  # repeats within `texts` count as hits
+            self.misses += len(missing)
+
+        computed = compute(missing) if missing else []
+        results.update(zip(missing, computed))
+        with self._lock:
+            for text, value in zip(missing, computed):
+                if not isinstance(text, str):
+                    continue
+                key = (namespace, text)
+                chars = self._chars(text, value)
+                if chars > self.max_chars or key in self._data:
+                    continue
+                self._data[key] = (value, chars)
+                self.chars += chars
+            while len(self._data) > self.max_entries or self.chars > self.max_chars:
+                oldest = next(iter(self._data))
+                self.chars -= self._data.pop(oldest)[1]
+                self.evictions += 1
+        return [results[t] for t in texts]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.chars = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._data),
+            "chars": self.chars,
+            "max_entries": self.max_entries,
+            "max_chars": self.max_chars,
+        }
+
+
+TEXT_MEMO = TextMemo()
+
+
+def read_table_cached(source, cache: LRUCache = CACHE, **read_kwargs) -> pd.DataFrame:
+    """read_table (CSV / Parquet / Arrow IPC) keyed on the upload's content hash and the parsing options."""
+    key = make_key("read_table", content_hash(source), **read_kwargs)
+    return cache.get_or_compute(key, lambda: read_table(source, **read_kwargs))
+
+
+def cached_call(input_hash, fn, *args, cache: LRUCache = CACHE, **params):
+    """
+    fn(*args, **params) memoized on `input_hash` (content hash of the data in `args`)
+    plus the function and every keyword parameter.
+    """
+    key = make_key("result", input_hash, fn.__module__, fn.__qualname__, **params)
+    return cache.get_or_compute(key, lambda: fn(*args, **params))
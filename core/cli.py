@@ -0,0 +1,131 @@
+# core/cli.py
+"""
+Headless Pre-processing Configurator.
+
+    python -m core.cli input.csv -o output.csv --id-col ID --text-col Text \
+        --data-type chat --turn-col Turn --speaker-col Speaker --rolling-n 3 --workers 32
+
+Takes the same statement-cut / context-cut / rolling-N / context-budget /
+hashtag options as the page and writes the same bytes as its download;
+`--windows 1-10` sweeps several rolling-window sizes in one pass;
+`--incremental DIR` keeps the output in a store and on the next run only
+rebuilds IDs whose rows changed; `--compress gzip|zstd` (or an output ending
+in .gz / .zst) compresses the CSV on the fly. ID groups are sharded across a
+process pool and merged back in input order.
+"""
+import argparse
+import os
+import sys
+
+from core.budget import BUDGET_UNITS, MAX_BUDGET
+from core.incremental import build_incremental, summarize
+from core.parallel import DEFAULT_SHARD_ROWS, iter_csv_parallel
+from core.preprocess import DATA_TYPES, STATEMENT_CUTS, build_sweep, select_builder
+from core.streaming import COMPRESSIONS, DEFAULT_GZIP_LEVEL, GZIP_LEVELS, compressed_stream
+from core.sweep import SWEEP_LAYOUTS, parse_windows
+from core.tableio import read_table
+
+_SUFFIX_COMPRESSION = {".gz": "gzip", ".zst": "zstd"}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m core.cli", description=__doc__.strip().splitlines()[0])
+    p.add_argument("input", help="input CSV, Parquet or Arrow IPC (Feather) path")
+    p.add_argument("-o", "--output", default="-", help="output CSV path (default: stdout)")
+    p.add_argument("--id-col", required=True)
+    p.add_argument("--text-col", required=True)
+    p.add_argument("--turn-col", default=None)
+    p.add_argument("--speaker-col", default=None)
+    p.add_argument("--data-type", choices=DATA_TYPES, default=None,
+                   help="chat or post (default: chat if --turn-col is given, else post)")
+    p.add_argument("--statement-cut", choices=STATEMENT_CUTS, default="sentence")
+    p.add_argument("--context-cut", choices=("rolling", "whole"), default="rolling")
+    p.add_argument("--rolling-n", type=int, default=2,
+                   help="number of previous sentences/turns in the rolling window")
+    p.add_argument("--windows", default=None,
+                   help="sweep these rolling-window sizes in one pass instead of --rolling-n, e.g. 1-10 or 1,2,5")
+    p.add_argument("--sweep-layout", choices=SWEEP_LAYOUTS, default="wide",
+                   help="wide: a Context_N<n> column per size; long: a row per size with a Window column")
+    p.add_argument("--context-budget", type=int, default=None, metavar="N",
+                   help="drop the oldest sentences/turns until each context fits N characters or tokens")
+    p.add_argument("--budget-unit", choices=BUDGET_UNITS, default="chars")
+    p.add_argument("--no-hashtags", action="store_true", help="do not retain hashtags as sentences")
+    p.add_argument("--separate-hashtags", action="store_true", help="one row per hashtag instead of one combined")
+    p.add_argument("--incremental", metavar="DIR", default=None,
+                   help="store directory: reuse the output of IDs whose input rows are unchanged since the last run")
+    p.add_argument("--compress", choices=COMPRESSIONS, default=None,
+                   help="compress the output CSV on the fly (default: gzip for a .gz output, zstd for .zst)")
+    p.add_argument("--compress-level", type=int, default=None, metavar="L",
+                   help=f"gzip level {GZIP_LEVELS[0]}-{GZIP_LEVELS[1]} (default {DEFAULT_GZIP_LEVEL})")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--shard-rows", type=int, default=DEFAULT_SHARD_ROWS,
+                   help="approximate input rows per shard sent to a worker")
+    return p
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if not 0 <= args.rolling_n <= 50:
+        print("--rolling-n must be between 0 and 50 (as in the UI)", file=sys.stderr)
+        return 2
+    if args.context_budget is not None and not 0 <= args.context_budget <= MAX_BUDGET:
+        print(f"--context-budget must be between 0 and {MAX_BUDGET:,}", file=sys.stderr)
+        return 2
+    compression = args.compress or _SUFFIX_COMPRESSION.get(os.path.splitext(args.output)[1].lower())
+    if args.compress_level is not None and (compression != "gzip"
+                                            or not GZIP_LEVELS[0] <= args.compress_level <= GZIP_LEVELS[1]):
+        print(f"--compress-level needs gzip compression and a level between {GZIP_LEVELS[0]} and {GZIP_LEVELS[1]}",
+              file=sys.stderr)
+        return 2
+    windows = None
+    if args.windows is not None:
+        if args.context_cut == "whole":
+            print("--windows needs --context-cut rolling", file=sys.stderr)
+            return 2
+        try:
+            windows = parse_windows(args.windows, max_n=50)
+        except ValueError as e:
+            print(f"--windows: {e}", file=sys.stderr)
+            return 2
+
+    df = read_table(args.input)
+    for col in (args.id_col, args.text_col, args.turn_col, args.speaker_col):
+        if col is not None and col not in df.columns:
+            print(f"Column {col!r} not found in {args.input}", file=sys.stderr)
+            return 2
+
+    whole_context = args.context_cut == "whole"
+    builder, params = select_builder(
+        args.data_type or ("chat" if args.turn_col else "post"),
+        args.statement_cut,
+        args.id_col, args.text_col, turn_col=args.turn_col, speaker_col=args.speaker_col,
+        # the page leaves rolling_N at 2 when the whole chat/post is the context
+        rolling_N=2 if whole_context else args.rolling_n, whole_context=whole_context,
+        keep_hashtags=not args.no_hashtags, combine_hashtags=not args.separate_hashtags,
+        context_budget=args.context_budget, budget_unit=args.budget_unit
+    )
+
+    if windows is not None:
+        builder, params = build_sweep, dict(params, builder=builder, windows=windows, layout=args.sweep_layout)
+
+    raw = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    out = compressed_stream(raw, compression, args.compress_level) if compression else raw
+    try:
+        if args.incremental:
+            input_cols = [c for c in (args.id_col, args.text_col, args.turn_col, args.speaker_col) if c]
+            result, report = build_incremental(df, builder, params, args.incremental, input_cols)
+            print(summarize(report), file=sys.stderr)
+            out.write(result.to_csv(index=False).encode("utf-8") if len(result.columns) else b"")
+            return 0
+        for data in iter_csv_parallel(df, builder, params, workers=args.workers, shard_rows=args.shard_rows):
+            out.write(data)
+    finally:
+        if out is not raw:
+            out.close()  # writes the trailer; leaves `raw` open
+        if raw is not sys.stdout.buffer:
+            raw.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# core/columnar.py
+"""
+Column builders for the result frames.
+
+Results are assembled a column at a time from positions into the input
+instead of a dict per row: one input row (a turn, a post) fans out to the
+output rows made from it with `np.repeat`, and values that repeat across
+output rows (ID, Speaker, the turn text every sentence of a turn shares)
+become categoricals that keep each distinct value once plus a small integer
+code per row. CSV output is unchanged; the Arrow writers decode categoricals
+back to plain columns (see core.streaming).
+
+The same codes index a column for filtering: `selection_mask` looks a
+selection (e.g. the chosen speakers) up once per distinct value and maps it
+to the rows with one take over the codes.
+"""
+import numpy as np
+import pandas as pd
+
+
+def categorical(codes: np.ndarray, uniques) -> pd.Categorical:
+    """Categorical from pd.factorize output (code -1 = missing)."""
+    return pd.Categorical.from_codes(np.asarray(codes), categories=pd.Index(uniques))
+
+
+def categorical_take(values: pd.Series, positions: np.ndarray) -> pd.Categorical:
+    """values.iloc[positions] as a categorical: each distinct value is stored once."""
+    codes, uniques = pd.factorize(values, sort=False)
+    return categorical(codes[positions], uniques)
+
+
+def selection_mask(codes: np.ndarray, uniques, selected) -> np.ndarray:
+    """Rows whose value (codes and uniques from pd.factorize) is in `selected`; missing values never are."""
+    lookup = np.append(pd.Index(uniques).isin(list(selected)), False)  # code -1 reads the trailing False
+    return lookup[np.asarray(codes)]
+
+
+def distinct_values(values: pd.Series) -> list:
+    """Non-null distinct values in order of appearance (choices for a filter widget)."""
+    return values.dropna().unique().tolist()
+
+
+def fan_out(lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For input items that produce lengths[k] output rows each: (source item of every
+    output row, 0-based index of the row among its item's rows).
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    source = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+    starts = np.cumsum(lengths) - lengths
+    return source, np.arange(len(source), dtype=np.int64) - starts[source]
+
+
+def run_starts(keys: np.ndarray) -> np.ndarray:
+    """Position of the first element of each element's run of equal consecutive keys."""
+    n = len(keys)
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = keys[1:] != keys[:-1]
+    return np.maximum.accumulate(np.where(is_start, np.arange(n), 0))
@@ -0,0 +1,12 @@
+# core/formats.py
+"""
+Input formats the pages accept.
+
+Kept free of pandas / pyarrow imports so a page can draw its uploader before
+the processing modules load (see core.ui).
+"""
+FORMATS = ("csv", "parquet", "feather")
+UPLOAD_TYPES = ["csv", "parquet", "pq", "feather", "arrow", "ipc"]
+
+# file extension -> format, for inputs without recognizable magic bytes
+EXTENSIONS = {"parquet": "parquet", "pq": "parquet", "feather": "feather", "arrow": "feather", "ipc": "feather"}
@@ -0,0 +1,274 @@
+# core/incremental.py
+"""
+Incremental builds for a growing input.
+
+A store is a directory holding the previous output (output.parquet, with the
+ID key of every row in `_key`), a fingerprint of each ID's input rows
+(fingerprints.parquet) and the build options (meta.json). On the next upload
+only IDs whose fingerprint changed, and new IDs, are rebuilt; the rows of
+unchanged IDs are copied from the store, and IDs no longer in the upload are
+dropped. Builders work per ID, so the result is the same as a full rebuild
+and follows the upload's ID order. Changed options, or a rebuilt part whose
+column types differ from the stored ones, fall back to a full rebuild.
+
+The Configurator's named stores share DEFAULT_STORE_DIR; `prune_stores` drops
+stores unused for STORE_MAX_AGE seconds (env INCREMENTAL_MAX_AGE_DAYS) and then
+the least recently used ones while they take more than STORE_LIMIT_BYTES (env
+INCREMENTAL_LIMIT_MB).
+"""
+import json
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from core.streaming import _arrow_batch
+
+STORE_VERSION = 2  # 2: raw ID keys (1 normalized them)
+KEY_COL = "_key"
+OUTPUT_FILE = "output.parquet"
+FINGERPRINT_FILE = "fingerprints.parquet"
+META_FILE = "meta.json"
+DEFAULT_STORE_DIR = os.environ.get("INCREMENTAL_DIR", os.path.join(os.path.expanduser("~"), ".pa7_incremental"))
+STORE_LIMIT_BYTES = int(float(os.environ.get("INCREMENTAL_LIMIT_MB", 2048)) * 2**20)
+STORE_MAX_AGE = float(os.environ.get("INCREMENTAL_MAX_AGE_DAYS", 30)) * 86_400
+
+
+def _id_text(value) -> str:
+    # text IDs as they are; other values tagged, so the ID 1 and the text "1" stay apart
+    return value if isinstance(value, str) else f"\x00{value}"
+
+
+def id_keys(ids: pd.Series) -> pd.Series:
+    """
+    Raw IDs as text keys, one per group the builders form (pd.factorize, so " 1" and "1"
+    are different IDs); categoricals compare by value. Missing IDs stay missing.
+    """
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        ids = pd.Series(np.asarray(ids))
+    codes, uniques = pd.factorize(ids.reset_index(drop=True), sort=False)
+    texts = np.array([_id_text(v) for v in np.asarray(uniques, dtype=object)] + [None], dtype=object)
+    return pd.Series(texts[codes], dtype=object)  # code -1 (missing) picks the trailing None
+
+
+def store_path(name: str) -> str:
+    """
+    Store directory DEFAULT_STORE_DIR/<name>, with `name` reduced to one safe path component
+    (separators and leading dots replaced). Raises ValueError if the result still resolves
+    outside DEFAULT_STORE_DIR, e.g. through a symlink.
+    """
+    slug = re.sub(r"[^\w.-]+", "_", name).lstrip(".") or "store"
+    root = os.path.realpath(DEFAULT_STORE_DIR)
+    path = os.path.realpath(os.path.join(root, slug))
+    if os.path.dirname(path) != root:
+        raise ValueError(f"Store {name!r} resolves outside {DEFAULT_STORE_DIR}")
+    return path
+
+
+def _store_usage(path: str) -> tuple[float, int]:
+    """(last write, bytes on disk) of a store directory."""
+    used, size = os.path.getmtime(path), 0
+    for entry in os.scandir(path):
+        if entry.is_file(follow_symlinks=False):
+            stat = entry.stat(follow_symlinks=False)
+            used, size = max(used, stat.st_mtime), size + stat.st_size
+    return used, size
+
+
+def prune_stores(keep: str | None = None, root: str = DEFAULT_STORE_DIR, limit_bytes: int = STORE_LIMIT_BYTES,
+                 max_age: float = STORE_MAX_AGE, now: float | None = None) -> list[str]:
+    """
+    Remove the stores under `root` last written more than `max_age` seconds ago, then the least
+    recently written ones while all together take more than `limit_bytes`. `keep` (the store
+    just built) goes last, only if it alone exceeds the limit. Returns the removed (real) paths.
+    """
+    now = time.time() if now is None else now
+    try:
+        paths = [e.path for e in os.scandir(root) if e.is_dir(follow_symlinks=False)]
+    except OSError:
+        return []
+    keep = os.path.realpath(keep) if keep else None
+    stores = []
+    for path in map(os.path.realpath, paths):
+        used, size = _store_usage(path)
+        stores.append((path == keep, used, size, path))
+    stores.sort()  # others before `keep`, least recently written first
+
+    removed, total = [], sum(size for _, _, size, _ in stores)
+    for is_kept, used, size, path in stores:
+        if (now - used > max_age and not is_kept) or total > limit_bytes:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+            total -= size
+    return removed
+
+
+def summarize(report: dict) -> str:
+    """One-line description of a build_incremental report."""
+    if report["full_rebuild"]:
+        return (f"Full build ({report['full_rebuild']}): {report['ids']:,} IDs, {report['rebuilt_rows']:,} rows; "
+                f"the store is ready for incremental runs.")
+    return (f"Rebuilt {report['added']:,} new and {report['changed']:,} changed IDs ({report['rebuilt_rows']:,} rows), "
+            f"reused {report['unchanged']:,} unchanged IDs ({report['reused_rows']:,} rows), "
+            f"dropped {report['removed']:,} IDs no longer in the input.")
+
+
+def fingerprint_ids(df: pd.DataFrame, id_col, cols: list) -> pd.DataFrame:
+    """
+    One row per ID in order of first appearance: key, fingerprint of the ID's rows
+    (values of `cols` and their order), number of rows. Rows with a missing ID are skipped.
+    """
+    keys = id_keys(df[id_col])
+    codes, uniques = pd.factorize(keys, sort=False)
+    row_hash = pd.util.hash_pandas_object(df[list(cols)], index=False).to_numpy()
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(order) else np.zeros(0, int)
+    within = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    # mixing in the position within the ID makes the sum order-sensitive
+    mixed = pd.util.hash_array(row_hash[order] ^ within.astype(np.uint64))
+    sums = np.add.reduceat(mixed, starts) if len(order) else np.zeros(0, np.uint64)
+    return pd.DataFrame({
+        "key": pd.Series(np.asarray(uniques, dtype=object)[sorted_codes[starts]], dtype=object),
+        "fingerprint": sums.view(np.int64),
+        "rows": np.diff(np.r_[starts, len(order)]).astype(np.int64),
+    })
+
+
+def build_signature(fn, params: dict) -> str:
+    """Text identifying fn and every option that changes its output."""
+    opts = {k: (getattr(v, "__qualname__", v) if callable(v) else v) for k, v in params.items() if k != "lazy"}
+    return json.dumps({"fn": f"{fn.__module__}.{fn.__qualname__}", "params": opts}, sort_keys=True, default=repr)
+
+
+class IncrementalStore:
+    """Files of one store directory; writes go through a temp file and os.replace."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def meta(self) -> dict | None:
+        try:
+            with open(self._file(META_FILE), encoding="utf-8") as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get("version") == STORE_VERSION else None
+
+    def fingerprints(self) -> pd.DataFrame:
+        return pq.read_table(self._file(FINGERPRINT_FILE)).to_pandas()
+
+    def output(self, keys) -> pa.Table:
+        """Stored output rows whose ID key is in `keys`."""
+        table = pq.read_table(self._file(OUTPUT_FILE))
+        return table.filter(pc.is_in(table[KEY_COL], value_set=pa.array(list(keys), type=pa.string())))
+
+    def _replace(self, name: str, write) -> None:
+        tmp = self._file(f".{name}.tmp")
+        write(tmp)
+        os.replace(tmp, self._file(name))
+
+    @staticmethod
+    def _write_json(path: str, data: dict) -> None:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, indent=2)
+
+    def save(self, output: pa.Table, fingerprints: pd.DataFrame, meta: dict) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        self._replace(OUTPUT_FILE, lambda p: pq.write_table(output, p, compression="zstd"))
+        self._replace(FINGERPRINT_FILE, lambda p: pq.write_table(
+            pa.Table.from_pandas(fingerprints, preserve_index=False), p))
+        # meta last: a store is only trusted once all of its files are written
+        self._replace(META_FILE, lambda p: self._write_json(p, meta))
+
+
+def _build(df: pd.DataFrame, fn, params: dict) -> pd.DataFrame:
+    res = fn(df, **params)
+    return res.to_frame() if hasattr(res, "to_frame") else res
+
+
+def _keyed(frame: pd.DataFrame) -> pa.Table:
+    """Output rows as an Arrow table (categoricals decoded) plus the ID key column."""
+    return _arrow_batch(frame.assign(**{KEY_COL: id_keys(frame["ID"]).to_numpy()}), None)
+
+
+def build_incremental(df: pd.DataFrame, fn, params: dict, store_path: str, input_cols: list | None = None):
+    """
+    fn(df, **params) (a Configurator builder or build_sweep; its output has an ID column)
+    reusing the rows of unchanged IDs from the store at `store_path`, which is then updated.
+    `input_cols` are the input columns the fingerprint covers (default: every column).
+    Returns (result DataFrame, report dict).
+    """
+    t0 = time.perf_counter()
+    id_col = params["id_col"]
+    store = IncrementalStore(store_path)
+    signature = build_signature(fn, params)
+    fps = fingerprint_ids(df, id_col, input_cols or list(df.columns))
+
+    meta = store.meta()
+    reason = None
+    if meta is None:
+        reason = "new store"
+    elif meta.get("signature") != signature:
+        reason = "options changed"
+    old = None if reason else store.fingerprints()
+
+    if old is not None:
+        merged = fps.merge(old[["key", "fingerprint"]], on="key", how="left", suffixes=("", "_old"))
+        same = (merged["fingerprint"] == merged["fingerprint_old"]).to_numpy()
+        added = int(merged["fingerprint_old"].isna().sum())
+        removed = int((~old["key"].isin(fps["key"])).sum())
+    else:
+        same = np.zeros(len(fps), dtype=bool)
+        added, removed = len(fps), 0
+    rebuild_keys = fps["key"][~same]
+
+    row_keys = id_keys(df[id_col])
+    new_rows = df[row_keys.isin(rebuild_keys).to_numpy()]
+    fresh = _build(new_rows, fn, params)
+    fresh_table = _keyed(fresh) if len(fresh) else None
+    kept = store.output(fps["key"][same]) if same.any() else None
+    if kept is not None and fresh_table is not None \
+            and not fresh_table.schema.equals(kept.schema, check_metadata=False):
+        # e.g. a Turn column that now has missing values: rows must not mix types
+        reason, kept = "column types changed", None
+        fresh = _build(df, fn, params)
+        fresh_table = _keyed(fresh) if len(fresh) else None
+        same = np.zeros(len(fps), dtype=bool)
+
+    tables = [t for t in (kept, fresh_table) if t is not None]
+    if tables:
+        combined = pa.concat_tables(tables)
+        rank = pd.Series(np.arange(len(fps)), index=fps["key"].to_numpy())
+        order = np.argsort(rank.reindex(combined[KEY_COL].to_numpy(zero_copy_only=False)).to_numpy(), kind="stable")
+        combined = combined.take(pa.array(order))
+    else:
+        combined = pa.table({KEY_COL: pa.array([], type=pa.string())})
+
+    store.save(combined, fps, {
+        "version": STORE_VERSION, "signature": signature, "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "ids": len(fps), "rows": combined.num_rows,
+    })
+    result = combined.drop_columns([KEY_COL]).to_pandas() if combined.num_columns > 1 else pd.DataFrame()
+    report = {
+        "full_rebuild": reason,
+        "ids": len(fps),
+        "added": added,
+        "changed": int((~same).sum()) - added if not reason else 0,
+        "unchanged": int(same.sum()),
+        "removed": removed,
+        "rebuilt_rows": len(fresh),
+        "reused_rows": kept.num_rows if kept is not None else 0,
+        "seconds": time.perf_counter() - t0,
+    }
+    return result, report
@@ -0,0 +1,252 @@
+# core/jobs.py
+"""
+Background jobs for long builds.
+
+Jobs run on one small thread pool shared by every session: at most
+MAX_CONCURRENT_JOBS run at a time and the rest queue, and each owner may
+have MAX_ACTIVE_PER_OWNER queued/running job(s). A job belongs to an owner
+token that the pages keep in the URL, so a reloaded or reconnected tab finds
+its jobs again; finished results stay downloadable for RESULT_TTL_S.
+
+A task is a callable task(job) -> SpooledTable. It reports progress with
+job.advance(n) and calls job.check_cancelled() between units of work.
+"""
+import io
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from core.parallel import DEFAULT_SHARD_ROWS, shard_by_id
+from core.streaming import iter_frame_batches
+
+MAX_CONCURRENT_JOBS = 2
+MAX_ACTIVE_PER_OWNER = 1
+MAX_JOBS_PER_OWNER = 10  # finished jobs kept per owner
+RESULT_TTL_S = 60 * 60
+PROGRESS_STEPS = 50  # aim for about this many progress updates per job
+
+ACTIVE = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    """Raised inside a task when its job was cancelled."""
+
+
+class JobLimitError(RuntimeError):
+    """The owner already has the maximum number of active jobs."""
+
+
+class Job:
+    """State of one background job; read by the pages, written by the worker thread."""
+
+    def __init__(self, owner: str, page: str, label: str, unit: str = "ID groups", clock=time.time):
+        self.id = uuid.uuid4().hex[:10]
+        self.owner = owner
+        self.page = page
+        self.label = label
+        self.unit = unit
+        self.status = "queued"
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.created = clock()
+        self.started = None
+        self.finished = None
+        self._clock = clock
+        self._cancel = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE
+
+    @property
+    def progress(self) -> float | None:
+        if not self.total:
+            return None
+        return min(self.done / self.total, 1.0)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or self._clock()) - self.started
+
+    def advance(self, n: int = 1) -> None:
+        self.done += n
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+
+class JobManager:
+    """Thread pool plus the registry of every owner's jobs."""
+
+    def __init__(self, max_workers: int = MAX_CONCURRENT_JOBS, max_active_per_owner: int = MAX_ACTIVE_PER_OWNER,
+                 ttl_s: float = RESULT_TTL_S, clock=time.time):
+        self.max_active_per_owner = max_active_per_owner
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}  # id -> Job, in submission order
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, page: str, label: str, task, unit: str = "ID groups") -> Job:
+        self._expire()
+        with self._lock:
+            active = sum(j.active for j in self._jobs.values() if j.owner == owner)
+            if active >= self.max_active_per_owner:
+                raise JobLimitError(f"You already have {active} job(s) running; wait for it or cancel it first.")
+            job = Job(owner, page, label, unit, clock=self._clock)
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, task)
+        return job
+
+    def _run(self, job: Job, task) -> None:
+        if job._cancel.is_set():  # cancelled while queued
+            job.status = "cancelled"
+            getattr(task, "close", lambda: None)()  # the task never runs: release what it owns
+            return
+        job.status = "running"
+        job.started = self._clock()
+        try:
+            job.result = task(job)
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:  # surfaced in the jobs panel
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job.finished = self._clock()
+
+    def jobs(self, owner: str, page: str | None = None) -> list[Job]:
+        """The owner's jobs, newest first."""
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if j.owner == owner and (page is None or j.page == page)]
+        return jobs[::-1]
+
+    def remove(self, job_id: str) -> None:
+        """Forget a job (cancelling it first if it is still active)."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            job.cancel()
+
+    def _expire(self) -> None:
+        now = self._clock()
+        with self._lock:
+            per_owner = {}
+            for job in reversed(list(self._jobs.values())):
+                if job.active:
+                    continue
+                per_owner[job.owner] = per_owner.get(job.owner, 0) + 1
+                if now - (job.finished or now) > self.ttl_s or per_owner[job.owner] > MAX_JOBS_PER_OWNER:
+                    del self._jobs[job.id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        return {s: statuses.count(s) for s in ("queued", "running", "done", "failed", "cancelled")}
+
+
+JOBS = JobManager()
+
+
+# -----------------------
+# Tasks
+# -----------------------
+def private_copy(upload):
+    """
+    Own copy of an upload's bytes, so a job never shares a file position with the page.
+    A spooled upload (core.spool) gets its own open handle on the spool file instead,
+    which stays readable if the session's spool files are removed while the job runs.
+    Pass the copy to the task as one of its `sources` so it is closed when the job ends.
+    """
+    if isinstance(upload, os.PathLike):
+        return open(upload, "rb")
+    upload.seek(0)
+    data = upload.read()
+    upload.seek(0)
+    copy = io.BytesIO(data)
+    copy.name = getattr(upload, "name", "upload")
+    return copy
+
+
+def _owning(task, sources):
+    """
+    Wrap `task` so it closes the handles in `sources` (e.g. from private_copy) when it ends.
+    A job cancelled while queued never runs its task; the manager calls task.close() instead.
+    """
+    if not sources:
+        return task
+
+    def close():
+        for src in sources:
+            src.close()
+
+    def owning_task(job: Job):
+        try:
+            return task(job)
+        finally:
+            close()
+    owning_task.close = close
+    return owning_task
+
+
+def sharded_build_task(df, fn, params: dict, writer, id_col, sort_ids: bool = False,
+                       shard_rows: int = DEFAULT_SHARD_ROWS):
+    """
+    Task writing fn(df, **params) into `writer`, built shard by shard of whole ID groups
+    (same rows and order as one call, see core.parallel). Progress is in ID groups.
+    `sort_ids` for functions whose output is sorted by ID (rolling_context).
+    """
+    def task(job: Job):
+        n_groups = int(df[id_col].nunique())
+        n_shards = max(-(-len(df) // max(1, shard_rows)), min(PROGRESS_STEPS, n_groups))
+        job.total = n_groups
+
+        def batches():
+            for shard in shard_by_id(df, id_col, n_shards, sort=sort_ids):
+                job.check_cancelled()
+                yield from iter_frame_batches(fn(shard, **params))
+                job.advance(int(shard[id_col].nunique()))
+        return writer.write_all(batches())
+    return task
+
+
+def chunked_build_task(chunks, fn, params: dict, writer, sources=()):
+    """
+    Task for streaming mode: fn over each chunk of `chunks` (e.g. iter_id_chunks); progress in rows read.
+    The task owns the handles in `sources` that `chunks` reads from and closes them when the job ends.
+    """
+    def task(job: Job):
+        def batches():
+            for chunk in chunks:
+                job.check_cancelled()
+                yield from iter_frame_batches(fn(chunk, **params))
+                job.advance(len(chunk))
+        return writer.write_all(batches())
+    return _owning(task, sources)
+
+
+def batches_task(batches, writer, total: int | None = None, sources=()):
+    """Task writing an iterable of result batches; progress is one unit per batch. Closes `sources` at the end."""
+    def task(job: Job):
+        job.total = total
+
+        def tracked():
+            for batch in batches:
+                job.check_cancelled()
+                yield batch
+                job.advance(1)
+        res = writer.write_all(tracked())
+        job.done = job.total or job.done
+        return res
+    return _owning(task, sources)
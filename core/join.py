@@ -0,0 +1,201 @@
+# core/join.py
+"""
+Join engine for the CSV Joiner.
+
+Keys are normalized once (`normalize_keys`) and the same normalized values
+drive the overlap count, the preflight and the join itself. A missing key
+never matches, not even another missing key (pd.merge pairs NaN with NaN).
+`preflight()` reports per-key multiplicities and the exact output row count
+before anything is materialized; `partitioned_join()` hash-partitions both
+inputs to disk and joins one partition at a time for inputs that don't fit
+in memory.
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from core.streaming import DEFAULT_CHUNKSIZE, _arrow_batch
+from core.tableio import iter_table_chunks
+
+JOIN_TYPES = ["inner", "left", "right"]
+KEY_COL = "__join_key__"
+DEFAULT_PARTITIONS = 32
+# missing keys never match: each side gets its own sentinel
+_MISSING = {"left": "\x00missing-left", "right": "\x00missing-right"}
+
+
+def normalize_keys(keys: pd.Series, normalize: bool = True) -> pd.Series:
+    """
+    Join-key values compared as trimmed text. Integral floats compare equal to the
+    integer (1.0 == "1"), so key columns that pandas typed differently still match.
+    Missing values stay missing. With normalize=False the raw values are kept.
+    """
+    if not normalize:
+        return keys
+    if pd.api.types.is_bool_dtype(keys.dtype):
+        out = keys.astype(object).where(keys.isna(), keys.astype(str))
+    elif pd.api.types.is_integer_dtype(keys.dtype) and not keys.hasnans:
+        out = pd.Series(keys.to_numpy().astype(str).astype(object), index=keys.index)
+    elif pd.api.types.is_numeric_dtype(keys.dtype):
+        values = keys.to_numpy(dtype="float64", na_value=np.nan)
+        integral = np.isfinite(values) & (np.floor(values) == values) & (np.abs(values) < 2**63)
+        text = np.full(len(keys), np.nan, dtype=object)
+        text[integral] = values[integral].astype(np.int64).astype(str)
+        other = ~integral & keys.notna().to_numpy()
+        text[other] = keys[other].astype(object).map(str).to_numpy()
+        out = pd.Series(text, index=keys.index)
+    elif isinstance(keys.dtype, pd.StringDtype):
+        out = keys.str.strip().astype(object)
+    else:
+        out = keys.astype(object).map(lambda v: str(v).strip()).where(keys.notna())
+    return out.astype(object)
+
+
+def _with_key(df: pd.DataFrame, key, side: str, normalize: bool) -> pd.DataFrame:
+    norm = normalize_keys(df[key], normalize)
+    return df.assign(**{KEY_COL: norm.astype(object).where(norm.notna(), _MISSING[side])})
+
+
+def _merge(left: pd.DataFrame, right: pd.DataFrame, key1, key2, how: str) -> pd.DataFrame:
+    """Merge on the prepared key column; output columns match pd.merge(left_on=key1, right_on=key2)."""
+    res = pd.merge(left, right, on=KEY_COL, how=how).drop(columns=KEY_COL)
+    if key1 == key2 and f"{key1}_x" in res.columns:
+        # pd.merge reports a shared key name once, taken from the side whose rows are all kept
+        if how == "right":
+            res[f"{key1}_x"] = res[f"{key1}_y"]
+        res = res.drop(columns=f"{key1}_y").rename(columns={f"{key1}_x": key1})
+    return res
+
+
+def join_frames(df1: pd.DataFrame, df2: pd.DataFrame, key1, key2, how: str = "inner",
+                normalize: bool = True) -> pd.DataFrame:
+    """In-memory join on normalized keys."""
+    return _merge(_with_key(df1, key1, "left", normalize), _with_key(df2, key2, "right", normalize),
+                  key1, key2, how)
+
+
+def iter_join_chunks(df1: pd.DataFrame, df2: pd.DataFrame, key1, key2, how: str = "inner",
+                     normalize: bool = True, n_chunks: int = 10):
+    """
+    join_frames in `n_chunks` pieces of the side whose row order the result follows
+    (FIRST for inner/left, SECOND for right); the pieces concatenate to the full result.
+    """
+    left = _with_key(df1, key1, "left", normalize)
+    right = _with_key(df2, key2, "right", normalize)
+    driver = right if how == "right" else left
+    step = max(1, -(-len(driver) // max(1, n_chunks)))
+    for lo in range(0, max(len(driver), 1), step):
+        part = driver.iloc[lo:lo + step]
+        yield _merge(left, part, key1, key2, how) if how == "right" else _merge(part, right, key1, key2, how)
+
+
+# -----------------------
+# Preflight
+# -----------------------
+def key_counts(keys: pd.Series, normalize: bool = True) -> pd.Series:
+    """Rows per normalized (non-missing) key."""
+    return normalize_keys(keys, normalize).value_counts(dropna=True)
+
+
+def key_counts_chunked(source, key, normalize: bool = True, chunksize: int = DEFAULT_CHUNKSIZE) -> tuple[pd.Series, int]:
+    """(rows per normalized key, rows with a missing key), reading only the key column."""
+    total, missing = None, 0
+    for chunk in iter_table_chunks(source, chunksize, columns=[key]):
+        norm = normalize_keys(chunk[key], normalize)
+        missing += int(norm.isna().sum())
+        counts = norm.value_counts(dropna=True)
+        total = counts if total is None else total.add(counts, fill_value=0)
+    if total is None:
+        total = pd.Series(dtype="int64")
+    return total.astype("int64"), missing
+
+
+def preflight(left_counts: pd.Series, right_counts: pd.Series, left_missing: int = 0,
+              right_missing: int = 0, top: int = 20) -> dict:
+    """
+    Exact output size of every join type plus the keys that multiply the most.
+    `*_counts` are rows per key (key_counts); `*_missing` rows whose key is missing.
+    """
+    both = pd.concat([left_counts.rename("left_rows"), right_counts.rename("right_rows")], axis=1, join="inner")
+    both["output_rows"] = both["left_rows"].astype("int64") * both["right_rows"].astype("int64")
+    matched = int(both["output_rows"].sum())
+    left_total = int(left_counts.sum()) + left_missing
+    right_total = int(right_counts.sum()) + right_missing
+    left_only = left_total - int(both["left_rows"].sum())
+    right_only = right_total - int(both["right_rows"].sum())
+    hot = both[(both["left_rows"] > 1) & (both["right_rows"] > 1)]
+    return {
+        "overlap_keys": len(both),
+        "left_keys": len(left_counts),
+        "right_keys": len(right_counts),
+        "rows": {"inner": matched, "left": matched + left_only, "right": matched + right_only},
+        "many_to_many_keys": len(hot),
+        "max_left_multiplicity": int(left_counts.max()) if len(left_counts) else 0,
+        "max_right_multiplicity": int(right_counts.max()) if len(right_counts) else 0,
+        "top_keys": both.sort_values("output_rows", ascending=False).head(top).rename_axis("key").reset_index(),
+    }
+
+
+# -----------------------
+# Out-of-core
+# -----------------------
+def _partition_of(keys: pd.Series, side: str, partitions: int) -> np.ndarray:
+    """
+    Partition of every row from its key's normalized text form (also with normalize=False,
+    so values the join treats as equal, like 1.0 and 1, land in the same partition).
+    Missing keys get their side's sentinel, which never matches.
+    """
+    norm = normalize_keys(keys, True)
+    norm = norm.astype(object).where(norm.notna(), _MISSING[side])
+    return (pd.util.hash_pandas_object(norm, index=False).to_numpy() % partitions).astype(np.int64)
+
+
+def _partition_to_disk(source, key, side, partitions, chunksize, workdir):
+    """Write `source` into per-partition Parquet files; returns (paths or None per partition, empty template)."""
+    paths = [os.path.join(workdir, f"{side}-{p:04d}.parquet") for p in range(partitions)]
+    writers = [None] * partitions
+    template = schema = None
+    try:
+        # CSV chunks are read with the column types of the whole file, so every piece fits one schema
+        for chunk in iter_table_chunks(source, chunksize, stable_types=True):
+            if template is None:
+                template = chunk.iloc[:0]
+            part = _partition_of(chunk[key], side, partitions)
+            for p in np.unique(part):
+                table = _arrow_batch(chunk[part == p], schema)
+                schema = table.schema
+                if writers[p] is None:
+                    writers[p] = pq.ParquetWriter(paths[p], schema)
+                writers[p].write_table(table)
+    finally:
+        for w in writers:
+            if w is not None:
+                w.close()
+    return [path if writers[p] is not None else None for p, path in enumerate(paths)], template
+
+
+def partitioned_join(left_source, right_source, key1, key2, how: str = "inner", normalize: bool = True,
+                     partitions: int = DEFAULT_PARTITIONS, chunksize: int = DEFAULT_CHUNKSIZE):
+    """
+    Grace hash join: both inputs are split by key hash into `partitions` Parquet files,
+    then each partition pair is joined in memory with join_frames. Yields result batches (partition order,
+    not input order). Peak memory is about one partition of each side plus its output.
+    """
+    workdir = tempfile.mkdtemp(prefix="join-")
+    try:
+        left_parts, left_empty = _partition_to_disk(left_source, key1, "left", partitions, chunksize, workdir)
+        right_parts, right_empty = _partition_to_disk(right_source, key2, "right", partitions, chunksize, workdir)
+        if left_empty is None or right_empty is None:
+            return  # an input without a header row can't be joined
+        for lp, rp in zip(left_parts, right_parts):
+            if (lp is None and how != "right") or (rp is None and how != "left"):
+                continue  # nothing from this partition survives the join
+            left = pd.read_parquet(lp) if lp else left_empty
+            right = pd.read_parquet(rp) if rp else right_empty
+            yield join_frames(left, right, key1, key2, how=how, normalize=normalize)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
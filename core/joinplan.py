@@ -0,0 +1,180 @@
+# core/joinplan.py
+"""
+Join plans over more than two tables for the CSV Joiner.
+
+A join spec links two uploaded tables by index:
+
+    {"left": 0, "left_key": "ID", "right": 2, "right_key": "chat_id", "how": "inner"}
+
+`plan_joins` orders the specs and estimates the rows after every step from the
+key counts of each table (core.join.key_counts): a spec's first join is sized
+exactly (core.join.preflight), later joins with the usual
+|R| * |S| / max(distinct R keys, distinct S keys) estimate. When every spec is an
+inner join the order is free, so the plan greedily takes the join with the
+smallest estimated result next; otherwise the specs run as listed.
+`execute_plan` runs the plan on in-memory frames, one pd.merge per step, with
+no file in between. An inner-only plan's rows are sorted by their source rows
+(first listed table's row order, then the next table's, ...), so they do not
+depend on the order the plan chose. This is not the order pd.merge gives when
+the specs run as listed: an inner merge groups rows by the first appearance of
+their key, which depends on intermediate rows later joins drop.
+
+Columns that occur in more than one table are renamed to "<column>_<table>",
+so the result's columns do not depend on the plan either.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.join import KEY_COL, _with_key, preflight
+
+_ROW_ID = "__row_{}__"
+
+
+def table_labels(names: list[str]) -> list[str]:
+    """Short unique labels (file names without extension) for the uploaded tables."""
+    labels = []
+    for name in names:
+        base = os.path.splitext(os.path.basename(name))[0] or "table"
+        label, n = base, 2
+        while label in labels:
+            label, n = f"{base}_{n}", n + 1
+        labels.append(label)
+    return labels
+
+
+def output_columns(columns: list[list], labels: list[str]) -> list[dict]:
+    """Output name of every column of every table: {column: output name} per table."""
+    seen = pd.Series([c for cols in columns for c in cols]).value_counts()
+    return [{c: (f"{c}_{label}" if seen[c] > 1 else c) for c in cols} for cols, label in zip(columns, labels)]
+
+
+def validate_specs(n_tables: int, specs: list[dict]) -> None:
+    """In the listed order, the first spec links two tables and every later one adds exactly one new table."""
+    if len(specs) != n_tables - 1:
+        raise ValueError(f"{n_tables} tables need {n_tables - 1} joins, got {len(specs)}")
+    joined = set()
+    for n, spec in enumerate(specs, 1):
+        ends = {spec["left"], spec["right"]}
+        if len(ends) != 2 or not ends <= set(range(n_tables)):
+            raise ValueError(f"Join {n} must link two different tables")
+        if joined and len(ends & joined) != 1:
+            raise ValueError(f"Join {n} must link one table joined before to one new table")
+        joined |= ends
+
+
+def _swap(how: str) -> str:
+    return {"left": "right", "right": "left"}.get(how, how)
+
+
+def _sides(spec: dict, joined: set) -> tuple[tuple, tuple, str]:
+    """((table, key) already joined, (table, key) added, join type seen from the joined side)."""
+    left, right = (spec["left"], spec["left_key"]), (spec["right"], spec["right_key"])
+    if spec["right"] in joined:
+        return right, left, _swap(spec["how"])
+    return left, right, spec["how"]
+
+
+def _listed_tables(specs: list[dict]) -> list[int]:
+    """Tables in the order joining the specs as listed adds them."""
+    order = [specs[0]["left"], specs[0]["right"]]
+    for spec in specs[1:]:
+        order.append(spec["right"] if spec["left"] in order else spec["left"])
+    return order
+
+
+# -----------------------
+# Planning
+# -----------------------
+def _estimate(rows_left: float, rows_right: float, keys_left: float, keys_right: float, how: str) -> float:
+    inner = rows_left * rows_right / max(keys_left, keys_right, 1)
+    if how == "left":
+        return max(inner, rows_left)
+    if how == "right":
+        return max(inner, rows_right)
+    return inner
+
+
+def plan_joins(counts: dict, rows: list[int], specs: list[dict], labels: list[str]) -> list[dict]:
+    """
+    Ordered plan steps for validated specs. `counts[(table, key)]` are rows per key
+    (core.join.key_counts) and `rows[table]` every table's row count. Each step is its
+    spec plus "spec" (its listed position), "step", "joined" (labels of the tables in
+    the result so far) and "estimated_rows".
+    """
+    def exact(spec):
+        lk, rk = (spec["left"], spec["left_key"]), (spec["right"], spec["right_key"])
+        return preflight(counts[lk], counts[rk], rows[lk[0]] - int(counts[lk].sum()),
+                         rows[rk[0]] - int(counts[rk].sum()))["rows"][spec["how"]]
+
+    reorder = all(s["how"] == "inner" for s in specs)
+    remaining = list(range(len(specs)))
+    steps, joined, size = [], set(), 0.0
+    while remaining:
+        candidates = []
+        for i in remaining if reorder else remaining[:1]:
+            spec = specs[i]
+            if not joined:
+                candidates.append((exact(spec), i))
+                continue
+            if (spec["left"] in joined) == (spec["right"] in joined):
+                continue  # not connected to the result yet
+            inside, added, how = _sides(spec, joined)
+            keys_in = min(len(counts[inside]), size)
+            candidates.append((_estimate(size, rows[added[0]], keys_in, len(counts[added]), how), i))
+        size, i = min(candidates)
+        remaining.remove(i)
+        joined |= {specs[i]["left"], specs[i]["right"]}
+        steps.append({**specs[i], "spec": i, "step": len(steps) + 1,
+                      "joined": [labels[t] for t in sorted(joined)], "estimated_rows": int(round(size))})
+    return steps
+
+
+def plan_frame(steps: list[dict], labels: list[str]) -> pd.DataFrame:
+    """The plan as a table for display."""
+    return pd.DataFrame({
+        "step": [s["step"] for s in steps],
+        "join": [f"{labels[s['left']]}.{s['left_key']} ⋈ {labels[s['right']]}.{s['right_key']}" for s in steps],
+        "type": [s["how"] for s in steps],
+        "result holds": [", ".join(s["joined"]) for s in steps],
+        "estimated rows": [s["estimated_rows"] for s in steps],
+    })
+
+
+# -----------------------
+# Execution
+# -----------------------
+def execute_plan(frames: list[pd.DataFrame], steps: list[dict], labels: list[str],
+                 normalize: bool = True) -> pd.DataFrame:
+    """
+    Run the plan's joins in memory; columns as output_columns. Inner-only plans sort the
+    rows by source row positions; plans with left/right joins keep pd.merge's order.
+    """
+    names = output_columns([list(f.columns) for f in frames], labels)
+    inner_only = all(s["how"] == "inner" for s in steps)
+    tables = []
+    for t, frame in enumerate(frames):
+        frame = frame.rename(columns=names[t])
+        if inner_only:
+            frame = frame.assign(**{_ROW_ID.format(t): np.arange(len(frame), dtype=np.int64)})
+        tables.append(frame)
+
+    result, joined = None, set()
+    for step in steps:
+        if result is None:
+            result, joined = tables[step["left"]], {step["left"]}
+        (t_in, k_in), (t_new, k_new), how = _sides(step, joined)
+        # the result is the left side of every merge; the sentinels keep missing keys apart
+        result = pd.merge(_with_key(result, names[t_in][k_in], "left", normalize),
+                          _with_key(tables[t_new], names[t_new][k_new], "right", normalize),
+                          on=KEY_COL, how=how).drop(columns=KEY_COL)
+        joined.add(t_new)
+
+    if inner_only:
+        # any plan yields the same rows; order them by row positions in listed table order
+        listed = _listed_tables(sorted(steps, key=lambda s: s["spec"]))
+        positions = [result[_ROW_ID.format(t)].to_numpy() for t in listed]
+        result = result.iloc[np.lexsort(positions[::-1])]
+    columns = [c for t in range(len(frames)) for c in names[t].values()]
+    return result[columns].reset_index(drop=True)
@@ -0,0 +1,278 @@
+# core/keysketch.py
+"""
+Approximate key profiling for join inputs too large to count exactly.
+
+A KeySketch summarizes one key column in fixed memory, reading it chunk by
+chunk; sketches of chunks (or of files) merge into the sketch of the whole.
+Keys are normalized as for the join (core.join.normalize_keys) and hashed to
+64 bits with pandas' vectorized hash. A sketch holds:
+
+    HyperLogLog registers   distinct keys (standard error 1.04 / sqrt(2**14), 0.8%)
+    bottom-k sample         the keys with the smallest hashes and their exact
+                            row counts: a uniform sample of distinct keys
+    Misra-Gries summary     the most frequent keys (duplicate hot spots)
+    count sketch            row counts per key and the inner-join size (the
+                            product of two sketches, Fast-AGMS)
+
+`sketch_preflight` turns two sketches into the same report as
+core.join.preflight, with estimates instead of exact numbers.
+"""
+import numpy as np
+import pandas as pd
+
+from core.join import normalize_keys
+from core.streaming import DEFAULT_CHUNKSIZE
+from core.tableio import iter_table_chunks
+
+HLL_PRECISION = 14  # 2**14 registers
+SAMPLE_SIZE = 4096
+HEAVY_KEYS = 512
+CS_DEPTH = 5
+CS_WIDTH = 2**14
+SKETCH_ROWS = 2_000_000  # the Joiner suggests sketches above this many rows per file
+SKETCH_CHUNK = 1_000_000  # rows hashed at a time for in-memory columns
+
+_SEEDS = np.array([0x9E3779B97F4A7C15 * (i + 1) & (2**64 - 1) for i in range(CS_DEPTH)], dtype=np.uint64)
+
+
+def _mix(h: np.ndarray, seed) -> np.ndarray:
+    """splitmix64 finalizer of h + seed: one more independent-looking 64-bit hash."""
+    with np.errstate(over="ignore"):
+        z = h + np.uint64(seed)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def hash_keys(keys: pd.Series) -> np.ndarray:
+    """64-bit hash of normalized, non-missing keys (same text, same hash, in every file)."""
+    return pd.util.hash_array(keys.to_numpy(dtype=object), categorize=False)
+
+
+class KeySketch:
+    """Mergeable fixed-size summary of one key column (see the module docstring)."""
+
+    def __init__(self, precision: int = HLL_PRECISION, sample_size: int = SAMPLE_SIZE,
+                 heavy_keys: int = HEAVY_KEYS, width: int = CS_WIDTH):
+        self.precision = precision
+        self.sample_size = sample_size
+        self.heavy_keys = heavy_keys
+        self.width = width
+        self.rows = 0
+        self.missing = 0
+        self.registers = np.zeros(2**precision, dtype=np.uint8)
+        self.counts = np.zeros((CS_DEPTH, width), dtype=np.float64)
+        self.sample = pd.DataFrame({"hash": np.zeros(0, np.uint64), "key": np.zeros(0, object),
+                                    "rows": np.zeros(0, np.int64)})
+        self.heavy = pd.Series(dtype="int64")  # key -> rows (lower bound)
+        self.heavy_error = 0  # heavy counts are at most this much below the true counts
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held: registers, count sketch, sample and heavy keys (for core.cache)."""
+        return self.registers.nbytes + self.counts.nbytes + int(self.sample.memory_usage(deep=True).sum()) \
+            + int(self.heavy.memory_usage(deep=True))
+
+    # -----------------------
+    # Updates
+    # -----------------------
+    def update(self, keys: pd.Series, normalize: bool = True) -> "KeySketch":
+        """Add one chunk of raw key values."""
+        norm = normalize_keys(keys, normalize)
+        present = norm.notna().to_numpy()
+        self.rows += len(norm)
+        self.missing += int((~present).sum())
+        norm = norm[present]
+        if not len(norm):
+            return self
+        if not normalize:
+            norm = norm.astype(str)  # hash_array needs text
+        h = hash_keys(norm)
+        self._update_hll(h)
+        self._update_counts(h)
+        codes, uniques = pd.factorize(h, sort=False)
+        rows = np.bincount(codes).astype(np.int64)
+        # each chunk contributes only its own candidates: the smallest hashes and the most rows
+        smallest = _smallest(uniques, self.sample_size)
+        if len(rows) > self.heavy_keys:
+            cut = int(np.partition(rows, len(rows) - self.heavy_keys - 1)[len(rows) - self.heavy_keys - 1])
+            frequent, error = np.flatnonzero(rows > cut), cut
+        else:
+            frequent, error = np.arange(len(rows)), 0
+        texts = _first_texts(norm.to_numpy(dtype=object), codes, np.union1d(smallest, frequent), len(uniques))
+        self._merge_sample(pd.DataFrame({"hash": uniques[smallest].astype(np.uint64), "key": texts[smallest],
+                                         "rows": rows[smallest]}))
+        self._merge_heavy(pd.Series(rows[frequent] - error, index=texts[frequent]), error)
+        return self
+
+    def _update_hll(self, h: np.ndarray) -> None:
+        p = self.precision
+        idx = (h >> np.uint64(64 - p)).astype(np.int64)
+        rest = (h & np.uint64(2**(64 - p) - 1)).astype(np.float64)  # exact: fewer than 53 bits
+        rank = (64 - p) - np.frexp(rest)[1] + 1  # leading zeros + 1 (frexp exponent = bit length)
+        np.maximum.at(self.registers, idx, rank.astype(np.uint8))
+
+    def _update_counts(self, h: np.ndarray) -> None:
+        for d, seed in enumerate(_SEEDS):
+            g = _mix(h, seed)
+            bucket = (g % np.uint64(self.width)).astype(np.int64)
+            sign = 1.0 - 2.0 * (g >> np.uint64(63)).astype(np.float64)
+            self.counts[d] += np.bincount(bucket, weights=sign, minlength=self.width)
+
+    def _merge_sample(self, sample: pd.DataFrame) -> None:
+        both = pd.concat([self.sample, sample], ignore_index=True)
+        both = both.groupby("hash", sort=True).agg(key=("key", "first"), rows=("rows", "sum"))
+        self.sample = both.head(self.sample_size).reset_index()
+
+    def _merge_heavy(self, counts: pd.Series, error: int) -> None:
+        # Misra-Gries merge: add, then subtract the (k+1)-th largest count and drop what falls to zero
+        both = self.heavy.add(counts, fill_value=0) if len(self.heavy) else counts.groupby(level=0).sum()
+        self.heavy_error += error
+        if len(both) > self.heavy_keys:
+            cut = int(both.nlargest(self.heavy_keys + 1).iloc[-1])
+            both = both[both > cut] - cut
+            self.heavy_error += cut
+        self.heavy = both.astype("int64")
+
+    def merge(self, other: "KeySketch") -> "KeySketch":
+        """Fold another sketch (same sizes) into this one."""
+        if (other.precision, other.width, other.sample_size) != (self.precision, self.width, self.sample_size):
+            raise ValueError("Only sketches of the same size can be merged")
+        self.rows += other.rows
+        self.missing += other.missing
+        np.maximum(self.registers, other.registers, out=self.registers)
+        self.counts += other.counts
+        self._merge_sample(other.sample)
+        self._merge_heavy(other.heavy, other.heavy_error)
+        return self
+
+    # -----------------------
+    # Estimates
+    # -----------------------
+    @property
+    def keyed_rows(self) -> int:
+        return self.rows - self.missing
+
+    def distinct(self) -> float:
+        """Estimated number of distinct keys (HyperLogLog with linear counting for small sets)."""
+        return _hll_estimate(self.registers)
+
+    def estimate_rows(self, keys) -> np.ndarray:
+        """Estimated rows of each normalized key (count sketch median, never negative)."""
+        keys = pd.Series(list(keys), dtype=object)
+        if not len(keys):
+            return np.zeros(0, np.int64)
+        h = hash_keys(keys)
+        est = []
+        for d, seed in enumerate(_SEEDS):
+            g = _mix(h, seed)
+            bucket = (g % np.uint64(self.width)).astype(np.int64)
+            sign = 1.0 - 2.0 * (g >> np.uint64(63)).astype(np.float64)
+            est.append(sign * self.counts[d, bucket])
+        return np.maximum(np.rint(np.median(est, axis=0)), 0).astype(np.int64)
+
+
+def _smallest(values: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k smallest values (all of them if there are fewer)."""
+    if len(values) <= k:
+        return np.arange(len(values))
+    return np.argpartition(values, k - 1)[:k]
+
+
+def _first_texts(texts: np.ndarray, codes: np.ndarray, wanted: np.ndarray, n_codes: int) -> np.ndarray:
+    """Text of each code in `wanted` (object array indexed by code; other codes stay None)."""
+    mark = np.zeros(n_codes, dtype=bool)
+    mark[wanted] = True
+    pos = np.flatnonzero(mark[codes])
+    found, first = np.unique(codes[pos], return_index=True)
+    out = np.full(n_codes, None, dtype=object)
+    out[found] = texts[pos[first]]
+    return out
+
+
+def _hll_estimate(registers: np.ndarray) -> float:
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int((registers == 0).sum())
+    if raw <= 2.5 * m and zeros:
+        return m * np.log(m / zeros)
+    return float(raw)
+
+
+def sketch_keys(keys: pd.Series, normalize: bool = True, chunksize: int = SKETCH_CHUNK) -> KeySketch:
+    """KeySketch of an in-memory key column, normalized and hashed one slice at a time."""
+    sketch = KeySketch()
+    for lo in range(0, len(keys), chunksize):
+        sketch.update(keys.iloc[lo:lo + chunksize], normalize)
+    return sketch
+
+
+def sketch_keys_chunked(source, key, normalize: bool = True, chunksize: int = DEFAULT_CHUNKSIZE) -> KeySketch:
+    """KeySketch of one column of a file, reading only that column."""
+    sketch = KeySketch()
+    for chunk in iter_table_chunks(source, chunksize, columns=[key]):
+        sketch.update(chunk[key], normalize)
+    return sketch
+
+
+# -----------------------
+# Preflight
+# -----------------------
+def _union_sample(left: KeySketch, right: KeySketch) -> pd.DataFrame:
+    """
+    Sample of the union's distinct keys with each side's exact rows (0 = absent): every key
+    hashed below both sides' sample thresholds, so a side's sample has it iff that side does.
+    """
+    both = pd.concat([left.sample.assign(side="left_rows"), right.sample.assign(side="right_rows")])
+    full = [s.sample["hash"].max() for s in (left, right) if len(s.sample) >= s.sample_size]
+    if full:
+        both = both[both["hash"] <= min(full)]
+    wide = both.pivot_table(index="key", columns="side", values="rows", aggfunc="sum", fill_value=0)
+    return wide.reindex(columns=["left_rows", "right_rows"], fill_value=0).astype("int64")
+
+
+def sketch_preflight(left: KeySketch, right: KeySketch, top: int = 20) -> dict:
+    """
+    core.join.preflight from two sketches. The inner-join size comes from the count sketches;
+    the most frequent keys are counted on their own and the other keys are extrapolated from
+    the union sample (overlap, unmatched rows, many-to-many keys). Row totals are exact,
+    everything else is an estimate.
+    """
+    n_union = _hll_estimate(np.maximum(left.registers, right.registers))
+    hot_keys = pd.Index(left.heavy.index).union(pd.Index(right.heavy.index))
+    hot = pd.DataFrame({"left_rows": left.estimate_rows(hot_keys), "right_rows": right.estimate_rows(hot_keys)},
+                       index=hot_keys)
+    hot = hot[(hot["left_rows"] > 0) | (hot["right_rows"] > 0)]
+    tail = _union_sample(left, right)
+    tail = tail[~tail.index.isin(hot.index)]
+    scale = max(n_union - len(hot), 0) / max(len(tail), 1)
+
+    def total(cond, values=None) -> float:
+        """Sum (count if values is None) over keys meeting `cond(frame)`: hot keys plus extrapolated tail."""
+        parts = []
+        for frame, weight in ((hot, 1.0), (tail, scale)):
+            mask = cond(frame)
+            parts.append(weight * (mask.sum() if values is None else frame.loc[mask, values].sum()))
+        return float(sum(parts))
+
+    overlap = total(lambda f: (f["left_rows"] > 0) & (f["right_rows"] > 0))
+    inner = max(float(np.median(np.sum(left.counts * right.counts, axis=1))), 0.0) if overlap else 0.0
+    # exact totals bound the unmatched-row estimates
+    left_only = min(total(lambda f: f["right_rows"] == 0, "left_rows"), left.keyed_rows) + left.missing
+    right_only = min(total(lambda f: f["left_rows"] == 0, "right_rows"), right.keyed_rows) + right.missing
+
+    top_keys = hot[(hot["left_rows"] > 0) & (hot["right_rows"] > 0)].rename_axis("key").reset_index()
+    top_keys["output_rows"] = top_keys["left_rows"] * top_keys["right_rows"]
+    return {
+        "approximate": True,
+        "overlap_keys": int(round(overlap)),
+        "left_keys": int(round(left.distinct())),
+        "right_keys": int(round(right.distinct())),
+        "rows": {"inner": int(round(inner)), "left": int(round(inner + left_only)),
+                 "right": int(round(inner + right_only))},
+        "many_to_many_keys": int(round(total(lambda f: (f["left_rows"] > 1) & (f["right_rows"] > 1)))),
+        "max_left_multiplicity": int(hot["left_rows"].max()) if len(hot) else int(left.keyed_rows > 0),
+        "max_right_multiplicity": int(hot["right_rows"].max()) if len(hot) else int(right.keyed_rows > 0),
+        "top_keys": top_keys.sort_values("output_rows", ascending=False).head(top).reset_index(drop=True),
+    }
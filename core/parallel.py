@@ -0,0 +1,85 @@
+# core/parallel.py
+"""
+Process-pool execution of the per-ID builders.
+
+The input is split into shards of whole ID groups, in order of first
+appearance of each ID (the order `groupby(sort=False)` uses), so building
+the shards independently and concatenating them in shard order gives the
+same rows, in the same order, as one call over the whole frame.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.streaming import SpooledCSV
+
+DEFAULT_SHARD_ROWS = 50_000
+
+
+def shard_by_id(df: pd.DataFrame, id_col, n_shards: int, sort: bool = False) -> list[pd.DataFrame]:
+    """
+    Split `df` into at most `n_shards` frames of consecutive ID groups with similar row counts.
+    Groups follow first appearance, or sorted ID order with `sort` (for builders that sort by ID).
+    """
+    codes, _ = pd.factorize(df[id_col], sort=sort)  # codes follow first appearance unless sorted
+    valid = codes >= 0  # NaN IDs are dropped by groupby anyway
+    n_groups = int(codes.max()) + 1 if valid.any() else 0
+    if n_groups == 0:
+        return []
+    n_shards = max(1, min(int(n_shards), n_groups))
+
+    # cut the group sequence where the cumulative row count crosses each shard boundary
+    sizes = np.bincount(codes[valid], minlength=n_groups)
+    cum = np.cumsum(sizes)
+    bounds = np.searchsorted(cum, np.linspace(0, cum[-1], n_shards + 1)[1:-1], side="left") + 1
+    shard_of_group = np.zeros(n_groups, dtype=np.int64)
+    shard_of_group[bounds[bounds < n_groups]] = 1
+    shard_of_group = np.cumsum(shard_of_group)
+
+    # one stable sort by shard keeps each shard's rows in input order; cut it where the shard changes
+    row_shard = np.where(valid, shard_of_group[np.where(valid, codes, 0)], -1)
+    order = np.argsort(row_shard, kind="stable")
+    order = order[row_shard[order] >= 0]
+    cuts = np.flatnonzero(np.diff(row_shard[order])) + 1
+    return [df.iloc[rows] for rows in np.split(order, cuts)]
+
+
+def _build_shard_csv(builder, frame, params, batch_size) -> bytes:
+    """Worker: build one shard and return its CSV (with header)."""
+    out = SpooledCSV(preview_rows=0)
+    res = builder(frame, **params)
+    batches = res.iter_batches(batch_size) if hasattr(res, "iter_batches") else [res]
+    out.write_all(batches)
+    return out.reader().read()
+
+
+def iter_csv_parallel(df: pd.DataFrame, builder, params: dict, workers: int = 1,
+                      shard_rows: int = DEFAULT_SHARD_ROWS, batch_size: int = 10_000):
+    """
+    Yield the CSV bytes of builder(df, **params), built shard by shard on `workers`
+    processes. The header is emitted once and shards come back in order.
+    """
+    n_shards = max(1, -(-len(df) // max(1, shard_rows)))
+    shards = shard_by_id(df, params["id_col"], n_shards)
+    args = [(builder, shard, params, batch_size) for shard in shards]
+
+    if workers <= 1:
+        results = (_build_shard_csv(*a) for a in args)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_build_shard_csv, *zip(*args)) if args else iter(())
+
+    try:
+        header_done = False
+        for data in results:
+            if not data:
+                continue
+            if header_done:
+                data = data[data.index(b"\n") + 1:]
+            header_done = True
+            yield data
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,74 @@
+# core/pipeline.py
+"""
+The Configurator's build as memoized stages.
+
+    parse            read_table_cached      upload bytes + parse options
+    segment          segment_texts          + text column + hashtag options (chat, sentence level)
+    sentence stream  STREAMS[builder]       + ID / turn / speaker columns
+    context          SentenceStream.assemble  + rolling_N / context cut / budget
+    output schema    LazyContextFrame       materialized batch by batch at export
+
+Each cached stage is keyed on the upload hash plus only the options it reads,
+so moving the rolling-window slider or switching the context cut reuses the
+segmented sentence stream and only re-runs `assemble` (a few numpy passes);
+a window-size sweep (`sweep_staged`) reuses it the same way.
+"""
+from contextlib import nullcontext
+
+from core.cache import CACHE, LRUCache, make_key
+from core.preprocess import CONTEXT_PARAMS, STREAMS, segment_texts, stream_sentence_level_chat
+
+
+def _stage(prof, name):
+    return prof.stage(name) if prof is not None else nullcontext()
+
+
+def _stream_staged(df, input_hash, builder, params: dict, cache: LRUCache, prof):
+    """The builder's SentenceStream, with segmentation and the stream cached."""
+    stream_fn = STREAMS[builder]
+    stream_params = {k: v for k, v in params.items() if k not in CONTEXT_PARAMS}
+
+    extra = {}
+    if stream_fn is stream_sentence_level_chat:
+        seg_params = dict(keep_hashtags=stream_params.get("keep_hashtags", True),
+                          combine_hashtags=stream_params.get("combine_hashtags", True))
+        text_col = stream_params["text_col"]
+        with _stage(prof, "segment"):
+            extra["segments"] = cache.get_or_compute(
+                make_key("segment", input_hash, text_col, **seg_params),
+                lambda: segment_texts(df[text_col], **seg_params)
+            )
+
+    with _stage(prof, "sentence stream"):
+        stream = cache.get_or_compute(
+            make_key("stream", input_hash, stream_fn.__name__, **stream_params),
+            lambda: stream_fn(df, **stream_params, **extra)
+        )
+    return stream
+
+
+def build_staged(df, input_hash, builder, params: dict, cache: LRUCache = CACHE, prof=None):
+    """
+    Same result as builder(df, **params) (see select_builder), with the segmentation and
+    sentence-stream stages cached in `cache`. `prof` (a StageProfiler) times each stage.
+    """
+    stream = _stream_staged(df, input_hash, builder, params, cache, prof)
+
+    with _stage(prof, "assemble contexts") as rec:
+        res = stream.assemble(params.get("rolling_N", 2), params.get("whole_context", False),
+                              lazy=params.get("lazy", True), context_budget=params.get("context_budget"),
+                              budget_unit=params.get("budget_unit", "chars"))
+        if rec is not None:
+            rec["rows"] = len(res)
+    return res
+
+
+def sweep_staged(df, input_hash, builder, params: dict, windows: list[int], layout: str = "wide",
+                 cache: LRUCache = CACHE, prof=None):
+    """Same result as build_sweep(df, builder, windows, layout, **params), reusing the cached stages."""
+    stream = _stream_staged(df, input_hash, builder, params, cache, prof)
+    with _stage(prof, "sweep contexts") as rec:
+        res = stream.sweep(windows, layout, params.get("context_budget"), params.get("budget_unit", "chars"))
+        if rec is not None:
+            rec["rows"] = len(res)
+    return res
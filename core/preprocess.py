@@ -0,0 +1,504 @@
+# core/preprocess.py
+"""
+Row builders for the Pre-processing Configurator.
+
+Every builder produces the standardized schema
+(ID, Turn, Sentence, Speaker, Context, Statement). Contexts are kept as
+(start, end) offsets into one shared sentence array (`LazyContextFrame`) and
+only joined into strings when a preview or export asks for them, so
+whole-chat contexts cost O(n) memory instead of O(n^2). A context budget
+(core.budget) caps any cut at a number of characters or tokens. The other columns
+are filled column-wise from row positions (core.columnar), with ID and
+Speaker as categoricals.
+"""
+import re
+import sys
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from core.budget import budget_starts
+from core.cache import TEXT_MEMO, TextMemo
+from core.columnar import categorical, fan_out, run_starts
+from core.sweep import sweep_contexts, sweep_frame
+
+# -----------------------
+# Helpers
+# -----------------------
+HASHTAG_RE = re.compile(r"#\w+")
+HASHTAG_SPLIT_RE = re.compile(r"(#\w+)")  # split() keeps the tags at odd positions
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+PUNCT_ONLY_RE = re.compile(r"^[\W_]+$")  # strings with no letters/digits after strip
+
+OUTPUT_COLUMNS = ["ID", "Turn", "Sentence", "Speaker", "Context", "Statement"]
+
+def split_sentences_basic(text: str) -> list[str]:
+    """Minimalist sentence splitter on ., !, ? plus newlines. Keeps order, trims blanks."""
+    if not isinstance(text, str):
+        return []
+    # normalize newlines to space to avoid empty splits
+    text = text.replace("\n", " ").strip()
+    # put a space after sentence enders to improve splitting on multiple punctuations
+    # then split on (?<=[.!?])\s+
+    parts = SENTENCE_END_RE.split(text)
+    # Clean and filter
+    return [p.strip() for p in parts if p and not PUNCT_ONLY_RE.match(p.strip())]
+
+def extract_hashtags(text: str) -> list[str]:
+    if not isinstance(text, str):
+        return []
+    return HASHTAG_RE.findall(text)
+
+def remove_hashtags(text: str) -> str:
+    if not isinstance(text, str):
+        return ""
+    return HASHTAG_RE.sub("", text)
+
+def is_punct_only(s: str) -> bool:
+    s = (s or "").strip()
+    return (not s) or bool(PUNCT_ONLY_RE.match(s))
+
+def join_context(lines: list[str]) -> str:
+    lines = [ln for ln in lines if ln and not is_punct_only(ln)]
+    return " ".join(lines).strip()
+
+def segment_text(text, keep_hashtags: bool = True, combine_hashtags: bool = True) -> list[str]:
+    """
+    Fused extract_hashtags + remove_hashtags + split_sentences_basic + is_punct_only.
+    Hashtags are pulled out with a single split (skipped when there is no '#'), and every
+    sentence is stripped and checked once. Returns the cleaned statements, hashtags last;
+    none of them is punctuation-only, so context joining needs no re-validation.
+    """
+    if not isinstance(text, str):
+        return []
+    tags = ()
+    if keep_hashtags and "#" in text:
+        pieces = HASHTAG_SPLIT_RE.split(text)
+        tags = pieces[1::2]
+        text = "".join(pieces[0::2])
+
+    out = []
+    for part in SENTENCE_END_RE.split(text.replace("\n", " ").strip()):
+        part = part.strip()
+        if part and not PUNCT_ONLY_RE.match(part):
+            out.append(part)
+
+    if tags:
+        if combine_hashtags:
+            tags = [" ".join(tags)]
+        # a tag is punctuation-only when it is all underscores ("#__")
+        out.extend(t for t in tags if not PUNCT_ONLY_RE.match(t))
+    return out
+
+def context_offsets(group_start: np.ndarray, pos: np.ndarray,
+                    rolling_N: int, whole_context: bool) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (start, end) offsets into the shared array for the item at global position `pos`
+    whose group begins at `group_start`: the item itself plus all earlier items of
+    the group (whole context) or the N before it (rolling).
+    """
+    end = pos + 1
+    if whole_context:
+        start = group_start.copy()
+    else:
+        start = np.maximum(group_start, pos - int(rolling_N))
+    return start, end
+
+# -----------------------
+# Lazy result
+# -----------------------
+def _frame_bytes(frame: pd.DataFrame) -> int:
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+def _pool_bytes(pool: list) -> int:
+    # memo-shared statements (repeated texts) are one object each: count them once
+    return sys.getsizeof(pool) + sum(map(sys.getsizeof, {id(item): item for item in pool}.values()))
+
+
+class LazyContextFrame:
+    """
+    Builder output whose Context column is stored as offsets.
+    `frame` holds every other output column; row i's context is
+    " ".join(pool[start[i]:end[i]]).strip(). The pool holds only items that
+    passed the punctuation check, so contexts are joined without re-validation.
+    """
+
+    def __init__(self, frame: pd.DataFrame, pool: list, start, end):
+        self.frame = frame.reset_index(drop=True)
+        self.pool = pool
+        self.start = np.asarray(start, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.frame) == 0
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held: the frame, the pooled strings and the offsets (for core.cache)."""
+        return _frame_bytes(self.frame) + _pool_bytes(self.pool) + self.start.nbytes + self.end.nbytes
+
+    def filter(self, mask) -> "LazyContextFrame":
+        mask = np.asarray(mask, dtype=bool)
+        return LazyContextFrame(self.frame[mask], self.pool, self.start[mask], self.end[mask])
+
+    def contexts(self, lo: int = 0, hi: int | None = None) -> list[str]:
+        """Materialize Context strings for rows lo:hi only."""
+        pool = self.pool
+        return [" ".join(pool[s:e]).strip() for s, e in zip(self.start[lo:hi].tolist(), self.end[lo:hi].tolist())]
+
+    def _materialize(self, lo: int, hi: int | None) -> pd.DataFrame:
+        if self.empty:
+            return pd.DataFrame()
+        part = self.frame.iloc[lo:hi].copy()
+        part.insert(OUTPUT_COLUMNS.index("Context"), "Context", self.contexts(lo, hi))
+        return part
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        return self._materialize(0, n)
+
+    def to_frame(self) -> pd.DataFrame:
+        return self._materialize(0, None)
+
+    def iter_batches(self, batch_size: int = 10_000):
+        """Yield the materialized result in row batches."""
+        for lo in range(0, len(self), batch_size):
+            yield self._materialize(lo, lo + batch_size)
+
+    def to_csv(self, buf, batch_size: int = 10_000) -> None:
+        """Write CSV batch by batch so only one batch of Context strings exists at a time."""
+        for i, part in enumerate(self.iter_batches(batch_size)):
+            part.to_csv(buf, index=False, header=(i == 0))
+
+def _context_starts(group_start, pool: list, cuts: list, valid=None, context_budget=None, budget_unit="chars"):
+    """
+    Offsets for one row per pool item under every cut in `cuts` (a rolling_N, or None for
+    the whole context): (starts per cut, end, pool). The ends, the pool remap and the
+    budget are shared, so several cuts cost one pass plus a numpy maximum each.
+    `valid` flags pool items that may appear in a context; the others are dropped from
+    the pool and the offsets remapped onto it. With `context_budget`, starts move
+    forward until the context fits the budget.
+    """
+    group_start = np.asarray(group_start, dtype=np.int64)
+    pos = np.arange(len(pool), dtype=np.int64)
+    offsets = [context_offsets(group_start, pos, n or 0, n is None) for n in cuts]
+    starts, end = [start for start, _ in offsets], offsets[0][1]
+    own = np.ones(len(pool), dtype=np.int64)  # items of its own the context keeps over budget
+    if valid is not None:
+        valid = np.asarray(valid, dtype=bool)
+        kept_before = np.concatenate([[0], np.cumsum(valid)])
+        starts, end, group_start = [kept_before[s] for s in starts], kept_before[end], kept_before[group_start]
+        pool = [item for item, ok in zip(pool, valid.tolist()) if ok]
+        own = valid.astype(np.int64)
+    if context_budget is not None:
+        cap = budget_starts(pool, group_start, end, context_budget, budget_unit, min_items=own)
+        starts = [np.maximum(start, cap) for start in starts]
+    return starts, end, pool
+
+def _finish(frame: pd.DataFrame, group_start, pool: list, rolling_N, whole_context, lazy, valid=None,
+            context_budget=None, budget_unit="chars"):
+    """Offsets for one row per pool item under one context cut (see _context_starts)."""
+    (start,), end, pool = _context_starts(group_start, pool, [None if whole_context else rolling_N], valid,
+                                          context_budget, budget_unit)
+    res = LazyContextFrame(frame, pool, start, end)
+    return res if lazy else res.to_frame()
+
+# -----------------------
+# Sentence stream (everything but the context cut)
+# -----------------------
+class SentenceStream:
+    """
+    Builder output before context assembly: every output column but Context, the
+    shared pool of statements and each row's group start. It depends only on the
+    column and hashtag options, so changing rolling_N or the context cut re-runs
+    `assemble` (a few numpy passes) instead of segmentation.
+    """
+
+    def __init__(self, cols: dict, group_start: list, pool: list, valid=None, drop_invalid=False):
+        self.frame = pd.DataFrame(cols) if len(pool) else pd.DataFrame()
+        self.group_start = np.asarray(group_start, dtype=np.int64)
+        self.pool = pool
+        self.valid = None if valid is None else np.asarray(valid, dtype=bool)
+        self.drop_invalid = drop_invalid  # turn level: invalid items are also dropped as rows
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held: the frame, the pooled statements and the offsets (for core.cache)."""
+        return _frame_bytes(self.frame) + _pool_bytes(self.pool) + self.group_start.nbytes \
+            + (self.valid.nbytes if self.valid is not None else 0)
+
+    def assemble(self, rolling_N=2, whole_context=False, lazy=True, context_budget=None, budget_unit="chars"):
+        """Context offsets for the chosen cut -> LazyContextFrame (or DataFrame)."""
+        res = _finish(self.frame, self.group_start, self.pool, rolling_N, whole_context, lazy=True, valid=self.valid,
+                      context_budget=context_budget, budget_unit=budget_unit)
+        if self.drop_invalid and not res.empty:
+            res = res.filter(self.valid)
+        return res if lazy else res.to_frame()
+
+    def sweep(self, windows: list[int], layout: str = "wide", context_budget=None, budget_unit="chars") -> pd.DataFrame:
+        """
+        Rolling contexts for every window size in `windows` at once: the offsets of all
+        windows come from one pass (see _context_starts) and each larger window's
+        context extends the smaller one's (see core.sweep).
+        """
+        windows = sorted({max(int(n), 0) for n in windows})
+        if self.frame.empty:
+            return pd.DataFrame()
+        starts, end, pool = _context_starts(self.group_start, self.pool, windows, self.valid,
+                                            context_budget, budget_unit)
+        frame = self.frame
+        if self.drop_invalid:
+            frame, starts, end = frame[self.valid], [s[self.valid] for s in starts], end[self.valid]
+            if frame.empty:
+                return pd.DataFrame()
+        contexts = sweep_contexts(pool, starts, end, strip=True)
+        return sweep_frame(frame, windows, {"Context": contexts}, layout, at=OUTPUT_COLUMNS.index("Context"))
+
+def segment_texts(texts, keep_hashtags=True, combine_hashtags=True, memo: TextMemo | None = TEXT_MEMO) -> list[list[str]]:
+    """
+    segment_text for every item of `texts` (Series or list), in order. Each distinct text
+    is segmented once and looked up in `memo` across calls; repeated texts share one
+    (read-only) result list.
+    """
+    texts = texts.tolist() if hasattr(texts, "tolist") else list(texts)
+    def compute(distinct):
+        return [segment_text(t, keep_hashtags, combine_hashtags) for t in distinct]
+    if memo is None:
+        return compute(texts)
+    return memo.map(("segment_text", keep_hashtags, combine_hashtags), texts, compute)
+
+def _chat_order(df, id_col, turn_col=None):
+    """
+    Rows of every chat, chats in groupby(sort=False) order and rows in turn order (stable):
+    (row positions, their ID codes, ID uniques, their turns, 0-based index within the chat).
+    Missing IDs are dropped as by groupby; turns default to 1..n without a turn column.
+    """
+    codes, uniques = pd.factorize(df[id_col], sort=False)
+    has_turn = bool(turn_col) and turn_col in df.columns
+    if has_turn:
+        # rank of every turn value, missing last (sort_values' na_position)
+        turn_rank, turn_uniques = pd.factorize(df[turn_col], sort=True)
+        turn_rank = np.where(turn_rank < 0, len(turn_uniques), turn_rank)
+        order = np.lexsort((turn_rank, codes))  # stable: ties keep file order
+    else:
+        order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    chat_codes = codes[order]
+    within = np.arange(len(order), dtype=np.int64) - run_starts(chat_codes)
+    turns = df[turn_col].iloc[order].reset_index(drop=True) if has_turn else pd.Series(within + 1)
+    return order, chat_codes, uniques, turns, within
+
+def _speaker_codes(df, speaker_col) -> tuple[np.ndarray, pd.Index]:
+    """Speaker codes and categories (missing speakers become ""); a single "" without a column."""
+    if speaker_col and speaker_col in df.columns:
+        return pd.factorize(df[speaker_col].fillna(""), sort=False)
+    return np.zeros(len(df), dtype=np.int64), pd.Index([""])
+
+def stream_sentence_level_chat(df, id_col, text_col, turn_col=None, speaker_col=None,
+                               keep_hashtags=True, combine_hashtags=True, segments=None) -> SentenceStream:
+    """Sentence stream of build_rows_sentence_level_chat; `segments` (segment_texts) may be precomputed."""
+    if segments is None:
+        segments = segment_texts(df[text_col], keep_hashtags, combine_hashtags)
+    order, chat_codes, uniques, turns, _ = _chat_order(df, id_col, turn_col)
+    spk_codes, spk_uniques = _speaker_codes(df, speaker_col)
+
+    # sentences + hashtags (one consolidated sentence or many), punctuation-only dropped;
+    # every chat's sentences back to back in one pool
+    turn_sents = [segments[i] for i in order.tolist()]
+    src, _ = fan_out([len(sents) for sents in turn_sents])
+    pool = list(chain.from_iterable(turn_sents))
+    group_start = run_starts(chat_codes[src])
+    cols = {
+        "ID": categorical(chat_codes[src], uniques),
+        "Turn": turns.iloc[src].reset_index(drop=True),
+        "Sentence": np.arange(len(pool), dtype=np.int64) - group_start + 1,  # sentence index within the chat stream
+        "Speaker": categorical(spk_codes[order][src], spk_uniques),
+        "Statement": pool,
+    }
+    return SentenceStream(cols, group_start, pool)
+
+def stream_turn_level_chat(df, id_col, text_col, turn_col=None, speaker_col=None) -> SentenceStream:
+    """Sentence stream of build_rows_turn_level_chat (one item per turn)."""
+    texts_all = df[text_col].fillna("").tolist()
+    order, chat_codes, uniques, turns, within = _chat_order(df, id_col, turn_col)
+    spk_codes, spk_uniques = _speaker_codes(df, speaker_col)
+
+    pool = [texts_all[i] for i in order.tolist()]  # every chat's turn texts, back to back
+    cols = {
+        "ID": categorical(chat_codes, uniques),
+        "Turn": turns,
+        "Sentence": within + 1,  # here, Sentence ID mirrors the turn index
+        "Speaker": categorical(spk_codes[order], spk_uniques),
+        "Statement": [txt.strip() for txt in pool],
+    }
+    # turn text is not punctuation-only: usable as context and as a statement
+    valid = [not is_punct_only(txt) for txt in pool]
+    return SentenceStream(cols, run_starts(chat_codes), pool, valid=valid, drop_invalid=True)
+
+def _post_texts(df, id_col, text_col) -> tuple[np.ndarray, pd.Index, list[str]]:
+    """
+    (post ID codes, ID uniques, raw texts) in groupby(sort=False) order; the rows of
+    an ID that occurs more than once are concatenated with spaces.
+    """
+    codes, uniques = pd.factorize(df[id_col], sort=False)
+    texts = df[text_col].fillna("").astype(str).tolist()
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]  # groupby drops missing IDs
+    first = run_starts(codes[order]) == np.arange(len(order))
+    post_codes = codes[order][first]
+    if len(order) == len(post_codes):  # one row per post
+        return post_codes, uniques, [texts[i] for i in order.tolist()]
+    bounds = np.flatnonzero(first)[1:]
+    return post_codes, uniques, [" ".join(texts[i] for i in pos) for pos in np.split(order, bounds)]
+
+def _post_stream(post_codes: np.ndarray, uniques, post_rows: list[list[str]]) -> SentenceStream:
+    """Sentence stream with the statements of each post as its own group; Turn = Sentence = 1..n."""
+    src, idx = fan_out([len(rows) for rows in post_rows])
+    pool = list(chain.from_iterable(post_rows))
+    cols = {
+        "ID": categorical(post_codes[src], uniques),
+        "Turn": idx + 1,
+        "Sentence": idx + 1,
+        # per brief example; can be left blank if preferred
+        "Speaker": categorical(np.zeros(len(pool), dtype=np.int64), ["salesperson"]),
+        "Statement": pool,
+    }
+    return SentenceStream(cols, np.arange(len(pool), dtype=np.int64) - idx, pool)
+
+def stream_sentence_level_post(df, id_col, text_col, keep_hashtags=True, combine_hashtags=True) -> SentenceStream:
+    """Sentence stream of build_rows_sentence_level_post."""
+    post_codes, uniques, raws = _post_texts(df, id_col, text_col)
+    return _post_stream(post_codes, uniques, segment_texts(raws, keep_hashtags, combine_hashtags))
+
+def stream_post_level_post(df, id_col, text_col, keep_hashtags=True, combine_hashtags=True) -> SentenceStream:
+    """Sentence stream of build_rows_post_level_post."""
+    post_codes, uniques, raws = _post_texts(df, id_col, text_col)
+    post_rows = []
+    for raw in raws:
+        if keep_hashtags:
+            raw_nohash = remove_hashtags(raw)
+            tags = extract_hashtags(raw)
+            if combine_hashtags and tags:
+                rows = [(raw_nohash + " " + " ".join(tags)).strip()]
+            elif tags:
+                # add as separate rows below (turn=2..)
+                rows = [raw_nohash] + tags
+            else:
+                rows = [raw_nohash]
+        else:
+            rows = [raw]
+        post_rows.append([r for r in rows if not is_punct_only(r)])
+    return _post_stream(post_codes, uniques, post_rows)
+
+# -----------------------
+# Builders
+# -----------------------
+def build_rows_sentence_level_chat(df, id_col, text_col, turn_col=None, speaker_col=None,
+                                   rolling_N=2, whole_context=False,
+                                   keep_hashtags=True, combine_hashtags=True, lazy=False,
+                                   context_budget=None, budget_unit="chars"):
+    """
+    Build sentence-level rows for one-to-one chat.
+    Output columns: ID, Turn, Sentence, Speaker, Context, Statement
+    """
+    stream = stream_sentence_level_chat(df, id_col, text_col, turn_col, speaker_col, keep_hashtags, combine_hashtags)
+    return stream.assemble(rolling_N, whole_context, lazy, context_budget, budget_unit)
+
+def build_rows_turn_level_chat(df, id_col, text_col, turn_col=None, speaker_col=None,
+                               rolling_N=2, whole_context=False, lazy=False,
+                               context_budget=None, budget_unit="chars"):
+    """
+    Turn-level statements (each row is the whole turn text).
+    """
+    return stream_turn_level_chat(df, id_col, text_col, turn_col, speaker_col).assemble(
+        rolling_N, whole_context, lazy, context_budget, budget_unit)
+
+def build_rows_sentence_level_post(df, id_col, text_col,
+                                   rolling_N=2, whole_context=False,
+                                   keep_hashtags=True, combine_hashtags=True, lazy=False,
+                                   context_budget=None, budget_unit="chars"):
+    """
+    One-to-many (social post): no speaker, no true turn;
+    Turn and Sentence indices are the same by spec.
+    """
+    stream = stream_sentence_level_post(df, id_col, text_col, keep_hashtags, combine_hashtags)
+    return stream.assemble(rolling_N, whole_context, lazy, context_budget, budget_unit)
+
+def build_rows_post_level_post(df, id_col, text_col,
+                               rolling_N=2, whole_context=False,
+                               keep_hashtags=True, combine_hashtags=True, lazy=False,
+                               context_budget=None, budget_unit="chars"):
+    """
+    One-to-many (social post), post-level: the whole post is one statement;
+    hashtags are appended to it (combined) or follow as separate rows.
+    """
+    stream = stream_post_level_post(df, id_col, text_col, keep_hashtags, combine_hashtags)
+    return stream.assemble(rolling_N, whole_context, lazy, context_budget, budget_unit)
+
+# builder -> the function producing its SentenceStream (same params minus the context cut)
+STREAMS = {
+    build_rows_sentence_level_chat: stream_sentence_level_chat,
+    build_rows_turn_level_chat: stream_turn_level_chat,
+    build_rows_sentence_level_post: stream_sentence_level_post,
+    build_rows_post_level_post: stream_post_level_post,
+}
+CONTEXT_PARAMS = ("rolling_N", "whole_context", "lazy", "context_budget", "budget_unit")
+
+def build_sweep(df, builder, windows, layout="wide", **params):
+    """
+    builder's rows with a rolling context per window size in `windows`, segmenting the
+    input once. `params` are the builder's (its context-cut params are ignored).
+    Wide: Context_N<n> columns in place of Context; long: Window + Context per (row, window).
+    """
+    stream_params = {k: v for k, v in params.items() if k not in CONTEXT_PARAMS}
+    return STREAMS[builder](df, **stream_params).sweep(windows, layout, params.get("context_budget"),
+                                                       params.get("budget_unit", "chars"))
+
+# -----------------------
+# Option -> builder
+# -----------------------
+DATA_TYPES = ("chat", "post")
+STATEMENT_CUTS = ("sentence", "turn")
+
+def select_builder(data_type, statement_cut, id_col, text_col, turn_col=None, speaker_col=None,
+                   rolling_N=2, whole_context=False, keep_hashtags=True, combine_hashtags=True,
+                   lazy=True, context_budget=None, budget_unit="chars"):
+    """
+    Map the Configurator options to (builder, keyword params) so the UI and the CLI
+    run exactly the same call. data_type: "chat" | "post"; statement_cut: "sentence" | "turn".
+    context_budget (characters or tokens, see core.budget) caps the context cut.
+    """
+    if data_type not in DATA_TYPES:
+        raise ValueError(f"Unknown data type {data_type!r}; expected one of {DATA_TYPES}")
+    if statement_cut not in STATEMENT_CUTS:
+        raise ValueError(f"Unknown statement cut {statement_cut!r}; expected one of {STATEMENT_CUTS}")
+
+    if data_type == "post":
+        # post: Turn/Post-level just means "don’t split sentences"—but PA7 examples expect sentence-level for posts.
+        if statement_cut == "sentence":
+            builder = build_rows_sentence_level_post
+        else:
+            # Post-level: treat entire post as one statement (turn/sentence=1)
+            builder = build_rows_post_level_post
+        params = dict(keep_hashtags=keep_hashtags, combine_hashtags=combine_hashtags)
+    else:
+        # one-to-one (chat)
+        params = dict(turn_col=turn_col, speaker_col=speaker_col)
+        if statement_cut == "sentence":
+            builder = build_rows_sentence_level_chat
+            params.update(keep_hashtags=keep_hashtags, combine_hashtags=combine_hashtags)
+        else:
+            builder = build_rows_turn_level_chat
+    params.update(id_col=id_col, text_col=text_col,
+                  rolling_N=rolling_N, whole_context=whole_context, lazy=lazy)
+    if context_budget is not None:
+        params.update(context_budget=context_budget, budget_unit=budget_unit)
+    return builder, params
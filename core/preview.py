@@ -0,0 +1,63 @@
+# core/preview.py
+"""
+Partial previews that only compute what the first rows need.
+
+`lazy_preview` runs the page's function on a growing prefix of the input
+(1, 2, 4, ... units) until it yields enough rows, the input is used up, or
+the latency budget is spent. A unit is one input row or one ID group,
+taken in the order the full result lists them, so the preview rows are
+exactly the first rows of the full result:
+
+    "rows"    input rows in file order         (tokenizers, Joiner)
+    "first"   ID groups by first appearance    (Configurator builders)
+    "sorted"  ID groups in sorted ID order     (rolling context)
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+PREVIEW_ROWS = 10
+PREVIEW_BUDGET_S = 0.5
+ORDERS = ("rows", "first", "sorted")
+
+
+def _units(df: pd.DataFrame, group_col, order: str) -> tuple[np.ndarray | None, int]:
+    """(unit code of every row or None for "rows", number of units)."""
+    if order == "rows":
+        return None, len(df)
+    codes, uniques = pd.factorize(df[group_col], sort=(order == "sorted"))
+    return codes, len(uniques)
+
+
+def lazy_preview(df: pd.DataFrame, fn, group_col=None, n_rows: int = PREVIEW_ROWS, order: str = "rows",
+                 budget_s: float = PREVIEW_BUDGET_S, **params) -> dict:
+    """
+    First `n_rows` of fn(df, **params), computed from as few rows / ID groups as possible.
+    The budget is checked between rounds, so one round that is slow on its own still finishes.
+    Returns {"frame", "units", "total_units", "complete", "timed_out", "seconds"}; `complete`
+    means the whole input was used (the preview is not partial).
+    """
+    if order not in ORDERS:
+        raise ValueError(f"Unknown preview order {order!r}; expected one of {ORDERS}")
+    t0 = time.perf_counter()
+    codes, total = _units(df, group_col, order)
+    k = min(n_rows if order == "rows" else 1, total)
+    timed_out = False
+    while True:
+        sub = df.iloc[:k] if codes is None else df[(codes >= 0) & (codes < k)]
+        res = fn(sub, **params)
+        if len(res) >= n_rows or k >= total:
+            break
+        if time.perf_counter() - t0 > budget_s:
+            timed_out = True
+            break
+        k = min(k * 2, total)
+    return {
+        "frame": res.head(n_rows),
+        "units": k,
+        "total_units": total,
+        "complete": k >= total,
+        "timed_out": timed_out,
+        "seconds": time.perf_counter() - t0,
+    }
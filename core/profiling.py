@@ -0,0 +1,136 @@
+# core/profiling.py
+"""
+Per-stage timing for the pages.
+
+Each rerun builds one `StageProfiler`; the page wraps its stages (read,
+tokenize/build, context joining, write) in `prof.stage(name)` or, for the
+chunked pipelines, wraps the chunk iterators in `prof.iterate(name, it)`.
+Stages may nest (a write stage pulls batches through a build stage that
+pulls chunks through a read stage); every stage reports *exclusive* wall and
+CPU time, i.e. without the time of the stages nested inside it, so the
+numbers add up to the total. Peak memory (tracemalloc) is the peak growth
+while the stage ran. Tracing slows every Python allocation down and is
+process-wide, so it is a server setting (PERF_MEMORY=1), started once and
+never stopped by a profiler; peaks then include whatever other sessions and
+jobs allocate at the same time.
+pandas is only imported for `frame()`, so pages can create a profiler before
+they load their processing modules.
+"""
+import json
+import os
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+PERF_COLUMNS = ["stage", "calls", "rows", "wall_s", "cpu_s", "peak_mb"]
+PERF_LOG = os.environ.get("PERF_LOG") or None  # JSON lines file the pages append stage metrics to
+PERF_MEMORY = os.environ.get("PERF_MEMORY", "") not in ("", "0")
+
+
+def trace_memory() -> bool:
+    """Start tracemalloc for the process if PERF_MEMORY is set; whether memory is being traced."""
+    if PERF_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return tracemalloc.is_tracing()
+
+
+class StageProfiler:
+    """Collects one record per stage name; repeated entries of a stage accumulate."""
+
+    def __init__(self, page: str, memory: bool = False, log_path: str | None = None):
+        self.page = page
+        self.run_id = uuid.uuid4().hex[:12]
+        self.log_path = log_path
+        self.records = {}  # name -> record dict
+        self._stack = []
+        self._order = 0
+        # peaks are only read while someone else (trace_memory) keeps tracemalloc running
+        self.memory = memory and tracemalloc.is_tracing()
+
+    def _record(self, name: str) -> dict:
+        if name not in self.records:
+            self.records[name] = {"stage": name, "calls": 0, "rows": None, "wall_s": 0.0, "cpu_s": 0.0,
+                                  "peak_mb": None, "_order": None}
+        return self.records[name]
+
+    def _enter(self, rec: dict) -> None:
+        frame = {"rec": rec, "wall": time.perf_counter(), "cpu": time.process_time(),
+                 "child_wall": 0.0, "child_cpu": 0.0}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:  # keep the parent's peak before restarting the high-water mark
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["base"] = frame["peak"] = current
+        self._stack.append(frame)
+
+    def _exit(self) -> None:
+        frame = self._stack.pop()
+        wall = time.perf_counter() - frame["wall"]
+        cpu = time.process_time() - frame["cpu"]
+        rec = frame["rec"]
+        rec["calls"] += 1
+        rec["wall_s"] += wall - frame["child_wall"]
+        rec["cpu_s"] += cpu - frame["child_cpu"]
+        if rec["_order"] is None:  # list stages in the order they first finish
+            rec["_order"] = self._order
+            self._order += 1
+        if self._stack:
+            self._stack[-1]["child_wall"] += wall
+            self._stack[-1]["child_cpu"] += cpu
+        if self.memory:
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            rec["peak_mb"] = max(rec["peak_mb"] or 0.0, (peak - frame["base"]) / 2**20)
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+
+    @contextmanager
+    def stage(self, name: str, rows: int | None = None):
+        """Time the block as stage `name`; the yielded record's "rows" may be set inside."""
+        rec = self._record(name)
+        if rows is not None:
+            rec["rows"] = (rec["rows"] or 0) + rows
+        self._enter(rec)
+        try:
+            yield rec
+        finally:
+            self._exit()
+
+    def iterate(self, name: str, iterable, count=len):
+        """Yield from `iterable`, timing each step as stage `name` and summing count(item) into its rows."""
+        it = iter(iterable)
+        while True:
+            with self.stage(name) as rec:
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                rec["rows"] = (rec["rows"] or 0) + count(item)
+            yield item
+
+    def rows(self) -> list[dict]:
+        """One dict per finished stage (PERF_COLUMNS, times rounded), in the order they first finished."""
+        done = sorted((r for r in self.records.values() if r["_order"] is not None), key=lambda r: r["_order"])
+        return [{"stage": r["stage"], "calls": r["calls"], "rows": r["rows"], "wall_s": round(r["wall_s"], 4),
+                 "cpu_s": round(r["cpu_s"], 4), "peak_mb": None if r["peak_mb"] is None else round(r["peak_mb"], 1)}
+                for r in done]
+
+    def frame(self):
+        """rows() as a DataFrame."""
+        import pandas as pd
+
+        return pd.DataFrame(self.rows(), columns=PERF_COLUMNS).astype({"rows": "Int64"})
+
+    def to_jsonl(self) -> str:
+        ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        return "".join(json.dumps({"ts": ts, "run_id": self.run_id, "page": self.page, **row}) + "\n"
+                       for row in self.rows())
+
+    def close(self) -> None:
+        """Append the records to `log_path` (JSON lines), if set."""
+        if self.log_path and self.records:
+            with open(self.log_path, "a", encoding="utf-8") as fh:
+                fh.write(self.to_jsonl())
@@ -0,0 +1,123 @@
+# core/rolling.py
+"""
+Rolling-context engine for the Rolling Context page.
+
+Rows are grouped once (factorize + stable sort) and every window is located
+with positional offsets into the sorted, speaker-filtered rows, so the cost is
+linear in the number of rows plus the size of the produced strings. The
+speaker column is factorized once per run: its codes give the speaker filter
+(core.columnar.selection_mask), the Speaker categorical and the history
+labels, so each speaker is hashed and formatted once. ID and Speaker are
+returned as categoricals (see core.columnar).
+`rolling_context_sweep` produces several window sizes from one grouping pass.
+A context budget (core.budget) additionally caps each window at a number of
+characters or tokens.
+"""
+import numpy as np
+import pandas as pd
+
+from core.budget import budget_starts
+from core.columnar import categorical, categorical_take, run_starts, selection_mask
+from core.sweep import sweep_contexts, sweep_frame
+
+
+def _group_order(ids: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Row positions sorted by ID (stable, NaN IDs dropped) and each row's group start."""
+    codes, _ = pd.factorize(ids, sort=True)
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    return order, run_starts(codes[order])
+
+
+def _speaker_index(df: pd.DataFrame, speaker_col=None) -> tuple[np.ndarray, pd.Index] | None:
+    """Speaker codes and distinct speakers (pd.factorize), or None without a speaker column."""
+    return pd.factorize(df[speaker_col], sort=False) if speaker_col else None
+
+
+def _kept_rows(df: pd.DataFrame, id_col, spk_index=None, speakers=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(positions in sorted order of rows that may appear in a window / produce output, their group starts, order)."""
+    order, group_start = _group_order(df[id_col])
+    if spk_index is not None:
+        kept = np.flatnonzero(selection_mask(spk_index[0][order], spk_index[1], speakers or []))
+    else:
+        kept = np.arange(len(order))
+    return kept, group_start[kept], order
+
+
+def _speaker_columns(spk_index, rows: np.ndarray) -> tuple[pd.Categorical, list[str]]:
+    """Speaker categorical and speaker label of every output row."""
+    codes, uniques = spk_index
+    labels = [str(v) for v in uniques.to_numpy(dtype=object)]
+    return categorical(codes[rows], uniques), [labels[c] for c in codes[rows].tolist()]
+
+
+def _window_start(kept: np.ndarray, group_start: np.ndarray, window_size: int) -> np.ndarray:
+    """Index into `kept` of the first row in each kept row's window."""
+    return np.searchsorted(kept, np.maximum(group_start, kept - max(int(window_size), 0)), side="left")
+
+
+def _budget_start(texts: list[str], kept: np.ndarray, group_start: np.ndarray, hi: np.ndarray,
+                  context_budget: int, budget_unit: str) -> np.ndarray:
+    """Index into `kept` of the first row each window may hold under the budget."""
+    return budget_starts(texts, np.searchsorted(kept, group_start, side="left"), hi, context_budget, budget_unit)
+
+
+def _base_frame(df: pd.DataFrame, rows: np.ndarray, id_col, text_col) -> pd.DataFrame:
+    return pd.DataFrame({
+        id_col: categorical_take(df[id_col], rows),
+        "Statement": df[text_col].iloc[rows].reset_index(drop=True),
+    })
+
+
+def rolling_context(df: pd.DataFrame, id_col, text_col, window_size: int,
+                    speaker_col=None, speakers=None, context_budget=None, budget_unit="chars") -> pd.DataFrame:
+    """
+    Context = the previous `window_size` rows of the same conversation joined by spaces,
+    dropping the oldest rows while it exceeds `context_budget` characters / tokens.
+    With `speaker_col`, only rows whose speaker is in `speakers` produce output or
+    appear in a window, and `Speaker_History` lists the window's speakers.
+    Output columns: <id_col>, Statement, Context[, Speaker, Speaker_History]
+    """
+    spk_index = _speaker_index(df, speaker_col)
+    kept, group_start, order = _kept_rows(df, id_col, spk_index, speakers)
+    lo = _window_start(kept, group_start, window_size)
+    hi = np.arange(len(kept))  # everything kept before the current row
+
+    rows = order[kept]
+    texts = [str(v) for v in df[text_col].to_numpy(dtype=object)[rows]]
+    if context_budget is not None:
+        lo = np.maximum(lo, _budget_start(texts, kept, group_start, hi, context_budget, budget_unit))
+    result = _base_frame(df, rows, id_col, text_col)
+    result["Context"] = [" ".join(texts[a:b]) for a, b in zip(lo.tolist(), hi.tolist())]
+    if speaker_col:
+        result["Speaker"], spk = _speaker_columns(spk_index, rows)
+        result["Speaker_History"] = [" | ".join(spk[a:b]) for a, b in zip(lo.tolist(), hi.tolist())]
+    return result
+
+
+def rolling_context_sweep(df: pd.DataFrame, id_col, text_col, windows: list[int],
+                          speaker_col=None, speakers=None, layout: str = "wide",
+                          context_budget=None, budget_unit="chars") -> pd.DataFrame:
+    """
+    rolling_context for every window size in `windows` from one pass: the rows are grouped
+    once and each larger window's context extends the smaller one's (see core.sweep).
+    Wide: Context_N<n> (and Speaker_History_N<n>) columns; long: a Window column plus
+    Context (and Speaker_History), one row per statement and window size.
+    """
+    windows = sorted({max(int(n), 0) for n in windows})
+    spk_index = _speaker_index(df, speaker_col)
+    kept, group_start, order = _kept_rows(df, id_col, spk_index, speakers)
+    starts = [_window_start(kept, group_start, n) for n in windows]
+    hi = np.arange(len(kept))
+
+    rows = order[kept]
+    texts = [str(v) for v in df[text_col].to_numpy(dtype=object)[rows]]
+    if context_budget is not None:
+        cap = _budget_start(texts, kept, group_start, hi, context_budget, budget_unit)
+        starts = [np.maximum(s, cap) for s in starts]
+    result = _base_frame(df, rows, id_col, text_col)
+    columns = {"Context": sweep_contexts(texts, starts, hi)}
+    if speaker_col:
+        result["Speaker"], spk = _speaker_columns(spk_index, rows)
+        columns["Speaker_History"] = sweep_contexts(spk, starts, hi, sep=" | ")
+    return sweep_frame(result, windows, columns, layout)
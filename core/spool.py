@@ -0,0 +1,151 @@
+# core/spool.py
+"""
+Uploads spooled to local temp files.
+
+Streamlit hands the pages every upload as an in-memory buffer. `SPOOL.spool()`
+writes it once to a file under SPOOL_DIR and returns a `SpooledUpload`, a
+path-like stand-in that the readers in core.tableio open memory-mapped: the
+parser reads mapped pages instead of a private copy of the bytes, and nothing
+of ours holds on to the upload's buffer once it is spooled.
+
+A file belongs to a (session, slot) pair, the slot naming the uploader. It is
+replaced when the slot's upload changes and removed when the session ends
+(`sweep()`) or the process exits. All spool files together stay under
+SPOOL_LIMIT_BYTES (env UPLOAD_SPOOL_MB): the least recently used files of other
+sessions are dropped to make room, and an upload that still doesn't fit raises
+SpoolLimitError. Readers that already opened a dropped file keep reading it.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "pa7_uploads"))
+SPOOL_LIMIT_BYTES = int(float(os.environ.get("UPLOAD_SPOOL_MB", 4096)) * 2**20)
+
+
+class SpoolLimitError(RuntimeError):
+    """An upload does not fit in the spool's disk limit."""
+
+
+class SpooledUpload(os.PathLike):
+    """Path of a spooled upload, with the upload's name (format detection, labels), file_id and size."""
+
+    def __init__(self, path: str, name: str, file_id, size: int):
+        self.path = path
+        self.name = name
+        self.file_id = file_id
+        self.size = size
+
+    def __fspath__(self) -> str:
+        return self.path
+
+    def __repr__(self) -> str:
+        return f"SpooledUpload({self.name!r} -> {self.path!r})"
+
+
+def _upload_size(upload) -> int:
+    size = getattr(upload, "size", None)
+    if size is not None:
+        return int(size)
+    if hasattr(upload, "getbuffer"):
+        return upload.getbuffer().nbytes
+    upload.seek(0, os.SEEK_END)
+    size = upload.tell()
+    upload.seek(0)
+    return size
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # already gone, or still open elsewhere (Windows)
+
+
+class UploadSpool:
+    """Spool files per (session, slot) under one directory and one disk limit."""
+
+    def __init__(self, directory: str = SPOOL_DIR, limit_bytes: int = SPOOL_LIMIT_BYTES):
+        self.directory = directory
+        self.limit_bytes = limit_bytes
+        self._entries = {}  # (session, slot) -> {"upload": SpooledUpload, "digest": str, "used": float}
+        self._lock = threading.Lock()
+
+    def spool(self, upload, session: str, slot: str) -> SpooledUpload:
+        """The upload's spool file for this session and slot, written on first use."""
+        from core.cache import content_hash  # pulls in pandas; pages import this module before they need it
+
+        digest = content_hash(upload)
+        with self._lock:
+            entry = self._entries.get((session, slot))
+            if entry is not None and entry["digest"] == digest and os.path.exists(entry["upload"].path):
+                entry["used"] = time.time()
+                return entry["upload"]
+            self._remove(session, slot)
+            size = _upload_size(upload)
+            name = getattr(upload, "name", "upload")
+            self._make_room(size, session, name)
+            spooled = SpooledUpload(self._write(upload, name), name, getattr(upload, "file_id", None), size)
+            self._entries[(session, slot)] = {"upload": spooled, "digest": digest, "used": time.time()}
+            return spooled
+
+    def _write(self, upload, name: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(name)[1], dir=self.directory)
+        with os.fdopen(fd, "wb") as fh:
+            if hasattr(upload, "getbuffer"):
+                with upload.getbuffer() as view:
+                    fh.write(view)
+            else:
+                upload.seek(0)
+                shutil.copyfileobj(upload, fh)
+                upload.seek(0)
+        return path
+
+    def _make_room(self, size: int, session: str, name: str) -> None:
+        used = sum(e["upload"].size for e in self._entries.values())
+        others = sorted((e["used"], key) for key, e in self._entries.items() if key[0] != session)
+        while used + size > self.limit_bytes and others:
+            _, key = others.pop(0)
+            used -= self._entries[key]["upload"].size
+            self._remove(*key)
+        if used + size > self.limit_bytes:
+            raise SpoolLimitError(
+                f"{name} ({size / 2**20:,.1f} MB) does not fit in the upload spool "
+                f"({used / 2**20:,.1f} of {self.limit_bytes / 2**20:,.0f} MB in use)")
+
+    def _remove(self, session: str, slot: str) -> None:
+        entry = self._entries.pop((session, slot), None)
+        if entry is not None:
+            _remove_file(entry["upload"].path)
+
+    def release_session(self, session: str) -> None:
+        """Remove every spool file of a session."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == session]:
+                self._remove(*key)
+
+    def sweep(self, is_active) -> int:
+        """Remove the files of sessions for which is_active(session) is false; returns the files removed."""
+        with self._lock:
+            stale = [k for k in self._entries if not is_active(k[0])]
+            for key in stale:
+                self._remove(*key)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(*key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"files": len(self._entries), "bytes": sum(e["upload"].size for e in self._entries.values()),
+                    "limit_bytes": self.limit_bytes}
+
+
+SPOOL = UploadSpool()
+atexit.register(SPOOL.clear)
@@ -0,0 +1,309 @@
+# core/streaming.py
+"""
+Chunked input and spooled output.
+
+`iter_id_chunks()` reads an upload (CSV, Parquet or Arrow IPC) in row chunks
+and never splits an ID group across chunks (the trailing group is carried into
+the next chunk), so the per-ID builders give the same result chunk by chunk.
+The spooled writers (CSV, Parquet, Feather) collect output batches in a temp
+file that stays in memory while small and rolls over to disk when large; it
+backs the download button. The CSV writers can compress on the fly (gzip or
+zstd), batch by batch, so no uncompressed copy of the result is ever held.
+"""
+import gzip
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+
+from core.tableio import _rewind, iter_table_chunks
+
+DEFAULT_CHUNKSIZE = 100_000
+SPOOL_MAX_MEMORY = 32 * 1024 * 1024  # bytes kept in RAM before the spool moves to disk
+COMPRESSIONS = ("gzip", "zstd")
+GZIP_LEVELS = (1, 9)
+DEFAULT_GZIP_LEVEL = 6
+
+
+def read_head(source, nrows: int = 1_000, **read_kwargs) -> pd.DataFrame:
+    """First rows of the upload (for column pickers and previews)."""
+    chunks = iter_table_chunks(source, nrows, **read_kwargs)
+    head = next(chunks, pd.DataFrame())
+    chunks.close()
+    _rewind(source)
+    return head
+
+
+def unique_values(source, col, chunksize: int = DEFAULT_CHUNKSIZE, **read_kwargs) -> list:
+    """Non-null distinct values of one column in order of appearance, read chunk by chunk."""
+    seen = {}
+    for chunk in iter_table_chunks(source, chunksize, columns=[col], **read_kwargs):
+        for v in chunk[col].dropna().unique().tolist():
+            seen.setdefault(v, None)
+    return list(seen)
+
+
+def _tail_run_start(ids: pd.Series) -> int:
+    """Position where the run of rows sharing the last ID begins."""
+    values = ids.to_numpy(dtype=object)
+    last = values[-1]
+    if pd.isna(last):
+        differs = ~pd.isna(values)
+    else:
+        differs = values != last
+    differs = np.asarray(differs, dtype=bool)
+    if not differs.any():
+        return 0
+    return len(values) - int(np.argmax(differs[::-1]))
+
+
+class NonContiguousIDError(ValueError):
+    """Rows of one ID are split by other IDs in a file read in ID chunks."""
+
+
+def iter_id_chunks(source, id_col, chunksize: int = DEFAULT_CHUNKSIZE, **read_kwargs):
+    """
+    Yield DataFrames of about `chunksize` rows holding only complete ID groups.
+    Rows of one ID must be contiguous in the file (e.g. exported per conversation);
+    NonContiguousIDError is raised when an ID already yielded shows up again.
+    CSV columns keep one type for the whole file (see core.tableio.csv_dtypes), so the
+    chunks write out exactly as the fully loaded file would.
+    """
+    done = set()  # IDs of the chunks yielded so far
+
+    def complete(groups: pd.DataFrame) -> pd.DataFrame:
+        ids = groups[id_col].dropna().unique().tolist()
+        repeated = [v for v in ids if v in done]
+        if repeated:
+            raise NonContiguousIDError(
+                f"Rows of {id_col} {repeated[0]!r} are not contiguous in the file; sort it by {id_col} "
+                f"or turn streaming mode off")
+        done.update(ids)
+        return groups
+
+    carry = None
+    for chunk in iter_table_chunks(source, chunksize, stable_types=True, **read_kwargs):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        cut = _tail_run_start(chunk[id_col])
+        carry = chunk.iloc[cut:]
+        if cut:
+            yield complete(chunk.iloc[:cut])
+    if carry is not None and len(carry):
+        yield complete(carry)
+
+
+def iter_frame_batches(df: pd.DataFrame, batch_size: int | None = None):
+    """
+    Yield an in-memory DataFrame in row batches (default DEFAULT_CHUNKSIZE rows). A
+    LazyContextFrame is joined batch by batch, by default in its own smaller batches.
+    """
+    if hasattr(df, "iter_batches"):
+        yield from (df.iter_batches(batch_size) if batch_size else df.iter_batches())
+        return
+    batch_size = batch_size or DEFAULT_CHUNKSIZE
+    for lo in range(0, len(df), batch_size):
+        yield df.iloc[lo:lo + batch_size]
+
+
+class SpooledTable:
+    """
+    Output written batch by batch into a spooled temp file.
+    Keeps the first `preview_rows` rows for display and counts rows written.
+    Subclasses encode one batch in `_write_batch()`.
+    """
+    extension = ""
+    mime = "application/octet-stream"
+
+    def __init__(self, preview_rows: int = 10, max_memory: int = SPOOL_MAX_MEMORY):
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+b")
+        self.preview_rows = preview_rows
+        self.preview = None
+        self.rows = 0
+
+    def _write_batch(self, batch: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def _finish(self) -> None:
+        """Write any trailer (file footers) before the file is read."""
+
+    def write(self, batch: pd.DataFrame) -> None:
+        if batch is None or batch.empty:
+            return
+        self._write_batch(batch)
+        if self.preview is None:
+            self.preview = batch.head(self.preview_rows).reset_index(drop=True)
+        elif len(self.preview) < self.preview_rows:
+            self.preview = pd.concat([self.preview, batch.head(self.preview_rows - len(self.preview))],
+                                     ignore_index=True)
+        self.rows += len(batch)
+
+    def write_all(self, batches) -> "SpooledTable":
+        for batch in batches:
+            self.write(batch)
+        self._finish()
+        return self
+
+    @property
+    def empty(self) -> bool:
+        return self.rows == 0
+
+    def reader(self):
+        """Rewound binary handle; pass the bound method as `st.download_button(data=...)`."""
+        self._finish()
+        self.file.seek(0)
+        return self.file
+
+
+class SpooledCSV(SpooledTable):
+    extension = "csv"
+    mime = "text/csv"
+
+    def _write_batch(self, batch: pd.DataFrame) -> None:
+        self.file.write(batch.to_csv(index=False, header=(self.rows == 0)).encode("utf-8"))
+
+
+class _KeepOpen:
+    """File proxy whose close() only flushes, for writers that close their sink."""
+
+    def __init__(self, file):
+        self._file = file
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    @property
+    def closed(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        self._file.flush()
+
+
+def compressed_stream(file, compression: str, level: int | None = None):
+    """
+    Writable stream compressing into `file` on the fly; close() writes the trailer and
+    leaves `file` open. gzip takes a level (GZIP_LEVELS); zstd is Arrow's streaming
+    encoder at its default level, one frame for the whole output, which every zstd
+    reader decodes in full.
+    """
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=file, mode="wb", mtime=0,
+                             compresslevel=DEFAULT_GZIP_LEVEL if level is None else int(level))
+    if compression == "zstd":
+        return pa.CompressedOutputStream(pa.PythonFile(_KeepOpen(file), mode="w"), "zstd")
+    raise ValueError(f"Unknown compression {compression!r}; expected one of {COMPRESSIONS}")
+
+
+class _SpooledCompressedCSV(SpooledCSV):
+    compression = ""
+
+    def __init__(self, preview_rows: int = 10, max_memory: int = SPOOL_MAX_MEMORY, level: int | None = None):
+        super().__init__(preview_rows, max_memory)
+        self._stream = compressed_stream(self.file, self.compression, level)
+        self._closed = False
+
+    def _write_batch(self, batch: pd.DataFrame) -> None:
+        self._stream.write(batch.to_csv(index=False, header=(self.rows == 0)).encode("utf-8"))
+
+    def _finish(self) -> None:
+        if not self._closed:
+            self._stream.close()
+            self._closed = True
+
+
+class SpooledCSVGzip(_SpooledCompressedCSV):
+    extension = "csv.gz"
+    mime = "application/gzip"
+    compression = "gzip"
+
+
+class SpooledCSVZstd(_SpooledCompressedCSV):
+    extension = "csv.zst"
+    mime = "application/zstd"
+    compression = "zstd"
+
+
+def _is_mixed(col: pd.Series) -> bool:
+    return col.dtype == object or (isinstance(col.dtype, pd.CategoricalDtype) and col.cat.categories.dtype == object)
+
+
+def _plain_field(f: pa.Field) -> pa.Field:
+    # categoricals are written as plain columns: every batch has its own dictionary,
+    # which the IPC file format cannot hold, and readers get the same types as before
+    if pa.types.is_dictionary(f.type):
+        f = f.with_type(f.type.value_type)
+    # a column that is all-null in the first batch is typed as string
+    return f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+
+
+def _arrow_batch(batch: pd.DataFrame, schema: pa.Schema | None) -> pa.Table:
+    """pandas batch -> Arrow table matching `schema`; mixed-type object columns become strings."""
+    try:
+        table = pa.Table.from_pandas(batch, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        fixed = {}
+        for col in [c for c in batch.columns if _is_mixed(batch[c])]:
+            fixed[col] = batch[col].astype(object).map(
+                lambda v: v if v is None or isinstance(v, str) or pd.isna(v) else str(v))
+        table = pa.Table.from_pandas(batch.assign(**fixed), preserve_index=False)
+    if schema is None:
+        schema = pa.schema([_plain_field(f) for f in table.schema])
+    return table.select(schema.names).cast(schema, safe=False)
+
+
+class _SpooledArrow(SpooledTable):
+    def __init__(self, preview_rows: int = 10, max_memory: int = SPOOL_MAX_MEMORY):
+        super().__init__(preview_rows, max_memory)
+        self._writer = None
+        self._schema = None  # IPC writers don't expose theirs
+        self._closed = False
+
+    def _open_writer(self, schema: pa.Schema):
+        raise NotImplementedError
+
+    def _write_batch(self, batch: pd.DataFrame) -> None:
+        table = _arrow_batch(batch, self._schema)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = self._open_writer(table.schema)
+        self._writer.write_table(table)
+
+    def _finish(self) -> None:
+        if self._closed:
+            return
+        if self._writer is None:  # no rows: still produce a valid (empty) file
+            self._writer = self._open_writer(pa.schema([]))
+        self._writer.close()
+        self._closed = True
+
+
+class SpooledParquet(_SpooledArrow):
+    extension = "parquet"
+    mime = "application/vnd.apache.parquet"
+
+    def _open_writer(self, schema: pa.Schema):
+        return pq.ParquetWriter(pa.PythonFile(self.file, mode="w"), schema, compression="zstd")
+
+
+class SpooledFeather(_SpooledArrow):
+    extension = "feather"
+    mime = "application/vnd.apache.arrow.file"
+
+    def _open_writer(self, schema: pa.Schema):
+        return pa.ipc.new_file(pa.PythonFile(self.file, mode="w"), schema,
+                               options=pa.ipc.IpcWriteOptions(compression="zstd"))
+
+
+DOWNLOAD_FORMATS = {"CSV": SpooledCSV, "CSV (gzip)": SpooledCSVGzip, "CSV (zstd)": SpooledCSVZstd,
+                    "Parquet": SpooledParquet, "Feather": SpooledFeather}
+
+
+def spooled_writer(fmt: str = "CSV", preview_rows: int = 10, level: int | None = None) -> SpooledTable:
+    """Writer for one of DOWNLOAD_FORMATS; `level` is the compression level of gzip CSV."""
+    if level is not None and fmt == "CSV (gzip)":
+        return SpooledCSVGzip(preview_rows=preview_rows, level=level)
+    return DOWNLOAD_FORMATS[fmt](preview_rows=preview_rows)
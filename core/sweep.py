@@ -0,0 +1,89 @@
+# core/sweep.py
+"""
+Contexts for several rolling-window sizes in one pass.
+
+For one row, the window of N+k items ends where the window of N items ends
+and starts further back, so its context is the extra items joined in front of
+the smaller window's context. `sweep_contexts` walks the window sizes in
+ascending order and builds every context from the previous one, joining each
+item once per row instead of once per window size.
+
+    wide   one row per statement, a Context_N<n> column per window size
+    long   one row per (statement, window size), with a Window column
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+SWEEP_LAYOUTS = ("wide", "long")
+MAX_SWEEP_WINDOWS = 50
+
+
+def parse_windows(text: str, max_n: int | None = None) -> list[int]:
+    """Window sizes from text such as "1-10" or "1, 2, 5": sorted, without duplicates."""
+    windows = set()
+    text = re.sub(r"\s*-\s*", "-", str(text))
+    for part in filter(None, re.split(r"[,\s]+", text)):
+        m = re.fullmatch(r"(\d+)(?:-(\d+))?", part)
+        if not m:
+            raise ValueError(f"Invalid window size {part!r}; use numbers and ranges like 1-10, 15")
+        lo, hi = int(m.group(1)), int(m.group(2) or m.group(1))
+        if hi < lo:
+            raise ValueError(f"Invalid window range {part!r}")
+        windows.update(range(lo, hi + 1))
+        if len(windows) > MAX_SWEEP_WINDOWS:
+            raise ValueError(f"At most {MAX_SWEEP_WINDOWS} window sizes per sweep")
+    if not windows:
+        raise ValueError("Enter at least one window size")
+    if max_n is not None and max(windows) > max_n:
+        raise ValueError(f"Window sizes must be at most {max_n}")
+    return sorted(windows)
+
+
+def sweep_contexts(items: list, starts: list[np.ndarray], end: np.ndarray, sep: str = " ",
+                   strip: bool = False) -> list[list[str]]:
+    """
+    sep.join(items[starts[k][i]:end[i]]) for every window k and row i. `starts` must be
+    ordered by growing window, so starts[k] <= starts[k-1] elementwise.
+    """
+    out = [[] for _ in starts]
+    ends = end.tolist()
+    starts = [s.tolist() for s in starts]
+    for i, e in enumerate(ends):
+        prev_start, ctx = e, ""
+        for k, s in enumerate(starts):
+            s = s[i]
+            if s < prev_start:  # prepend the items this window adds
+                extra = sep.join(items[s:prev_start])
+                ctx = extra + sep + ctx if prev_start < e else extra
+                prev_start = s
+            out[k].append(ctx)
+    if strip:
+        out = [[c.strip() for c in ctxs] for ctxs in out]
+    return out
+
+
+def sweep_frame(base: pd.DataFrame, windows: list[int], columns: dict[str, list[list[str]]],
+                layout: str = "wide", at: int | None = None) -> pd.DataFrame:
+    """
+    Attach per-window columns to `base` (one row per statement). `columns` maps a column
+    name to its values per window (as from sweep_contexts); they are inserted at position
+    `at` (default: the end).
+    """
+    if layout not in SWEEP_LAYOUTS:
+        raise ValueError(f"Unknown sweep layout {layout!r}; expected one of {SWEEP_LAYOUTS}")
+    at = len(base.columns) if at is None else at
+    base = base.reset_index(drop=True)
+    if layout == "wide":
+        out = base.copy()
+        for name, per_window in reversed(list(columns.items())):
+            for n, values in reversed(list(zip(windows, per_window))):
+                out.insert(at, f"{name}_N{n}", values)
+        return out
+    # long: the rows of one statement stay together, in window order
+    out = base.iloc[np.repeat(np.arange(len(base)), len(windows))].reset_index(drop=True)
+    for name, per_window in reversed(list(columns.items())):
+        out.insert(at, name, [c for row in zip(*per_window) for c in row] if len(base) else [])
+    out.insert(at, "Window", np.tile(np.asarray(windows, dtype=np.int64), len(base)))
+    return out
@@ -0,0 +1,176 @@
+# core/tableio.py
+"""
+Table input in CSV, Parquet and Arrow IPC (Feather) formats.
+
+CSV is parsed with pandas' multithreaded pyarrow engine (falling back to the
+C parser for inputs it rejects), and text columns come back as Arrow-backed
+strings. The chunked readers back the streaming mode of every page. Paths
+(and spooled uploads, see core.spool) are read memory-mapped.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+
+from core.formats import EXTENSIONS, FORMATS, UPLOAD_TYPES
+
+_PARQUET_MAGIC = b"PAR1"
+_ARROW_FILE_MAGIC = b"ARROW1"
+_ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
+
+
+def _rewind(source) -> None:
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def _path(source) -> str | None:
+    """Filesystem path of a path / spooled upload; None for file-like objects."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return None
+
+
+def detect_format(source) -> str:
+    """'csv', 'parquet' or 'feather' from the leading magic bytes, else the file extension."""
+    if hasattr(source, "read"):
+        _rewind(source)
+        magic = source.read(8)
+        _rewind(source)
+    else:
+        with open(source, "rb") as fh:
+            magic = fh.read(8)
+    if magic.startswith(_PARQUET_MAGIC):
+        return "parquet"
+    if magic.startswith(_ARROW_FILE_MAGIC) or magic.startswith(_ARROW_STREAM_MAGIC):
+        return "feather"
+    name = str(getattr(source, "name", source))
+    return EXTENSIONS.get(name.rsplit(".", 1)[-1].lower(), "csv")
+
+
+def string_dtype():
+    """Arrow-backed string dtype with NaN as the missing value (what pandas >= 3 infers)."""
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:  # pandas < 2.3
+        return pd.StringDtype("pyarrow")
+
+
+def arrow_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert object columns that hold only strings (and missing values) to Arrow-backed strings."""
+    target = string_dtype()
+    converted = {}
+    for col in df.columns[(df.dtypes == object).to_numpy()]:
+        values = df[col]
+        if pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+            converted[col] = values.astype(target)
+    return df.assign(**converted) if converted else df
+
+
+def _ipc_table(source) -> pa.Table:
+    path = _path(source)
+    if path is not None:
+        try:
+            return pa.ipc.open_file(pa.memory_map(path)).read_all()
+        except pa.ArrowInvalid:
+            return pa.ipc.open_stream(pa.memory_map(path)).read_all()
+    if hasattr(source, "read"):
+        _rewind(source)
+        data = source.read()
+        _rewind(source)
+    else:
+        with open(source, "rb") as fh:
+            data = fh.read()
+    buf = pa.BufferReader(data)
+    try:
+        return pa.ipc.open_file(buf).read_all()
+    except pa.ArrowInvalid:
+        return pa.ipc.open_stream(pa.BufferReader(data)).read_all()
+
+
+def read_table(source, fmt: str | None = None, **read_kwargs) -> pd.DataFrame:
+    """Read a whole upload / path; `read_kwargs` go to pd.read_csv for CSV input."""
+    fmt = fmt or detect_format(source)
+    path = _path(source)
+    _rewind(source)
+    if fmt == "parquet":
+        df = pd.read_parquet(path, memory_map=True) if path is not None else pd.read_parquet(source)
+    elif fmt == "feather":
+        df = _ipc_table(source).to_pandas()
+    else:
+        try:
+            df = pd.read_csv(pa.memory_map(path) if path is not None else source, engine="pyarrow", **read_kwargs)
+        except (ValueError, pa.ArrowException):
+            # options or malformed rows the Arrow reader doesn't handle
+            _rewind(source)
+            df = pd.read_csv(path, memory_map=True, **read_kwargs) if path is not None \
+                else pd.read_csv(source, **read_kwargs)
+    _rewind(source)
+    return arrow_strings(df)
+
+
+def _csv_reader(source, chunksize: int, columns=None, **read_kwargs):
+    path = _path(source)
+    _rewind(source)
+    if path is not None:
+        return pd.read_csv(path, chunksize=chunksize, usecols=columns, memory_map=True, **read_kwargs)
+    return pd.read_csv(source, chunksize=chunksize, usecols=columns, **read_kwargs)
+
+
+def _unified_dtype(a, b):
+    """A dtype holding the values of columns read as `a` in one chunk and `b` in another."""
+    if a == b:
+        return a
+    numeric = [pd.api.types.is_numeric_dtype(d) and not pd.api.types.is_bool_dtype(d) for d in (a, b)]
+    return np.dtype("float64") if all(numeric) else np.dtype(object)
+
+
+def csv_dtypes(source, chunksize: int, columns=None, **read_kwargs) -> dict:
+    """
+    Column dtypes for reading a CSV chunk by chunk with the same types in every chunk: the
+    parser's per-chunk inference unified over the whole file (integers with floats give
+    float64, any other mix str). Costs one extra parsing pass.
+    """
+    dtypes = {}
+    with _csv_reader(source, chunksize, columns, **read_kwargs) as reader:
+        for chunk in reader:
+            for col, dtype in chunk.dtypes.items():
+                dtypes[col] = _unified_dtype(dtypes[col], dtype) if col in dtypes else dtype
+    _rewind(source)
+    return {col: str if dtype == object else dtype for col, dtype in dtypes.items()}
+
+
+def iter_table_chunks(source, chunksize: int, fmt: str | None = None, columns=None, stable_types: bool = False,
+                      **read_kwargs):
+    """
+    Yield DataFrames of at most `chunksize` rows, read incrementally. CSV columns are typed
+    per chunk unless `stable_types` (or `dtype=`) fixes one type per column for the whole
+    file (see csv_dtypes); Parquet and Feather carry their schema.
+    """
+    fmt = fmt or detect_format(source)
+    path = _path(source)
+    _rewind(source)
+    if fmt == "parquet":
+        parquet = pq.ParquetFile(path, memory_map=True) if path is not None else pq.ParquetFile(source)
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            yield arrow_strings(batch.to_pandas())
+    elif fmt == "feather":
+        table = _ipc_table(source)  # slicing the decoded table is zero-copy
+        if columns is not None:
+            table = table.select(columns)
+        for lo in range(0, table.num_rows, chunksize):
+            yield arrow_strings(table.slice(lo, chunksize).to_pandas())
+    else:
+        if stable_types and "dtype" not in read_kwargs:
+            read_kwargs["dtype"] = csv_dtypes(source, chunksize, columns, **read_kwargs)
+        reader = _csv_reader(source, chunksize, columns, **read_kwargs)
+        try:
+            for chunk in reader:
+                yield arrow_strings(chunk)
+        finally:
+            # an abandoned reader's text wrapper would close the upload when collected
+            reader.close()
+    _rewind(source)
@@ -0,0 +1,141 @@
+# core/tokenizer.py
+"""
+Batch sentence tokenizer shared by the tokenizer pages.
+
+`tokenize()` is the per-text reference; `tokenize_frame()` applies the same
+rules to a whole text column at once (split -> explode -> filter) and builds
+the output columns directly instead of one dict per sentence. Distinct
+texts are tokenized once and memoized (core.cache.TEXT_MEMO), so duplicate
+posts cost a dictionary lookup. The speaker column is factorized once and
+filtered through its codes (core.columnar.selection_mask).
+"""
+import re
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from core.cache import TEXT_MEMO, TextMemo
+from core.columnar import categorical, categorical_take, selection_mask
+
+# -----------------------
+# Rules
+# -----------------------
+HASHTAG_RE = re.compile(r"#\w+")
+BR_RE = re.compile(r"<br\s*/?>", flags=re.IGNORECASE)
+
+# streamlit_app.py: split after . ! ? when the next sentence starts upper-case
+BASIC_SPLIT_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z])")
+# pages/sentence_tokenizer_app.py: also split on , ; : and <br>
+PAGE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|[,;:]|\[BR\]")
+PAGE_PUNCT_RE = re.compile(r"[.?!,:;\"'\-]+")
+
+RULES = ("basic", "page")
+
+
+def _check_rules(rules: str) -> None:
+    if rules not in RULES:
+        raise ValueError(f"Unknown tokenizer rules {rules!r}; expected one of {RULES}")
+
+
+def tokenize(text, rules: str = "basic") -> list[str]:
+    """Split one text into sentences; hashtags are appended as a final sentence."""
+    _check_rules(rules)
+    text = str(text).strip()
+    tags = HASHTAG_RE.findall(text)
+    clean = HASHTAG_RE.sub("", text)
+    if rules == "basic":
+        parts = BASIC_SPLIT_RE.split(clean)
+        parts = [p.strip() for p in parts if p.strip()]
+    else:
+        clean = BR_RE.sub(" [BR] ", clean)
+        parts = PAGE_SPLIT_RE.split(clean)
+        parts = [p.strip() for p in parts if p.strip() and not PAGE_PUNCT_RE.fullmatch(p)]
+    if tags:
+        parts.append(" ".join(tags))
+    return parts
+
+
+def _tokenize_many(texts: list[str], rules: str) -> list[list[str]]:
+    """tokenize() of every text at once (split -> explode -> filter), one sentence list per text."""
+    # object dtype keeps every .str op on Python's `re` (no RE2 fallback rules)
+    text = pd.Series(texts, dtype=object).str.strip()
+
+    tags = text.str.findall(HASHTAG_RE)
+    clean = text.str.replace(HASHTAG_RE, "", regex=True)
+    if rules == "basic":
+        parts = clean.str.split(BASIC_SPLIT_RE, regex=True).explode()
+        keep = parts.str.strip() != ""
+    else:
+        clean = clean.str.replace(BR_RE, " [BR] ", regex=True)
+        parts = clean.str.split(PAGE_SPLIT_RE, regex=True).explode()
+        # the punctuation check runs on the unstripped part, as in tokenize()
+        keep = (parts.str.strip() != "") & ~parts.str.fullmatch(PAGE_PUNCT_RE).astype(bool)
+    parts = parts[keep].str.strip()
+
+    has_tags = tags.str.len() > 0
+    tag_sents = tags[has_tags].str.join(" ")
+
+    rows = np.concatenate([parts.index.to_numpy(), tag_sents.index.to_numpy()]).astype(np.int64)
+    sents = np.concatenate([parts.to_numpy(dtype=object), tag_sents.to_numpy(dtype=object)])
+    # stable sort keeps sentence order and puts the hashtag sentence last per text
+    order = np.argsort(rows, kind="stable")
+    sents = sents[order].tolist()
+    ends = np.cumsum(np.bincount(rows, minlength=len(texts))).tolist()
+    return [sents[a:b] for a, b in zip([0] + ends[:-1], ends)]
+
+
+def tokenize_column(texts: pd.Series, rules: str = "basic", memo: TextMemo | None = TEXT_MEMO) -> pd.DataFrame:
+    """
+    Tokenize a whole text column.
+    Returns one row per sentence with columns `row` (position in `texts`),
+    `Sentence ID` (1-based within the row) and `Statement`, ordered by row.
+    Each distinct text is tokenized once and looked up in `memo` across calls.
+    """
+    _check_rules(rules)
+    # Python-level str() keeps NaN -> "nan" exactly like the per-row version
+    text = [str(v) for v in texts.tolist()]
+    if memo is None:
+        segs = _tokenize_many(text, rules)
+    else:
+        segs = memo.map(("tokenize", rules), text, lambda distinct: _tokenize_many(distinct, rules))
+
+    lengths = np.fromiter(map(len, segs), dtype=np.int64, count=len(segs))
+    starts = np.cumsum(lengths) - lengths
+    n = int(lengths.sum())
+    return pd.DataFrame({
+        "row": np.repeat(np.arange(len(segs), dtype=np.int64), lengths),
+        "Sentence ID": np.arange(n, dtype=np.int64) - np.repeat(starts, lengths) + 1,
+        "Statement": np.fromiter(chain.from_iterable(segs), dtype=object, count=n),
+    })
+
+
+def tokenize_frame(df: pd.DataFrame, id_col, text_col, speaker_col=None,
+                   rules: str = "basic", speakers=None) -> pd.DataFrame:
+    """
+    Sentence-level output for a DataFrame.
+    Output columns: ID, Sentence ID, Context, Statement[, Speaker]
+    `speakers` (with `speaker_col`) keeps only rows whose speaker is listed.
+    """
+    if speaker_col:
+        spk_codes, spk_uniques = pd.factorize(df[speaker_col], sort=False)
+        if speakers is not None:
+            keep = selection_mask(spk_codes, spk_uniques, speakers)
+            if not keep.all():  # every row's speaker selected (the page default): nothing to drop
+                positions = np.flatnonzero(keep)
+                df, spk_codes = df.iloc[positions], spk_codes[positions]
+
+    sents = tokenize_column(df[text_col], rules=rules)
+    rows = sents["row"].to_numpy()
+
+    # ID, Speaker and Context (the source text, shared by all its sentences) repeat
+    # across rows, so they are stored once per distinct value
+    result = pd.DataFrame({
+        "ID": categorical_take(df[id_col], rows),
+        "Sentence ID": sents["Sentence ID"],
+        "Context": categorical_take(df[text_col], rows),
+        "Statement": sents["Statement"],
+    })
+    if speaker_col:
+        result["Speaker"] = categorical(spk_codes[rows], spk_uniques)
+    return result
@@ -0,0 +1,241 @@
+# core/ui.py
+"""
+Small Streamlit widgets shared by the pages.
+
+Importing this module loads no pandas / pyarrow: widgets import the processing
+modules they need when they are drawn, so a page's header and uploader reach
+the browser before those libraries load (see benchmarks/pages.py).
+"""
+import uuid
+from typing import TYPE_CHECKING
+
+import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from core.profiling import PERF_LOG, StageProfiler, trace_memory
+from core.spool import SPOOL, SpoolLimitError
+
+if TYPE_CHECKING:
+    from core.budget import ContextSizes
+    from core.streaming import SpooledTable
+
+
+def show_cache_stats() -> None:
+    """Cache hit/miss counters and memory use (results and the per-text memo), in the sidebar."""
+    from core.cache import CACHE, TEXT_MEMO
+
+    stats = CACHE.stats()
+    with st.sidebar.expander("🗄️ Cache"):
+        st.caption(
+            f"{stats['hits']} hits · {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate) · "
+            f"{stats['evictions']} evictions"
+        )
+        st.caption(
+            f"{stats['entries']}/{stats['max_entries']} entries · "
+            f"{stats['bytes'] / 2**20:,.1f}/{stats['max_bytes'] / 2**20:,.0f} MB"
+        )
+        memo = TEXT_MEMO.stats()
+        st.caption(
+            f"Text memo: {memo['hits']:,} hits · {memo['misses']:,} misses ({memo['hit_rate']:.0%} hit rate) · "
+            f"{memo['entries']:,} texts · {memo['evictions']:,} evictions"
+        )
+        spool = SPOOL.stats()
+        st.caption(
+            f"Upload spool: {spool['files']} files · "
+            f"{spool['bytes'] / 2**20:,.1f}/{spool['limit_bytes'] / 2**20:,.0f} MB on disk"
+        )
+        if st.button("Clear cache", key="clear_cache"):
+            CACHE.clear()
+            TEXT_MEMO.clear()
+
+
+def _session_active(session: str) -> bool:
+    return not runtime.exists() or runtime.get_instance().is_active_session(session)
+
+
+def spooled_upload(upload, slot: str):
+    """
+    The upload spooled to a temp file that the readers memory-map (core.spool), or the
+    upload itself when the spool's disk limit leaves no room. `slot` names the uploader.
+    Spool files of ended sessions are removed on the way.
+    """
+    if upload is None:
+        return None
+    SPOOL.sweep(_session_active)
+    ctx = get_script_run_ctx()
+    try:
+        return SPOOL.spool(upload, ctx.session_id if ctx else "local", slot)
+    except SpoolLimitError as e:
+        st.caption(f"⚠️ {e}; reading it from memory instead.")
+        return upload
+
+
+def download_format_picker(key: str | None = None) -> tuple[str, int | None]:
+    """Selectbox for the download format (a key of DOWNLOAD_FORMATS), plus the level for gzip CSV."""
+    from core.streaming import DEFAULT_GZIP_LEVEL, DOWNLOAD_FORMATS, GZIP_LEVELS
+
+    fmt = st.selectbox("Download format", list(DOWNLOAD_FORMATS), key=key,
+                       help="Parquet and Feather are columnar and much smaller for large results; "
+                            "compressed CSV shrinks the repetitive context columns many times over")
+    level = None
+    if fmt == "CSV (gzip)":
+        level = st.slider("Compression level", *GZIP_LEVELS, value=DEFAULT_GZIP_LEVEL,
+                          key=f"{key}_level" if key else None, help="1 is fastest, 9 gives the smallest file")
+    return fmt, level
+
+
+def context_budget_picker(what: str = "rows") -> tuple[int | None, str]:
+    """Toggle plus budget and unit for capping context size; (None, unit) when off."""
+    from core.budget import BUDGET_UNITS, MAX_BUDGET
+
+    budget, unit = None, "chars"
+    if st.toggle("📏 Cap context size", value=False,
+                 help=f"Drop the oldest {what} from each context until it fits a character or token budget"):
+        col1, col2 = st.columns(2)
+        with col1:
+            budget = int(st.number_input("Context budget", min_value=0, max_value=MAX_BUDGET, value=1000, step=100))
+        with col2:
+            unit = st.radio("Budget unit", BUDGET_UNITS, horizontal=True,
+                            format_func={"chars": "Characters", "tokens": "Whitespace tokens"}.get)
+    return budget, unit
+
+
+def show_context_sizes(sizes: "ContextSizes") -> None:
+    """Distribution of the built contexts' sizes, for sizing downstream batches."""
+    summary = sizes.summary()
+    if summary.empty:
+        return
+    unit = "characters" if sizes.unit == "chars" else "tokens"
+    with st.expander(f"📏 Context sizes ({unit})"):
+        st.dataframe(summary, hide_index=True)
+        hist = sizes.histogram()
+        st.bar_chart(hist.set_index("size"), x_label=f"{unit} (bin start)", y_label="contexts")
+
+
+def download_result(label: str, result: "SpooledTable", file_stem: str, **kwargs) -> None:
+    """Download button backed by a spooled result file; the bytes are read on click."""
+    st.download_button(
+        label=label,
+        data=result.reader,
+        file_name=f"{file_stem}.{result.extension}",
+        mime=result.mime,
+        on_click="ignore",
+        **kwargs
+    )
+
+
+def stage_profiler(page: str) -> StageProfiler:
+    """Sidebar notes on the Performance settings, and the profiler for this rerun."""
+    memory = trace_memory()
+    with st.sidebar.expander("⏱️ Performance"):
+        # server settings only: visitors must not pick files the server writes to
+        st.caption("Peak memory: tracked (PERF_MEMORY)" if memory else
+                   "Peak memory: off (start the app with PERF_MEMORY=1 to track it)")
+        st.caption(f"Stage metrics are appended to `{PERF_LOG}`" if PERF_LOG else
+                   "Stage metrics log: off (start the app with PERF_LOG=/path/to/perf.jsonl)")
+    return StageProfiler(page, memory=memory, log_path=PERF_LOG)
+
+
+def show_performance(prof: StageProfiler) -> None:
+    """Collapsible per-stage timing table; also finishes the profiler (JSON lines, tracing)."""
+    prof.close()
+    rows = prof.rows()
+    if not rows:
+        return
+    with st.expander("⏱️ Performance"):
+        st.dataframe(prof.frame(), hide_index=True, use_container_width=True)
+        st.caption(f"Total {sum(r['wall_s'] for r in rows):.3f}s wall · {sum(r['cpu_s'] for r in rows):.3f}s CPU · "
+                   "times exclude nested stages")
+
+
+def live_preview(df, fn, group_col=None, order: str = "rows", n_rows: int | None = None,
+                 from_head: bool = False, input_hash=None, **params) -> None:
+    """
+    Partial preview of fn(df, **params) computed from the first rows / ID groups only,
+    so checking the column choices doesn't need a full run. With `input_hash` (anything
+    identifying df and whatever fn closes over) the preview is cached, so reruns that
+    change nothing it depends on redraw it without recomputing.
+    """
+    from core.cache import CACHE, make_key
+    from core.preview import PREVIEW_ROWS, lazy_preview
+
+    if not st.toggle("👀 Live preview", value=True, key="live_preview",
+                     help="Preview the first rows from a small part of the data; the full result is built on Run"):
+        return
+    n_rows = PREVIEW_ROWS if n_rows is None else n_rows
+
+    def compute():
+        return lazy_preview(df, fn, group_col=group_col, n_rows=n_rows, order=order, **params)
+
+    if input_hash is None:
+        pv = compute()
+    else:
+        pv = CACHE.get_or_compute(make_key("preview", input_hash, fn.__module__, fn.__qualname__, group_col, order,
+                                           n_rows, **params), compute)
+    unit = "rows" if order == "rows" else "IDs"
+    where = " of the first rows of the file" if from_head else ""
+    if pv["complete"] and not from_head:
+        label = f"Preview (complete input, {pv['seconds']:.2f}s)"
+    else:
+        label = f"Partial preview: first {pv['units']:,} of {pv['total_units']:,} {unit}{where} ({pv['seconds']:.2f}s)"
+    if pv["timed_out"]:
+        label += " · stopped at the time budget"
+    st.caption(label)
+    st.dataframe(pv["frame"], use_container_width=True)
+
+
+def job_owner() -> str:
+    """Owner token for background jobs, kept in the URL so a reloaded or reconnected tab finds its jobs."""
+    token = st.query_params.get("session")
+    if not token:
+        token = uuid.uuid4().hex[:16]
+        st.query_params["session"] = token
+    return token
+
+
+def submit_job(page: str, label: str, task, unit: str = "ID groups") -> None:
+    """Queue `task` (see core.jobs) for this session; the jobs panel shows its progress."""
+    from core.jobs import JOBS, JobLimitError
+
+    try:
+        JOBS.submit(job_owner(), page, label, task, unit=unit)
+    except JobLimitError as e:
+        st.warning(str(e))
+
+
+def jobs_panel(page: str, file_stem: str) -> None:
+    """Progress, cancel and download for this session's background jobs of `page`; polls while any is active."""
+    from core.jobs import JOBS
+
+    owner = job_owner()
+    active = any(j.active for j in JOBS.jobs(owner, page))
+
+    @st.fragment(run_every=1.0 if active else None)
+    def panel():
+        jobs = JOBS.jobs(owner, page)
+        if not jobs:
+            return
+        st.subheader("🧵 Background jobs")
+        for job in jobs:
+            with st.container(border=True):
+                st.markdown(f"**{job.label}** · {job.status} · {job.elapsed:.1f}s")
+                if job.active:
+                    if job.progress is not None:
+                        st.progress(job.progress, text=f"{job.done:,} / {job.total:,} {job.unit}")
+                    else:
+                        st.caption(f"{job.done:,} {job.unit} processed")
+                    if st.button("Cancel", key=f"cancel_{job.id}"):
+                        job.cancel()
+                elif job.status == "done":
+                    st.caption(f"{job.result.rows:,} rows")
+                    download_result(f"⬇️ Download {job.result.extension}", job.result, file_stem, key=f"dl_{job.id}")
+                elif job.status == "failed":
+                    st.error(job.error)
+                if not job.active and st.button("Dismiss", key=f"dismiss_{job.id}"):
+                    JOBS.remove(job.id)
+                    st.rerun(scope="fragment")
+        if not any(j.active for j in jobs) and active:
+            st.rerun()  # the last job finished: stop polling
+
+    panel()
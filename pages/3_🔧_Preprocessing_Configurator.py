@@ -1,202 +1,42 @@
 # pages/3_🔧_Preprocessing_Configurator.py
-import re
-import io
-import pandas as pd
 import streamlit as st
 
-st.set_page_config(page_title="Pre-processing Configurator", layout="wide")
-
-# -----------------------
-# Helpers
-# -----------------------
-HASHTAG_RE = re.compile(r"#\w+")
-PUNCT_ONLY_RE = re.compile(r"^[\W_]+$")  # strings with no letters/digits after strip
-
-def split_sentences_basic(text: str) -> list[str]:
-    """Minimalist sentence splitter on ., !, ? plus newlines. Keeps order, trims blanks."""
-    if not isinstance(text, str):
-        return []
-    # normalize newlines to space to avoid empty splits
-    text = text.replace("\n", " ").strip()
-    # put a space after sentence enders to improve splitting on multiple punctuations
-    # then split on (?<=[.!?])\s+
-    parts = re.split(r'(?<=[.!?])\s+', text)
-    # Clean and filter
-    return [p.strip() for p in parts if p and not PUNCT_ONLY_RE.match(p.strip())]
-
-def extract_hashtags(text: str) -> list[str]:
-    if not isinstance(text, str):
-        return []
-    return HASHTAG_RE.findall(text)
-
-def remove_hashtags(text: str) -> str:
-    if not isinstance(text, str):
-        return ""
-    return HASHTAG_RE.sub("", text)
-
-def is_punct_only(s: str) -> bool:
-    s = (s or "").strip()
-    return (not s) or bool(PUNCT_ONLY_RE.match(s))
-
-def join_context(lines: list[str]) -> str:
-    lines = [ln for ln in lines if ln and not is_punct_only(ln)]
-    return " ".join(lines).strip()
-
-def build_rows_sentence_level_chat(df, id_col, text_col, turn_col=None, speaker_col=None,
-                                   rolling_N=2, whole_context=False,
-                                   keep_hashtags=True, combine_hashtags=True):
-    """
-    Build sentence-level rows for one-to-one chat.
-    Output columns: ID, Turn, Sentence, Speaker, Context, Statement
-    """
-    out = []
-
-    # Group by ID (chat)
-    for chat_id, g in df.groupby(id_col, sort=False):
-        # sort by turn if provided; else keep input order as "turn"
-        if turn_col and turn_col in g.columns:
-            g = g.sort_values(by=turn_col, kind="stable")
-            turns = list(g[turn_col].tolist())
-        else:
-            g = g.reset_index(drop=True)
-            turns = list(range(1, len(g) + 1))
-
-        turn_texts = g[text_col].fillna("").tolist()
-        speakers = g[speaker_col].fillna("").tolist() if speaker_col and speaker_col in g.columns else [""] * len(g)
-
-        # Build a flat list of (turn_no, speaker, sentence_list)
-        flat_sentences = []  # [(turn, speaker, sentence_text), ...]
-        for t_no, spk, raw in zip(turns, speakers, turn_texts):
-            tags = extract_hashtags(raw) if keep_hashtags else []
-            nohash = remove_hashtags(raw) if keep_hashtags else raw
-
-            # split into sentences
-            sents = split_sentences_basic(nohash)
-
-            # optionally append hashtags as one consolidated sentence or many
-            if keep_hashtags and tags:
-                if combine_hashtags:
-                    sents.append(" ".join(tags))
-                else:
-                    sents.extend(tags)
-
-            # filter punctuation-only (after hashtag handling)
-            sents = [s for s in sents if not is_punct_only(s)]
-
-            for s in sents:
-                flat_sentences.append((t_no, spk, s))
-
-        # Build rolling/whole context for each sentence
-        for idx, (t_no, spk, stmt) in enumerate(flat_sentences, start=1):
-            if whole_context:
-                # context = ALL previous + current within the chat (up to the final post/chat if desired)
-                ctx_list = [s for _, _, s in flat_sentences[:idx]]
-            else:
-                # rolling N previous sentences *before* current
-                start = max(0, idx - (rolling_N + 1))  # include up to N previous sentences
-                ctx_list = [s for _, _, s in flat_sentences[start:idx]]
-
-            context_text = join_context(ctx_list)
+from core.formats import UPLOAD_TYPES
+from core.ui import (context_budget_picker, download_format_picker, download_result, jobs_panel, live_preview,
+                     show_cache_stats, show_context_sizes, show_performance, spooled_upload, stage_profiler,
+                     submit_job)
 
-            out.append({
-                "ID": chat_id,
-                "Turn": t_no,
-                "Sentence": idx,       # sentence index within the chat stream
-                "Speaker": spk,
-                "Context": context_text,
-                "Statement": stmt
-            })
-    return pd.DataFrame(out)
-
-def build_rows_turn_level_chat(df, id_col, text_col, turn_col=None, speaker_col=None,
-                               rolling_N=2, whole_context=False):
-    """
-    Turn-level statements (each row is the whole turn text).
-    """
-    out = []
-    for chat_id, g in df.groupby(id_col, sort=False):
-        if turn_col and turn_col in g.columns:
-            g = g.sort_values(by=turn_col, kind="stable")
-            turns = g[turn_col].tolist()
-        else:
-            g = g.reset_index(drop=True)
-            turns = list(range(1, len(g) + 1))
-
-        texts = g[text_col].fillna("").tolist()
-        speakers = g[speaker_col].fillna("").tolist() if speaker_col and speaker_col in g.columns else [""] * len(g)
-
-        # Build context per turn
-        for i, (t_no, spk, txt) in enumerate(zip(turns, speakers, texts), start=1):
-            if whole_context:
-                ctx_list = texts[:i]  # up to current
-            else:
-                start = max(0, i - 1 - rolling_N)  # N previous turns only
-                ctx_list = texts[start:i]
-
-            out.append({
-                "ID": chat_id,
-                "Turn": t_no,
-                "Sentence": i,         # here, Sentence ID mirrors the turn index
-                "Speaker": spk,
-                "Context": join_context(ctx_list),
-                "Statement": txt.strip()
-            })
-    res = pd.DataFrame(out)
-    # drop punctuation-only statement rows
-    if not res.empty:
-        res = res[~res["Statement"].map(is_punct_only)]
-    return res
-
-def build_rows_sentence_level_post(df, id_col, text_col,
-                                   rolling_N=2, whole_context=False,
-                                   keep_hashtags=True, combine_hashtags=True):
-    """
-    One-to-many (social post): no speaker, no true turn;
-    Turn and Sentence indices are the same by spec.
-    """
-    out = []
-    for post_id, g in df.groupby(id_col, sort=False):
-        raw = " ".join(g[text_col].fillna("").astype(str).tolist())  # if multiple rows per ID, concatenate
-        tags = extract_hashtags(raw) if keep_hashtags else []
-        nohash = remove_hashtags(raw) if keep_hashtags else raw
-        sents = split_sentences_basic(nohash)
-
-        if keep_hashtags and tags:
-            if combine_hashtags:
-                sents.append(" ".join(tags))
-            else:
-                sents.extend(tags)
-
-        sents = [s for s in sents if not is_punct_only(s)]
-
-        for i, stmt in enumerate(sents, start=1):
-            if whole_context:
-                ctx_list = sents[:i]
-            else:
-                start = max(0, i - 1 - rolling_N)
-                ctx_list = sents[start:i]
-
-            out.append({
-                "ID": post_id,
-                "Turn": i,
-                "Sentence": i,
-                "Speaker": "salesperson",  # per brief example; can be left blank if preferred
-                "Context": join_context(ctx_list),
-                "Statement": stmt
-            })
-    return pd.DataFrame(out)
+st.set_page_config(page_title="Pre-processing Configurator", layout="wide")
 
 # -----------------------
 # UI
 # -----------------------
 st.title("Pre‑processing Configurator")
+prof = stage_profiler("preprocessing_configurator")
 st.caption("Choose statement & context cuts; handle hashtags; output standardized schema (ID, Turn, Sentence, Speaker, Context, Statement).")
 
-uploaded = st.file_uploader("Upload a CSV", type=["csv"])
+uploaded = spooled_upload(st.file_uploader("Upload a CSV, Parquet or Feather file", type=UPLOAD_TYPES), "upload")
+
+# Processing modules (pandas, pyarrow) load once the uploader is on screen
+from core.budget import ContextSizes
+from core.cache import cached_call, content_hash, read_table_cached
+from core.incremental import (DEFAULT_STORE_DIR, STORE_LIMIT_BYTES, STORE_MAX_AGE, build_incremental, prune_stores,
+                              store_path, summarize)
+from core.jobs import chunked_build_task, private_copy, sharded_build_task
+from core.pipeline import build_staged, sweep_staged
+from core.preprocess import build_sweep, select_builder
+from core.streaming import NonContiguousIDError, iter_frame_batches, iter_id_chunks, read_head, spooled_writer
+from core.sweep import SWEEP_LAYOUTS, parse_windows
 
 if uploaded:
-    df = pd.read_csv(uploaded)
-    st.success(f"Loaded {len(df):,} rows.")
+    stream = st.toggle("Streaming mode (process the file in chunks; rows of each ID must be contiguous)", value=False)
+    with prof.stage("read head" if stream else "read") as rec:
+        df = cached_call(content_hash(uploaded), read_head, uploaded) if stream else read_table_cached(uploaded)
+        rec["rows"] = len(df)
+    if stream:
+        st.success("Streaming mode: the file is read in chunks when the dataset is built.")
+    else:
+        st.success(f"Loaded {len(df):,} rows.")
     with st.expander("Preview source (first 20 rows)"):
         st.dataframe(df.head(20), use_container_width=True)
 
@@ -220,8 +60,22 @@ if uploaded:
     context_cut = st.radio("Context cut", ["Rolling window up to statement", "Whole chat/post"], horizontal=True)
     whole_context = (context_cut == "Whole chat/post")
     rolling_N = 2
+    windows = None  # window sizes of a sweep
     if not whole_context:
-        rolling_N = st.number_input("Rolling window size (number of previous sentences/turns)", min_value=0, max_value=50, value=2, step=1)
+        sweep = st.toggle("Sweep several window sizes in one pass", value=False)
+        if sweep:
+            windows_text = st.text_input("Window sizes (e.g. 1-10 or 1, 2, 5)", value="1-10")
+            try:
+                windows = parse_windows(windows_text, max_n=50)
+            except ValueError as e:
+                st.error(str(e))
+                windows = []
+            sweep_layout = st.radio("Sweep output", SWEEP_LAYOUTS, horizontal=True,
+                                    format_func={"wide": "Wide (a Context_N column per size)",
+                                                 "long": "Long (a row per size, with a Window column)"}.get)
+        else:
+            rolling_N = st.number_input("Rolling window size (number of previous sentences/turns)", min_value=0, max_value=50, value=2, step=1)
+    context_budget, budget_unit = context_budget_picker("sentences/turns")
 
     st.divider()
     st.subheader("Hashtag & cleaning rules")
@@ -231,80 +85,110 @@ if uploaded:
     st.caption("Punctuation-only statements will be removed automatically.")
 
     st.divider()
+    builder, params = select_builder(
+        "post" if data_type == "One-to-many (post)" else "chat",
+        "sentence" if statement_cut == "Sentence-level" else "turn",
+        id_col, text_col, turn_col=turn_col, speaker_col=speaker_col,
+        rolling_N=rolling_N, whole_context=whole_context,
+        keep_hashtags=keep_hashtags, combine_hashtags=combine_hashtags,
+        context_budget=context_budget, budget_unit=budget_unit
+    )
+    # a sweep segments once and builds every window size from the same sentence stream
+    build_fn, build_params = builder, params
+    if windows is not None:
+        build_fn, build_params = build_sweep, dict(params, builder=builder, windows=windows, layout=sweep_layout)
+    if id_col and text_col and windows != []:
+        live_preview(df, build_fn, group_col=id_col, order="first", n_rows=50, from_head=stream,
+                     input_hash=(content_hash(uploaded), stream), **build_params)
+
+    download_format, download_level = download_format_picker()
+    incremental = False
+    if not stream:
+        incremental = st.toggle("♻️ Incremental mode", value=False,
+                                help="Keep the output in a local store; on the next upload of the growing file only "
+                                     "IDs whose rows changed or were added are rebuilt")
+    if incremental:
+        store_name = st.text_input("Store name", value=uploaded.name.rsplit(".", 1)[0],
+                                   help=f"Stores live under {DEFAULT_STORE_DIR}; use the same name for every "
+                                        f"upload of the growing file. Stores unused for {STORE_MAX_AGE / 86_400:g} "
+                                        f"days, or the least recently used beyond {STORE_LIMIT_BYTES / 2**20:,.0f} MB "
+                                        "in all, are removed")
+        try:
+            store_dir = store_path(store_name)
+            st.caption(f"Store: `{store_dir}`")
+        except ValueError as e:
+            st.error(str(e))
+            store_dir = None
+        background = False
+    else:
+        background = st.toggle("🧵 Run in background", value=False,
+                               help="Build on the server's job pool with progress and cancel; the result stays "
+                                    "downloadable for an hour, also after reloading this page")
     run = st.button("▶️ Build pre‑processed dataset")
 
     if run:
         if not id_col or not text_col:
             st.error("Please choose ID and Text columns.")
+        elif windows == []:
+            st.error("Please enter valid window sizes for the sweep.")
+        elif incremental and store_dir is None:
+            st.error("Please choose a valid store name.")
+        elif background:
+            writer = spooled_writer(download_format, preview_rows=50, level=download_level)
+            if stream:
+                source = private_copy(uploaded)
+                task = chunked_build_task(iter_id_chunks(source, id_col), build_fn, build_params, writer,
+                                          sources=[source])
+            else:
+                task = sharded_build_task(df, build_fn, build_params, writer, id_col)
+            cut = context_cut if windows is None else f"sweep {windows_text}"
+            submit_job("configurator", f"{uploaded.name} · {statement_cut} · {cut}", task,
+                       unit="rows" if stream else "ID groups")
         else:
-            if data_type == "One-to-many (post)":
-                # post: Turn/Post-level just means "don’t split sentences"—but PA7 examples expect sentence-level for posts.
-                if statement_cut == "Sentence-level":
-                    res = build_rows_sentence_level_post(
-                        df, id_col, text_col,
-                        rolling_N=rolling_N, whole_context=whole_context,
-                        keep_hashtags=keep_hashtags, combine_hashtags=combine_hashtags
-                    )
-                else:
-                    # Post-level: treat entire post as one statement (turn/sentence=1)
-                    out = []
-                    for post_id, g in df.groupby(id_col, sort=False):
-                        raw = " ".join(g[text_col].fillna("").astype(str).tolist())
-                        if keep_hashtags:
-                            raw_nohash = remove_hashtags(raw)
-                            tags = extract_hashtags(raw)
-                            if combine_hashtags and tags:
-                                raw_nohash = (raw_nohash + " " + " ".join(tags)).strip()
-                            elif tags:
-                                # add as separate rows below (turn=2..)
-                                rows = [raw_nohash] + ([" ".join(tags)] if combine_hashtags else tags)
-                            else:
-                                rows = [raw_nohash]
-                        else:
-                            rows = [raw]
-
-                        rows = [r for r in rows if not is_punct_only(r)]
-                        for i, stmt in enumerate(rows, start=1):
-                            ctx_list = rows[:i] if whole_context else rows[max(0, i-1-rolling_N):i]
-                            out.append({
-                                "ID": post_id,
-                                "Turn": i,
-                                "Sentence": i,
-                                "Speaker": "salesperson",
-                                "Context": join_context(ctx_list),
-                                "Statement": stmt
-                            })
-                    res = pd.DataFrame(out)
-
+            # contexts are joined batch by batch while the output is spooled
+            if stream:
+                chunks = prof.iterate("read", iter_id_chunks(uploaded, id_col))
+                built = prof.iterate("build rows", (build_fn(chunk, **build_params) for chunk in chunks))
+            elif incremental:
+                with prof.stage("incremental build") as rec:
+                    input_cols = [c for c in (id_col, text_col, turn_col, speaker_col) if c]
+                    result, report = build_incremental(df, build_fn, build_params, store_dir, input_cols)
+                    rec["rows"] = len(result)
+                st.info(f"♻️ {summarize(report)}")
+                # stores of every visitor share one directory: expire old ones and cap the total
+                if store_dir in prune_stores(keep=store_dir):
+                    st.warning(f"The store alone exceeds the {STORE_LIMIT_BYTES / 2**20:,.0f} MB store limit and "
+                               "was not kept; the next upload is built in full.")
+                built = [result]
+            elif windows is not None:
+                built = [sweep_staged(df, content_hash(uploaded), builder, params, windows, sweep_layout, prof=prof)]
             else:
-                # one-to-one (chat)
-                if statement_cut == "Sentence-level":
-                    res = build_rows_sentence_level_chat(
-                        df, id_col, text_col, turn_col=turn_col, speaker_col=speaker_col,
-                        rolling_N=rolling_N, whole_context=whole_context,
-                        keep_hashtags=keep_hashtags, combine_hashtags=combine_hashtags
-                    )
-                else:
-                    res = build_rows_turn_level_chat(
-                        df, id_col, text_col, turn_col=turn_col, speaker_col=speaker_col,
-                        rolling_N=rolling_N, whole_context=whole_context
-                    )
+                # segmentation and the sentence stream are reused when only the context cut changes
+                built = [build_staged(df, content_hash(uploaded), builder, params, prof=prof)]
+            batches = prof.iterate("join contexts", (batch for res in built for batch in iter_frame_batches(res)))
+            sizes = ContextSizes(budget_unit)
+            batches = sizes.track(batches)
+            with prof.stage("write") as rec:
+                try:
+                    res = spooled_writer(download_format, preview_rows=50, level=download_level).write_all(batches)
+                except NonContiguousIDError as e:
+                    st.error(str(e))
+                    st.stop()
+                rec["rows"] = res.rows
 
             if res.empty:
                 st.warning("No rows produced. Check your column selections and options.")
             else:
-                st.success(f"Built {len(res):,} rows.")
-                st.dataframe(res.head(50), use_container_width=True)
+                st.success(f"Built {res.rows:,} rows.")
+                st.dataframe(res.preview, use_container_width=True)
+                show_context_sizes(sizes)
 
                 # Download
-                buf = io.StringIO()
-                res.to_csv(buf, index=False)
-                st.download_button(
-                    label="💾 Download CSV",
-                    data=buf.getvalue(),
-                    file_name="preprocessed_PA7.csv",
-                    mime="text/csv"
-                )
+                download_result(f"💾 Download {download_format}", res, "preprocessed_PA7")
 
 else:
     st.info("Upload a CSV to begin.")
+
+jobs_panel("configurator", "preprocessed_PA7")
+show_performance(prof)
+show_cache_stats()
@@ -1,39 +1,157 @@
 import streamlit as st
-import pandas as pd
-from io import StringIO
+
+from core.formats import UPLOAD_TYPES
+from core.ui import (download_format_picker, download_result, jobs_panel, live_preview, show_cache_stats,
+                     show_performance, spooled_upload, stage_profiler, submit_job)
 
 st.set_page_config(page_title="CSV Joiner App", layout="wide")
 st.title("🔗 CSV Joiner App")
+prof = stage_profiler("csv_joiner")
 
 with st.expander("ℹ️ How to Use This App"):
     st.markdown("""
-    1. **Upload two CSV files** using the uploaders below.
+    1. **Upload two CSV files** (Parquet and Feather also work) using the uploaders below.
     2. **Preview the files** to ensure correct data.
     3. **Select join keys** from each file.
     4. **Choose a join type**: `inner`, `left`, or `right`.
-    5. **Click 'Join Tables'** to merge the files.
-    6. **Download the joined result** using the provided button.
+    5. **Check the preflight**: overlapping keys and the exact number of rows each join type produces.
+       For very large files, **Approximate** key profiling estimates the same numbers from fixed-size
+       sketches (HyperLogLog, sampling, count sketch) in a fraction of the time and memory.
+    6. **Click 'Join Tables'** to merge the files.
+    7. **Download the joined result** using the provided button.
+
+    Keys are compared as trimmed text (`1`, `1.0` and ` 1 ` match); rows with an empty key never match.
+    For files too large for memory, turn on **Out-of-core join**.
+    To chain several files (e.g. transcripts, speaker metadata, labels), turn on **Join more than two files**:
+    each file after the first is joined to an earlier one, and the plan with estimated row counts is shown
+    before you run it.
     """)
 
-# Upload first CSV
-st.subheader("📄 Upload FIRST CSV File")
-file1 = st.file_uploader("Choose the first CSV file", type=["csv"], key="file1")
-df1 = None
-if file1 is not None:
-    df1 = pd.read_csv(file1)
-    st.success(f"✅ Loaded {file1.name} with {df1.shape[0]} rows and {df1.shape[1]} columns")
-    with st.expander("Preview FIRST CSV"):
-        st.dataframe(df1.head())
-
-# Upload second CSV
-st.subheader("📄 Upload SECOND CSV File")
-file2 = st.file_uploader("Choose the second CSV file", type=["csv"], key="file2")
-df2 = None
-if file2 is not None:
-    df2 = pd.read_csv(file2)
-    st.success(f"✅ Loaded {file2.name} with {df2.shape[0]} rows and {df2.shape[1]} columns")
-    with st.expander("Preview SECOND CSV"):
-        st.dataframe(df2.head())
+LARGE_RESULT_ROWS = 5_000_000
+
+multi = st.toggle("🧩 Join more than two files", value=False,
+                  help="Upload several files and chain their joins in memory, with a plan ordered by estimated size")
+out_of_core = False
+if not multi:
+    out_of_core = st.toggle("💽 Out-of-core join", value=False,
+                            help="Partition both files to disk by key and join one partition at a time. "
+                                 "Memory stays bounded; result rows come out grouped by key partition.")
+
+if multi:
+    # -----------------------
+    # N files: join specs, plan, in-memory execution
+    # -----------------------
+    st.subheader("📚 Upload the files to join")
+    files = st.file_uploader("Choose two or more files", type=UPLOAD_TYPES, accept_multiple_files=True, key="files")
+    files = [spooled_upload(f, f"files_{i}") for i, f in enumerate(files or [])]
+
+    # Processing modules (pandas, pyarrow) load once the uploader is on screen
+    from core.cache import cached_call, content_hash, read_table_cached
+    from core.join import JOIN_TYPES, key_counts
+    from core.joinplan import execute_plan, plan_frame, plan_joins, table_labels
+    from core.streaming import iter_frame_batches, spooled_writer
+
+    if files and len(files) >= 2:
+        labels = table_labels([f.name for f in files])
+        frames = []
+        for f, label in zip(files, labels):
+            with prof.stage(f"read {label}") as rec:
+                frames.append(read_table_cached(f))
+                rec["rows"] = len(frames[-1])
+        st.success("✅ Loaded " + ", ".join(f"{label} ({len(f):,} rows)" for label, f in zip(labels, frames)))
+
+        st.subheader("🔧 Join Settings")
+        specs = []
+        for t in range(1, len(frames)):
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                other = st.selectbox(f"Join {labels[t]} to", list(range(t)), format_func=lambda i: labels[i],
+                                     key=f"join_to_{t}")
+            with col2:
+                left_key = st.selectbox(f"Key in {labels[other]}", frames[other].columns.tolist(), key=f"left_key_{t}")
+            with col3:
+                right_key = st.selectbox(f"Key in {labels[t]}", frames[t].columns.tolist(), key=f"right_key_{t}")
+            with col4:
+                how = st.selectbox(f"Join type for {labels[t]}", JOIN_TYPES, key=f"how_{t}")
+            specs.append({"left": other, "left_key": left_key, "right": t, "right_key": right_key, "how": how})
+        normalize = st.checkbox("Normalize keys (compare as trimmed text)", value=True, key="multi_normalize")
+        download_format, download_level = download_format_picker(key="multi_format")
+
+        hashes = [content_hash(f) for f in files]
+        with prof.stage("key counts"):
+            counts = {}
+            for spec in specs:
+                for t, key in ((spec["left"], spec["left_key"]), (spec["right"], spec["right_key"])):
+                    counts[(t, key)] = cached_call((hashes[t], key), key_counts, frames[t][key], normalize=normalize)
+        with prof.stage("plan"):
+            steps = plan_joins(counts, [len(f) for f in frames], specs, labels)
+
+        st.markdown("**🗺️ Join plan**")
+        st.dataframe(plan_frame(steps, labels))
+        if all(spec["how"] == "inner" for spec in specs):
+            st.caption("Inner joins only: the plan joins the smallest estimated results first. "
+                       "Rows are ordered by the first file's rows, then the next file's, whatever the plan.")
+        else:
+            st.caption("Left/right joins depend on their order, so the joins run as listed.")
+        expected_rows = steps[-1]["estimated_rows"]
+        confirmed = True
+        if expected_rows > LARGE_RESULT_ROWS:
+            confirmed = st.checkbox(f"I understand the joins are estimated to produce {expected_rows:,} rows",
+                                    key="multi_confirm")
+
+        if st.button("🚀 Join Tables", disabled=not confirmed, key="multi_join"):
+            with prof.stage("join") as rec:
+                result = execute_plan(frames, steps, labels, normalize=normalize)
+                rec["rows"] = len(result)
+            st.success(f"✅ Join finished! Rows: {result.shape[0]}, Columns: {result.shape[1]}")
+            with prof.stage("write") as rec:
+                joined = spooled_writer(download_format, preview_rows=0, level=download_level).write_all(
+                    iter_frame_batches(result))
+                rec["rows"] = joined.rows
+            with st.expander("🔎 Preview Joined Result"):
+                st.dataframe(result.head(10))
+            download_result(f"⬇️ Download Joined {download_format}", joined, 'joined_result')
+
+df1 = df2 = None
+if not multi:
+    # Upload first CSV
+    st.subheader("📄 Upload FIRST CSV File")
+    file1 = spooled_upload(st.file_uploader("Choose the first CSV file", type=UPLOAD_TYPES, key="file1"), "file1")
+
+    # Processing modules (pandas, pyarrow) load once the first uploader is on screen
+    from core.cache import cached_call, content_hash, read_table_cached
+    from core.jobs import batches_task, private_copy
+    from core.join import (DEFAULT_PARTITIONS, JOIN_TYPES, iter_join_chunks, join_frames, key_counts,
+                           key_counts_chunked, partitioned_join, preflight)
+    from core.keysketch import SKETCH_ROWS, sketch_keys, sketch_keys_chunked, sketch_preflight
+    from core.streaming import iter_frame_batches, read_head, spooled_writer
+
+    df1 = None
+    if file1 is not None:
+        with prof.stage("read FIRST") as rec:
+            df1 = cached_call(content_hash(file1), read_head, file1) if out_of_core else read_table_cached(file1)
+            rec["rows"] = len(df1)
+        if out_of_core:
+            st.success(f"✅ Loaded {file1.name} with {df1.shape[1]} columns")
+        else:
+            st.success(f"✅ Loaded {file1.name} with {df1.shape[0]} rows and {df1.shape[1]} columns")
+        with st.expander("Preview FIRST CSV"):
+            st.dataframe(df1.head())
+
+    # Upload second CSV
+    st.subheader("📄 Upload SECOND CSV File")
+    file2 = spooled_upload(st.file_uploader("Choose the second CSV file", type=UPLOAD_TYPES, key="file2"), "file2")
+    df2 = None
+    if file2 is not None:
+        with prof.stage("read SECOND") as rec:
+            df2 = cached_call(content_hash(file2), read_head, file2) if out_of_core else read_table_cached(file2)
+            rec["rows"] = len(df2)
+        if out_of_core:
+            st.success(f"✅ Loaded {file2.name} with {df2.shape[1]} columns")
+        else:
+            st.success(f"✅ Loaded {file2.name} with {df2.shape[0]} rows and {df2.shape[1]} columns")
+        with st.expander("Preview SECOND CSV"):
+            st.dataframe(df2.head())
 
 if df1 is not None and df2 is not None:
     st.subheader("🔧 Join Settings")
@@ -43,24 +161,107 @@ if df1 is not None and df2 is not None:
     with col2:
         key2 = st.selectbox("Select join key from SECOND file", df2.columns.tolist())
     with col3:
-        join_type = st.selectbox("Select join type", ['inner', 'left', 'right'])
-
-    if st.button("🚀 Join Tables"):
-        df1_key = df1[key1].astype(str).str.strip()
-        df2_key = df2[key2].astype(str).str.strip()
-        overlap = set(df1_key) & set(df2_key)
-        st.info(f"🔍 Number of overlapping keys: {len(overlap)}")
-
-        result = pd.merge(df1, df2, left_on=key1, right_on=key2, how=join_type)
-        st.success(f"✅ Join finished! Rows: {result.shape[0]}, Columns: {result.shape[1]}")
-
-        with st.expander("🔎 Preview Joined Result"):
-            st.dataframe(result.head(10))
-
-        csv = result.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="⬇️ Download Joined CSV",
-            data=csv,
-            file_name='joined_result.csv',
-            mime='text/csv',
-        )
+        join_type = st.selectbox("Select join type", JOIN_TYPES)
+    normalize = st.checkbox("Normalize keys (compare as trimmed text)", value=True)
+    large = out_of_core or max(len(df1), len(df2)) > SKETCH_ROWS
+    profiling = st.radio("Key profiling", ["Exact", "Approximate"], index=1 if large else 0, horizontal=True,
+                         help="Exact counts every key; Approximate estimates overlap, distinct keys, hot keys "
+                              "and output sizes from fixed-size sketches (typically within a few percent)")
+    approximate = profiling == "Approximate"
+    download_format, download_level = download_format_picker()
+
+    # -----------------------
+    # Preflight: key multiplicities and exact output size, before any join
+    # -----------------------
+    h1, h2 = content_hash(file1), content_hash(file2)
+    with prof.stage("key counts"):
+        if approximate and out_of_core:
+            left_sketch = cached_call(h1, sketch_keys_chunked, file1, key=key1, normalize=normalize)
+            right_sketch = cached_call(h2, sketch_keys_chunked, file2, key=key2, normalize=normalize)
+        elif approximate:
+            left_sketch = cached_call((h1, key1), sketch_keys, df1[key1], normalize=normalize)
+            right_sketch = cached_call((h2, key2), sketch_keys, df2[key2], normalize=normalize)
+        elif out_of_core:
+            left_counts, left_missing = cached_call(h1, key_counts_chunked, file1, key=key1, normalize=normalize)
+            right_counts, right_missing = cached_call(h2, key_counts_chunked, file2, key=key2, normalize=normalize)
+        else:
+            left_counts = cached_call((h1, key1), key_counts, df1[key1], normalize=normalize)
+            right_counts = cached_call((h2, key2), key_counts, df2[key2], normalize=normalize)
+            left_missing, right_missing = int(df1[key1].isna().sum()), int(df2[key2].isna().sum())
+    with prof.stage("preflight"):
+        pair = (h1, h2, key1, key2, normalize, out_of_core)
+        if approximate:
+            pf = cached_call(pair, sketch_preflight, left_sketch, right_sketch)
+        else:
+            pf = cached_call(pair, preflight, left_counts, right_counts, left_missing, right_missing)
+
+    about = "≈ " if approximate else ""
+    st.info(f"🔍 Number of overlapping keys: {about}{pf['overlap_keys']:,} "
+            f"(of {about}{pf['left_keys']:,} in FIRST, {about}{pf['right_keys']:,} in SECOND)")
+    st.caption(" · ".join(f"{how}: {about}{rows:,} rows" for how, rows in pf["rows"].items())
+               + (" · estimated from key sketches" if approximate else ""))
+    expected_rows = pf["rows"][join_type]
+    if pf["many_to_many_keys"]:
+        st.warning(f"⚠️ {about}{pf['many_to_many_keys']:,} keys repeat in both files, so their rows multiply "
+                   f"(up to {about}{pf['max_left_multiplicity']} × {pf['max_right_multiplicity']}).")
+        with st.expander("🔢 Keys producing the most rows"):
+            st.dataframe(pf["top_keys"])
+
+    if not out_of_core:
+        # inner/left results follow the FIRST file's row order, right results the SECOND's
+        settings = (h1, h2, key1, key2, join_type, normalize)
+        if join_type == "right":
+            live_preview(df2, lambda sub: join_frames(df1, sub, key1, key2, how=join_type, normalize=normalize),
+                         input_hash=settings)
+        else:
+            live_preview(df1, lambda sub: join_frames(sub, df2, key1, key2, how=join_type, normalize=normalize),
+                         input_hash=settings)
+
+    confirmed = True
+    if expected_rows > LARGE_RESULT_ROWS:
+        confirmed = st.checkbox(f"I understand the {join_type} join will produce {expected_rows:,} rows")
+
+    background = st.toggle("🧵 Run in background", value=False,
+                           help="Join on the server's job pool with progress and cancel; the result stays "
+                                "downloadable for an hour, also after reloading this page")
+
+    if st.button("🚀 Join Tables", disabled=not confirmed):
+        if background:
+            writer = spooled_writer(download_format, preview_rows=10, level=download_level)
+            if out_of_core:
+                sources = [private_copy(file1), private_copy(file2)]
+                batches = partitioned_join(*sources, key1, key2, how=join_type, normalize=normalize)
+                task, unit = batches_task(batches, writer, DEFAULT_PARTITIONS, sources=sources), "partitions"
+            else:
+                batches = iter_join_chunks(df1, df2, key1, key2, how=join_type, normalize=normalize, n_chunks=10)
+                task, unit = batches_task(batches, writer, 10), "chunks"
+            submit_job("csv_joiner", f"{file1.name} ⋈ {file2.name} · {join_type}", task, unit=unit)
+        else:
+            if out_of_core:
+                with st.spinner("Partitioning and joining..."), prof.stage("write") as rec:
+                    joined = spooled_writer(download_format, preview_rows=10, level=download_level).write_all(prof.iterate(
+                        "join", partitioned_join(file1, file2, key1, key2, how=join_type, normalize=normalize)
+                    ))
+                    rec["rows"] = joined.rows
+                st.success(f"✅ Join finished! Rows: {joined.rows}")
+                preview = joined.preview
+            else:
+                with prof.stage("join") as rec:
+                    result = cached_call((h1, h2), join_frames, df1, df2, key1=key1, key2=key2,
+                                         how=join_type, normalize=normalize)
+                    rec["rows"] = len(result)
+                st.success(f"✅ Join finished! Rows: {result.shape[0]}, Columns: {result.shape[1]}")
+                with prof.stage("write") as rec:
+                    joined = spooled_writer(download_format, preview_rows=0, level=download_level).write_all(
+                        iter_frame_batches(result))
+                    rec["rows"] = joined.rows
+                preview = result.head(10)
+
+            with st.expander("🔎 Preview Joined Result"):
+                st.dataframe(preview)
+
+            download_result(f"⬇️ Download Joined {download_format}", joined, 'joined_result')
+
+jobs_panel("csv_joiner", "joined_result")
+show_performance(prof)
+show_cache_stats()
@@ -1,8 +1,12 @@
 import streamlit as st
-import pandas as pd
-from io import StringIO
+
+from core.formats import UPLOAD_TYPES
+from core.ui import (context_budget_picker, download_format_picker, download_result, jobs_panel, live_preview,
+                     show_cache_stats, show_context_sizes, show_performance, spooled_upload, stage_profiler,
+                     submit_job)
 
 st.title("🧠 Rolling Context")
+prof = stage_profiler("rolling_context")
 
 with st.expander("ℹ️ How to Use This App"):
     st.markdown("""
@@ -12,16 +16,35 @@ with st.expander("ℹ️ How to Use This App"):
        - Choose the ID column that groups the conversations.
        - Choose the column containing the statements or sentences.
        - Optionally, select a speaker column and filter which speakers to include.
-    4. **Set the window size**: Define how many previous rows should be included as context.
+    4. **Set the window size**: Define how many previous rows should be included as context,
+       or turn on the sweep to build several window sizes (e.g. 1-10) in one pass.
+       **Cap context size** additionally drops the oldest rows until a context fits a character or token budget.
     5. **Click 'Generate Context'**: The app will process the data and display the result.
     6. **Download the result**: Save the processed data to your computer as a CSV file.
     """)
 
 # Step 1: Upload CSV
-uploaded_file = st.file_uploader("📁 Upload your CSV file:", type="csv")
+uploaded_file = spooled_upload(st.file_uploader("📁 Upload your CSV, Parquet or Feather file:", type=UPLOAD_TYPES),
+                               "upload")
+
+# Processing modules (pandas, pyarrow) load once the uploader is on screen
+from core.budget import ContextSizes
+from core.cache import cached_call, content_hash, read_table_cached
+from core.columnar import distinct_values
+from core.jobs import chunked_build_task, private_copy, sharded_build_task
+from core.rolling import rolling_context, rolling_context_sweep
+from core.streaming import (NonContiguousIDError, iter_frame_batches, iter_id_chunks, read_head, spooled_writer,
+                            unique_values)
+from core.sweep import SWEEP_LAYOUTS, parse_windows
 
 if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file)
+    stream = st.toggle("🌊 Streaming mode", value=False,
+                       help="Process the file in chunks to keep memory bounded. Rows of each ID must be "
+                            "contiguous; conversations are output in file order instead of sorted by ID.")
+    with prof.stage("read head" if stream else "read") as rec:
+        df = cached_call(content_hash(uploaded_file), read_head, uploaded_file) if stream \
+            else read_table_cached(uploaded_file)
+        rec["rows"] = len(df)
     st.success("✅ File loaded!")
 
     # Preview uploaded data
@@ -35,55 +58,95 @@ if uploaded_file is not None:
 
     selected_speakers = []
     if speaker_col != "(None)":
-        unique_speakers = df[speaker_col].dropna().unique().tolist()
+        with prof.stage("speakers"):
+            if stream:
+                unique_speakers = cached_call(content_hash(uploaded_file), unique_values, uploaded_file, col=speaker_col)
+            else:
+                unique_speakers = cached_call((content_hash(uploaded_file), speaker_col), distinct_values, df[speaker_col])
         selected_speakers = st.multiselect("Select Speaker(s) to include:", options=unique_speakers, default=unique_speakers)
 
-    # Step 3: Window size
-    window_size = st.number_input("Set Window Size:", min_value=0, value=3, step=1)
+    # Step 3: Window size (or several, built in one pass)
+    sweep = st.toggle("🔁 Sweep several window sizes", value=False,
+                      help="Build the contexts for every listed window size in one pass over the data")
+    params = dict(
+        id_col=id_col, text_col=text_col,
+        speaker_col=None if speaker_col == "(None)" else speaker_col,
+        speakers=selected_speakers
+    )
+    windows = None
+    if sweep:
+        windows_text = st.text_input("Window sizes (e.g. 1-10 or 1, 2, 5):", value="1-10")
+        try:
+            windows = parse_windows(windows_text)
+        except ValueError as e:
+            st.error(str(e))
+        layout = st.radio("Sweep output:", SWEEP_LAYOUTS, horizontal=True,
+                          format_func={"wide": "Wide (a Context_N column per size)",
+                                       "long": "Long (a row per size, with a Window column)"}.get)
+        rolling_fn = rolling_context_sweep
+        params.update(windows=windows, layout=layout)
+        window_label = f"windows {windows_text}"
+    else:
+        window_size = st.number_input("Set Window Size:", min_value=0, value=3, step=1)
+        rolling_fn = rolling_context
+        params.update(window_size=window_size)
+        window_label = f"window {window_size}"
+    context_budget, budget_unit = context_budget_picker("rows")
+    if context_budget is not None:
+        params.update(context_budget=context_budget, budget_unit=budget_unit)
+        window_label += f" · ≤ {context_budget:,} {budget_unit}"
+    ready = not sweep or windows is not None
+
+    if ready:
+        live_preview(df, rolling_fn, group_col=id_col, order="sorted", from_head=stream,
+                     input_hash=(content_hash(uploaded_file), stream), **params)
+
+    download_format, download_level = download_format_picker()
+    background = st.toggle("🧵 Run in background", value=False,
+                           help="Build on the server's job pool with progress and cancel; the result stays "
+                                "downloadable for an hour, also after reloading this page")
 
     # Step 4: Generate Context
     if st.button("🚀 Generate Context"):
-        st.info("Processing...")
-
-        df_sorted = df.sort_values(by=[id_col]).reset_index(drop=True)
-        result_rows = []
-
-        for conv_id in df_sorted[id_col].unique():
-            conv_df = df_sorted[df_sorted[id_col] == conv_id].reset_index(drop=True)
-            for i in range(len(conv_df)):
-                current_row = conv_df.loc[i]
-
-                if speaker_col != "(None)" and current_row[speaker_col] not in selected_speakers:
-                    continue
-
-                past_window = conv_df.loc[max(0, i - window_size):i - 1]
-                if speaker_col != "(None)":
-                    past_window = past_window[past_window[speaker_col].isin(selected_speakers)]
-
-                context = " ".join(past_window[text_col].astype(str).tolist())
-                entry = {
-                    id_col: conv_id,
-                    'Statement': current_row[text_col],
-                    'Context': context
-                }
-
-                if speaker_col != "(None)":
-                    entry['Speaker'] = current_row[speaker_col]
-                    speaker_history = " | ".join(past_window[speaker_col].astype(str).tolist())
-                    entry['Speaker_History'] = speaker_history
-
-                result_rows.append(entry)
-
-        context_df = pd.DataFrame(result_rows)
-
-        st.success("✅ Done! Here's a preview:")
-        st.dataframe(context_df.head(10))
-
-        # Step 5: Download CSV
-        csv = context_df.to_csv(index=False)
-        st.download_button(
-            label="📥 Download CSV",
-            data=csv,
-            file_name='rolling_context_output.csv',
-            mime='text/csv'
-        )
+        if not ready:
+            st.error("Please enter valid window sizes for the sweep.")
+        elif background:
+            writer = spooled_writer(download_format, preview_rows=10, level=download_level)
+            if stream:
+                source = private_copy(uploaded_file)
+                task = chunked_build_task(iter_id_chunks(source, id_col), rolling_fn, params, writer, sources=[source])
+            else:
+                task = sharded_build_task(df, rolling_fn, params, writer, id_col, sort_ids=True)
+            submit_job("rolling_context", f"{uploaded_file.name} · {window_label}", task,
+                       unit="rows" if stream else "ID groups")
+        else:
+            st.info("Processing...")
+
+            if stream:
+                chunks = prof.iterate("read", iter_id_chunks(uploaded_file, id_col))
+                batches = prof.iterate("rolling context", (rolling_fn(chunk, **params) for chunk in chunks))
+            else:
+                with prof.stage("rolling context") as rec:
+                    rolled = cached_call(content_hash(uploaded_file), rolling_fn, df, **params)
+                    rec["rows"] = len(rolled)
+                batches = iter_frame_batches(rolled)
+            sizes = ContextSizes(budget_unit)
+            with prof.stage("write") as rec:
+                try:
+                    context_out = spooled_writer(download_format, preview_rows=10,
+                                                 level=download_level).write_all(sizes.track(batches))
+                except NonContiguousIDError as e:
+                    st.error(str(e))
+                    st.stop()
+                rec["rows"] = context_out.rows
+
+            st.success("✅ Done! Here's a preview:")
+            st.dataframe(context_out.preview)
+            show_context_sizes(sizes)
+
+            # Step 5: Download
+            download_result(f"📥 Download {download_format}", context_out, 'rolling_context_output')
+
+jobs_panel("rolling_context", "rolling_context_output")
+show_performance(prof)
+show_cache_stats()
@@ -1,12 +1,15 @@
 import streamlit as st
-import pandas as pd
-import re
+
+from core.formats import UPLOAD_TYPES
+from core.ui import (download_format_picker, download_result, live_preview, show_cache_stats, show_performance,
+                     spooled_upload, stage_profiler)
 
 # Page Config
 st.set_page_config(page_title="Sentence Tokenizer", layout="wide")
 
 # Title and Intro
 st.title("📝 Sentence Tokenizer")
+prof = stage_profiler("sentence_tokenizer")
 
 with st.expander("ℹ️ How to Use This App"):
     st.markdown("""
@@ -23,11 +26,23 @@ with st.expander("ℹ️ How to Use This App"):
 
 # Upload CSV
 st.subheader("📁 Upload CSV File")
-uploaded_file = st.file_uploader("Choose your CSV file", type="csv")
+uploaded_file = spooled_upload(st.file_uploader("Choose your CSV, Parquet or Feather file", type=UPLOAD_TYPES), "upload")
+
+# Processing modules (pandas, pyarrow) load once the uploader is on screen
+from core.cache import cached_call, content_hash, read_table_cached
+from core.columnar import distinct_values
+from core.streaming import DEFAULT_CHUNKSIZE, iter_frame_batches, read_head, spooled_writer, unique_values
+from core.tableio import iter_table_chunks
+from core.tokenizer import tokenize_frame
 
 if uploaded_file:
+    stream = st.toggle("🌊 Streaming mode", value=False,
+                       help="Read the upload and write the result in chunks to keep memory bounded on very large files")
     with st.spinner("Reading CSV file..."):
-        df = pd.read_csv(uploaded_file)
+        with prof.stage("read head" if stream else "read") as rec:
+            df = cached_call(content_hash(uploaded_file), read_head, uploaded_file) if stream \
+                else read_table_cached(uploaded_file)
+            rec["rows"] = len(df)
         cols = df.columns.tolist()
 
     st.success("File uploaded successfully!")
@@ -41,58 +56,45 @@ if uploaded_file:
 
     selected_speakers = []
     if speaker_col:
-        unique_speakers = df[speaker_col].dropna().unique().tolist()
+        with prof.stage("speakers"):
+            if stream:
+                unique_speakers = cached_call(content_hash(uploaded_file), unique_values, uploaded_file, col=speaker_col)
+            else:
+                unique_speakers = cached_call((content_hash(uploaded_file), speaker_col), distinct_values, df[speaker_col])
         selected_speakers = st.multiselect("🎯 Choose speakers to include", unique_speakers, default=unique_speakers)
 
-    run_button = st.button("🚀 Run Tokenization")
-
-    def tokenize(text):
-        text = str(text).strip()
-        tags = re.findall(r'#\w+', text)
-        clean = re.sub(r'#\w+', '', text)
-
-        # Replace <br> with sentence split marker
-        clean = re.sub(r'<br\s*/?>', ' [BR] ', clean, flags=re.IGNORECASE)
+    params = dict(
+        id_col=id_col, text_col=context_col, speaker_col=speaker_col, rules="page",
+        speakers=selected_speakers if speaker_col else None
+    )
+    live_preview(df, tokenize_frame, from_head=stream, input_hash=(content_hash(uploaded_file), stream), **params)
 
-        # Initial split by punctuation and markers
-        parts = re.split(r'(?<=[.!?])\s+|[,;:]|\[BR\]', clean)
-        parts = [p.strip() for p in parts if p.strip() and not re.fullmatch(r'[.?!,:;"\'\-]+', p)]
-
-        if tags:
-            parts.append(' '.join(tags))
-        return parts
+    download_format, download_level = download_format_picker()
+    run_button = st.button("🚀 Run Tokenization")
 
     if run_button:
         with st.spinner("Tokenizing sentences..."):
-            data = []
-            for _, row in df.iterrows():
-                if speaker_col and row[speaker_col] not in selected_speakers:
-                    continue
-                sentences = tokenize(row[context_col])
-                for i, s in enumerate(sentences, 1):
-                    entry = {
-                        'ID': row[id_col],
-                        'Sentence ID': i,
-                        'Context': row[context_col],
-                        'Statement': s
-                    }
-                    if speaker_col:
-                        entry['Speaker'] = row[speaker_col]
-                    data.append(entry)
-
-            result = pd.DataFrame(data)
+            if stream:
+                # rows are tokenized one by one, so chunks need not hold whole IDs
+                chunks = prof.iterate("read", iter_table_chunks(uploaded_file, DEFAULT_CHUNKSIZE, stable_types=True))
+                batches = prof.iterate("tokenize", (tokenize_frame(chunk, **params) for chunk in chunks))
+            else:
+                with prof.stage("tokenize") as rec:
+                    tokens = cached_call(content_hash(uploaded_file), tokenize_frame, df, **params)
+                    rec["rows"] = len(tokens)
+                batches = iter_frame_batches(tokens)
+            with prof.stage("write") as rec:
+                result = spooled_writer(download_format, preview_rows=10, level=download_level).write_all(batches)
+                rec["rows"] = result.rows
 
         st.success("✅ Tokenization complete!")
         st.subheader("🔍 Preview of Results")
-        st.write(f"Total tokenized sentences: {len(result)}")
-        st.dataframe(result.head(10), use_container_width=True)
-
-        csv = result.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Download Tokenized CSV",
-            data=csv,
-            file_name='sentence_tokenized.csv',
-            mime='text/csv'
-        )
+        st.write(f"Total tokenized sentences: {result.rows}")
+        st.dataframe(result.preview, use_container_width=True)
+
+        download_result(f"📥 Download Tokenized {download_format}", result, 'sentence_tokenized')
 else:
     st.info("Please upload a CSV file to get started.")
+
+show_performance(prof)
+show_cache_stats()
@@ -1,10 +1,12 @@
 import streamlit as st
-import pandas as pd
-import re
-from io import StringIO
+
+from core.formats import UPLOAD_TYPES
+from core.ui import (download_format_picker, download_result, live_preview, show_cache_stats, show_performance,
+                     spooled_upload, stage_profiler)
 
 # Title
 st.title("Sentence Tokenizer")
+prof = stage_profiler("sentence_tokenizer_basic")
 
 # Introduction and App Flow
 st.markdown("""
@@ -19,10 +21,20 @@ You can optionally include a speaker column. The steps are as follows:
 """)
 
 # File upload
-uploaded_file = st.file_uploader("Upload your CSV file", type="csv")
+uploaded_file = spooled_upload(st.file_uploader("Upload your CSV, Parquet or Feather file", type=UPLOAD_TYPES), "upload")
+
+# Processing modules (pandas, pyarrow) load once the uploader is on screen
+from core.cache import cached_call, content_hash, read_table_cached
+from core.streaming import DEFAULT_CHUNKSIZE, iter_frame_batches, read_head, spooled_writer
+from core.tableio import iter_table_chunks
+from core.tokenizer import tokenize_frame
 
 if uploaded_file:
-    df = pd.read_csv(uploaded_file)
+    stream = st.toggle("Streaming mode (read and write large files in chunks)", value=False)
+    with prof.stage("read head" if stream else "read") as rec:
+        df = cached_call(content_hash(uploaded_file), read_head, uploaded_file) if stream \
+            else read_table_cached(uploaded_file)
+        rec["rows"] = len(df)
     cols = df.columns.tolist()
 
     # Column selection
@@ -30,43 +42,31 @@ if uploaded_file:
     context_col = st.selectbox('Select Text column:', cols)
     speaker_col = st.selectbox('Select Speaker column (optional):', [None] + cols)
 
-    # Tokenizer function
-    def tokenize(text):
-        text = str(text).strip()
-        tags = re.findall(r'#\w+', text)
-        clean = re.sub(r'#\w+', '', text)
-        parts = re.split(r'(?<=[.!?])\s+(?=[A-Z])', clean)
-        parts = [p.strip() for p in parts if p.strip()]
-        if tags:
-            parts.append(' '.join(tags))
-        return parts
+    params = dict(id_col=id_col, text_col=context_col, speaker_col=speaker_col, rules="basic")
+    live_preview(df, tokenize_frame, from_head=stream, input_hash=(content_hash(uploaded_file), stream), **params)
 
-    if st.button("Run"):
-        data = []
-        for _, row in df.iterrows():
-            sentences = tokenize(row[context_col])
-            for i, s in enumerate(sentences, 1):
-                entry = {
-                    'ID': row[id_col],
-                    'Sentence ID': i,
-                    'Context': row[context_col],
-                    'Statement': s
-                }
-                if speaker_col:
-                    entry['Speaker'] = row[speaker_col]
-                data.append(entry)
+    download_format, download_level = download_format_picker()
 
-        result = pd.DataFrame(data)
+    if st.button("Run"):
+        if stream:
+            # rows are tokenized one by one, so chunks need not hold whole IDs
+            chunks = prof.iterate("read", iter_table_chunks(uploaded_file, DEFAULT_CHUNKSIZE, stable_types=True))
+            batches = prof.iterate("tokenize", (tokenize_frame(chunk, **params) for chunk in chunks))
+        else:
+            with prof.stage("tokenize") as rec:
+                tokens = cached_call(content_hash(uploaded_file), tokenize_frame, df, **params)
+                rec["rows"] = len(tokens)
+            batches = iter_frame_batches(tokens)
+        with prof.stage("write") as rec:
+            result = spooled_writer(download_format, preview_rows=10, level=download_level).write_all(batches)
+            rec["rows"] = result.rows
 
         # Show preview
         st.subheader("Preview")
-        st.dataframe(result.head(10))
+        st.dataframe(result.preview)
+
+        # Download processed file
+        download_result(f"Download {download_format}", result, 'sentence_tokenized')
 
-        # Download processed CSV
-        csv = result.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="Download CSV",
-            data=csv,
-            file_name='sentence_tokenized.csv',
-            mime='text/csv'
-        )
+show_performance(prof)
+show_cache_stats()
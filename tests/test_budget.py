@@ -0,0 +1,98 @@
+# tests/test_budget.py
+"""Budgeted context starts against a brute-force search for the earliest start that fits."""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.budget import budget_starts
+from core.preprocess import select_builder
+from core.rolling import rolling_context
+
+from conftest import random_table
+
+
+def size(items: list[str], unit: str) -> int:
+    text = " ".join(items)
+    return len(text) if unit == "chars" else len(text.split())
+
+
+def earliest_fit(items: list[str], group_start: int, end: int, budget: int, unit: str, min_items: int) -> int:
+    """Try every start from the group's first item on; keep `min_items` items whatever they cost."""
+    start = next(s for s in range(group_start, end + 1) if size(items[s:end], unit) <= max(budget, 0))
+    return max(group_start, min(start, end - min_items))
+
+
+def random_items(rng: random.Random, n: int) -> list[str]:
+    words = ["a", "bb", "ccc", "dddd", "a-long-word", "x" * 30]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(0, 4))) for _ in range(n)]
+
+
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("unit", ["chars", "tokens"])
+def test_budget_starts_match_brute_force(seed, unit):
+    rng = random.Random(seed)
+    items = random_items(rng, 60)
+    # windows of consecutive groups, each ending anywhere in its group
+    group_start, end = [], []
+    first = 0
+    while first < len(items):
+        last = min(len(items), first + rng.randint(1, 15))
+        for e in range(first, last + 1):
+            group_start.append(first)
+            end.append(e)
+        first = last
+    group_start, end = np.array(group_start), np.array(end)
+    min_items = np.array([rng.choice([0, 1]) if e > g else 0 for g, e in zip(group_start, end)])
+
+    for budget in (-1, 0, 1, 3, 10, 40, 1000):
+        for m in (0, 1, min_items):
+            starts = budget_starts(items, group_start, end, budget, unit, min_items=m)
+            per_window = np.broadcast_to(m, end.shape)
+            expected = [earliest_fit(items, g, e, budget, unit, k)
+                        for g, e, k in zip(group_start.tolist(), end.tolist(), per_window.tolist())]
+            assert starts.tolist() == expected
+
+
+@pytest.mark.parametrize("unit", ["chars", "tokens"])
+def test_statement_alone_over_budget_is_kept(unit):
+    items = ["short", "a statement far longer than the budget", "ok"]
+    starts = budget_starts(items, np.zeros(3, dtype=np.int64), np.array([1, 2, 3]), 4, unit, min_items=1)
+    assert starts.tolist() == [0, 1, 2]  # each window keeps its own statement, and only that
+    assert budget_starts(items, np.zeros(1, dtype=np.int64), np.array([2]), 4, unit).tolist() == [2]
+
+
+@pytest.mark.parametrize("cut", ["sentence", "turn"])
+def test_builder_keeps_a_statement_over_budget(cut):
+    df = pd.DataFrame({"ID": [1, 1, 1], "Turn": [1, 2, 3], "Speaker": ["A", "B", "A"],
+                       "Text": ["Hello there friend.", "A very long statement that alone exceeds.", "Ok."]})
+    builder, params = select_builder("chat", cut, "ID", "Text", turn_col="Turn", speaker_col="Speaker",
+                                     rolling_N=3, context_budget=10, lazy=False)
+    result = builder(df, **params)
+    assert result["Context"].tolist() == result["Statement"].tolist()
+
+
+# -----------------------
+# Rolling contexts under a budget
+# -----------------------
+def budgeted_reference(df: pd.DataFrame, window_size: int, budget: int, unit: str) -> list[str]:
+    """The previous `window_size` texts of the conversation, dropping the oldest while over budget."""
+    contexts = []
+    ordered = df.dropna(subset=["ID"]).sort_values("ID", kind="stable")
+    for _, conv in ordered.groupby("ID", sort=False):
+        texts = [str(v) for v in conv["Text"].tolist()]
+        for i in range(len(texts)):
+            window = texts[max(0, i - window_size):i]
+            while window and size(window, unit) > budget:
+                window = window[1:]
+            contexts.append(" ".join(window))
+    return contexts
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("unit,budget", [("chars", 0), ("chars", 12), ("chars", 60), ("tokens", 1), ("tokens", 7)])
+def test_rolling_context_budget_matches_reference(seed, unit, budget):
+    df = random_table(seed)
+    result = rolling_context(df, "ID", "Text", 5, context_budget=budget, budget_unit=unit)
+    assert result["Context"].tolist() == budgeted_reference(df, 5, budget, unit)
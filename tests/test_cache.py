@@ -0,0 +1,124 @@
+# tests/test_cache.py
+"""The result cache's and the text memo's bounds, and size estimates of shared objects."""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from core.cache import LRUCache, TextMemo, estimate_size, make_key
+from core.preprocess import LazyContextFrame
+
+
+# -----------------------
+# LRUCache
+# -----------------------
+def test_lru_evicts_least_recently_used_by_entries():
+    cache = LRUCache(max_entries=3, max_bytes=10**9)
+    for key in "abc":
+        cache.put(key, key, size=1)
+    assert cache.get("a") == "a"  # a is now the most recently used
+    cache.put("d", "d", size=1)
+    assert "b" not in cache and all(k in cache for k in "acd")
+    assert cache.stats()["evictions"] == 1 and cache.bytes == 3
+
+
+def test_lru_evicts_by_bytes():
+    cache = LRUCache(max_entries=100, max_bytes=100)
+    cache.put("a", "a", size=40)
+    cache.put("b", "b", size=40)
+    cache.put("c", "c", size=40)  # over budget: a goes
+    assert "a" not in cache and len(cache) == 2 and cache.bytes == 80
+    cache.put("b", "b", size=90)  # a replaced entry's old size is released first
+    assert list(cache._data) == ["b"] and cache.bytes == 90
+
+
+def test_lru_skips_values_larger_than_the_budget():
+    cache = LRUCache(max_entries=10, max_bytes=100)
+    cache.put("small", "small", size=10)
+    cache.put("big", "big", size=101)
+    assert "big" not in cache and "small" in cache and cache.bytes == 10
+    cache.put("small", "now too big", size=200)  # replacing with an oversized value drops the entry
+    assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_get_or_compute_counts_hits_and_misses():
+    cache, calls = LRUCache(), []
+    for _ in range(3):
+        assert cache.get_or_compute(make_key("f", 1, b=[1, 2]), lambda: calls.append(1) or "value") == "value"
+    assert len(calls) == 1 and (cache.hits, cache.misses) == (2, 1)
+
+
+# -----------------------
+# Size estimates
+# -----------------------
+def test_estimate_size_counts_shared_objects_once():
+    shared = ["a sentence.", "another one."] * 50
+    one = estimate_size([shared])
+    assert estimate_size([shared] * 10) == one + 9 * 8  # nine more pointers to the same list
+    copies = [list(shared) for _ in range(10)]
+    assert estimate_size(copies) > 5 * one
+    assert estimate_size({"x": shared, "y": shared}) < 2 * estimate_size(shared)
+    assert estimate_size(np.zeros(100)) == 800
+    assert estimate_size(pd.DataFrame({"x": np.zeros(10)})) > 80
+
+
+def test_pool_bytes_count_shared_statements_once():
+    text = "A statement repeated by every template reply." * 10
+    shared = LazyContextFrame(pd.DataFrame({"x": range(100)}), [text] * 100, np.zeros(100), np.ones(100))
+    distinct = LazyContextFrame(pd.DataFrame({"x": range(100)}), [text[:-1] + str(i % 10) for i in range(100)],
+                                np.zeros(100), np.ones(100))
+    assert distinct.nbytes - shared.nbytes >= 99 * sys.getsizeof(text) * 0.9
+
+
+# -----------------------
+# TextMemo
+# -----------------------
+def upper(calls: list):
+    def compute(texts):
+        calls.append(list(texts))
+        return [t.upper() if isinstance(t, str) else t for t in texts]
+    return compute
+
+
+def test_memo_computes_each_distinct_text_once():
+    memo, calls = TextMemo(), []
+    assert memo.map("upper", ["a", "b", "a"], upper(calls)) == ["A", "B", "A"]
+    assert memo.map("upper", ["b", "c"], upper(calls)) == ["B", "C"]
+    assert calls == [["a", "b"], ["c"]]
+    assert memo.map("other", ["a"], upper(calls)) == ["A"] and calls[-1] == ["a"]  # namespaces are apart
+    assert (memo.hits, memo.misses) == (2, 4)
+
+
+def test_memo_passes_non_str_through_without_storing():
+    memo, calls = TextMemo(), []
+    texts = ["a", None, np.nan, 3]
+    for _ in range(2):
+        result = memo.map("upper", texts, upper(calls))
+        assert result[0] == "A" and result[1] is None and np.isnan(result[2]) and result[3] == 3
+    assert calls == [["a", None, np.nan, 3], [None, np.nan, 3]]
+    assert len(memo) == 1
+
+
+def test_memo_char_budget():
+    memo = TextMemo(max_entries=100, max_chars=20)
+    memo.map("upper", ["aaaa", "bbbb"], upper([]))  # 8 characters each: text plus result
+    assert memo.chars == 16
+    memo.map("upper", ["cccc"], upper([]))
+    assert len(memo) == 2 and memo.chars == 16 and memo.evictions == 1
+    calls = []
+    memo.map("upper", ["bbbb", "cccc", "aaaa"], upper(calls))
+    assert calls == [["aaaa"]]  # the oldest entry went first
+    memo.map("upper", ["x" * 11], upper([]))  # 22 characters: larger than the whole budget, never stored
+    assert len(memo) == 2 and memo.chars <= 20
+
+
+def test_memo_counts_list_results_by_their_strings():
+    memo = TextMemo(max_entries=10, max_chars=1_000)
+    memo.map("split", ["a b c"], lambda texts: [t.split() for t in texts])
+    assert memo.chars == 5 + 3
+
+
+def test_memo_entry_limit():
+    memo = TextMemo(max_entries=3, max_chars=10**6)
+    memo.map("upper", list("abcde"), upper([]))
+    assert len(memo) == 3 and memo.evictions == 2
@@ -0,0 +1,78 @@
+# tests/test_cli.py
+"""python -m core.cli against the Configurator page's download for the same options."""
+import hashlib
+
+import pytest
+
+from core.cache import LRUCache
+from core.cli import main
+from core.pipeline import build_staged, sweep_staged
+from core.preprocess import select_builder
+from core.streaming import iter_frame_batches, spooled_writer
+from core.tableio import read_table
+
+# the page's options; chat cases use the turn and speaker columns, posts neither
+CASES = [
+    dict(data_type="chat", statement_cut="sentence", rolling_N=3),
+    dict(data_type="chat", statement_cut="turn", whole_context=True),
+    dict(data_type="chat", statement_cut="sentence", rolling_N=0, combine_hashtags=False),
+    dict(data_type="chat", statement_cut="turn", rolling_N=5, context_budget=40),
+    dict(data_type="chat", statement_cut="sentence", windows=[1, 2, 3, 4], layout="wide"),
+    dict(data_type="chat", statement_cut="turn", windows=[1, 3], layout="long", context_budget=6, budget_unit="tokens"),
+    dict(data_type="post", statement_cut="sentence", keep_hashtags=False),
+    dict(data_type="post", statement_cut="turn", combine_hashtags=False, whole_context=True),
+    dict(data_type="post", statement_cut="sentence", rolling_N=4, context_budget=8, budget_unit="tokens"),
+]
+
+# shared across tests so later cases build from the stages cached by earlier ones, as on the page
+PAGE_CACHE = LRUCache()
+
+
+def page_download(path, options: dict) -> bytes:
+    """The bytes the Configurator's CSV download holds (non-streaming, foreground build)."""
+    df = read_table(path)
+    with open(path, "rb") as f:
+        input_hash = hashlib.sha256(f.read()).hexdigest()
+    chat = options["data_type"] == "chat"
+    builder, params = select_builder(
+        options["data_type"], options["statement_cut"], "ID", "Text",
+        turn_col="Turn" if chat else None, speaker_col="Speaker" if chat else None,
+        rolling_N=options.get("rolling_N", 2), whole_context=options.get("whole_context", False),
+        keep_hashtags=options.get("keep_hashtags", True), combine_hashtags=options.get("combine_hashtags", True),
+        context_budget=options.get("context_budget"), budget_unit=options.get("budget_unit", "chars")
+    )
+    if "windows" in options:
+        res = sweep_staged(df, input_hash, builder, params, options["windows"], options["layout"], cache=PAGE_CACHE)
+    else:
+        res = build_staged(df, input_hash, builder, params, cache=PAGE_CACHE)
+    return spooled_writer("CSV", preview_rows=50).write_all(iter_frame_batches(res)).reader().read()
+
+
+def cli_args(options: dict) -> list[str]:
+    args = ["--id-col", "ID", "--text-col", "Text",
+            "--data-type", options["data_type"], "--statement-cut", options["statement_cut"]]
+    if options["data_type"] == "chat":
+        args += ["--turn-col", "Turn", "--speaker-col", "Speaker"]
+    if options.get("whole_context"):
+        args += ["--context-cut", "whole"]
+    if "rolling_N" in options:
+        args += ["--rolling-n", str(options["rolling_N"])]
+    if "windows" in options:
+        args += ["--windows", ",".join(map(str, options["windows"])), "--sweep-layout", options["layout"]]
+    if "context_budget" in options:
+        args += ["--context-budget", str(options["context_budget"]),
+                 "--budget-unit", options.get("budget_unit", "chars")]
+    if not options.get("keep_hashtags", True):
+        args.append("--no-hashtags")
+    if not options.get("combine_hashtags", True):
+        args.append("--separate-hashtags")
+    return args
+
+
+@pytest.mark.parametrize("options", CASES)
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cli_matches_page_download(table_csv, tmp_path, options, workers):
+    out = tmp_path / "out.csv"
+    # small shards: every table is split across several of them
+    assert main([table_csv, "-o", str(out), "--workers", str(workers), "--shard-rows", "60", *cli_args(options)]) == 0
+    assert out.read_bytes() == page_download(table_csv, options)
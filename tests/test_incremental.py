@@ -0,0 +1,143 @@
+# tests/test_incremental.py
+"""Incremental builds against full rebuilds, and store cleanup."""
+import os
+
+import pandas as pd
+import pytest
+
+from core.incremental import build_incremental, fingerprint_ids, id_keys, prune_stores
+from core.preprocess import select_builder
+
+from conftest import random_table
+
+INPUT_COLS = ["ID", "Text", "Turn", "Speaker"]
+
+
+@pytest.fixture
+def chat_builder():
+    return select_builder("chat", "sentence", "ID", "Text", turn_col="Turn", speaker_col="Speaker", rolling_N=2)
+
+
+def full_csv(df: pd.DataFrame, builder, params: dict) -> str:
+    return builder(df, **dict(params, lazy=False)).to_csv(index=False)
+
+
+def test_append_and_edit_match_full_rebuild(tmp_path, chat_builder):
+    builder, params = chat_builder
+    store = str(tmp_path / "store")
+    table = random_table(11, n_rows=600, n_ids=60)
+
+    first = table.iloc[:400]
+    result, report = build_incremental(first, builder, params, store, INPUT_COLS)
+    assert report["full_rebuild"] == "new store"
+    assert result.to_csv(index=False) == full_csv(first, builder, params)
+
+    # the next export: more rows (new IDs and more turns of old ones), one edited text, one ID gone
+    second = table.copy()
+    edited = second["ID"].dropna().iloc[0]
+    second.loc[second.index[second["ID"] == edited][0], "Text"] = "Edited turn. #new"
+    gone = second["ID"].dropna().iloc[-1]
+    second = second[second["ID"] != gone]
+    result, report = build_incremental(second, builder, params, store, INPUT_COLS)
+    assert report["full_rebuild"] is None
+    assert report["unchanged"] > 0 and report["changed"] > 0 and report["removed"] >= 0
+    assert result.to_csv(index=False) == full_csv(second, builder, params)
+
+    # unchanged input: everything is reused
+    result, report = build_incremental(second, builder, params, store, INPUT_COLS)
+    assert report["rebuilt_rows"] == 0 and report["changed"] == report["added"] == 0
+    assert result.to_csv(index=False) == full_csv(second, builder, params)
+
+
+def test_changed_options_rebuild_in_full(tmp_path, chat_builder):
+    builder, params = chat_builder
+    store = str(tmp_path / "store")
+    table = random_table(12)
+    build_incremental(table, builder, params, store, INPUT_COLS)
+    params = dict(params, rolling_N=5)
+    result, report = build_incremental(table, builder, params, store, INPUT_COLS)
+    assert report["full_rebuild"] == "options changed"
+    assert result.to_csv(index=False) == full_csv(table, builder, params)
+
+
+def test_column_type_change_falls_back_to_full_rebuild(tmp_path, chat_builder):
+    builder, params = chat_builder
+    store = str(tmp_path / "store")
+    table = random_table(13)
+    table["ID"] = table["ID"].astype(object)
+    build_incremental(table, builder, params, store, INPUT_COLS)
+
+    # a new ID that is a number: the rebuilt part's ID column is integer, the stored one text
+    extra = pd.DataFrame({"ID": pd.Series([5, 5], dtype=object), "Turn": [1, 2], "Speaker": ["A", "B"],
+                          "Text": ["Hello there.", "Hi!"]})
+    grown = pd.concat([table, extra], ignore_index=True)
+    result, report = build_incremental(grown, builder, params, store, INPUT_COLS)
+    assert report["full_rebuild"] == "column types changed"
+    assert result.to_csv(index=False) == full_csv(grown, builder, params)
+
+    # the store holds the full build: the next run reuses it
+    result, report = build_incremental(grown, builder, params, store, INPUT_COLS)
+    assert report["full_rebuild"] is None and report["rebuilt_rows"] == 0
+    assert result.to_csv(index=False) == full_csv(grown, builder, params)
+
+
+def test_ids_are_keyed_by_raw_value(tmp_path, chat_builder):
+    builder, params = chat_builder
+    store = str(tmp_path / "store")
+    table = pd.DataFrame({"ID": [" 1", "1", " 1", "1"], "Turn": [1, 1, 2, 2], "Speaker": ["A", "A", "B", "B"],
+                          "Text": ["One.", "Two.", "Three.", "Four."]})
+    assert fingerprint_ids(table, "ID", INPUT_COLS)["rows"].tolist() == [2, 2]
+    build_incremental(table, builder, params, store, INPUT_COLS)
+
+    table.loc[3, "Text"] = "Four, edited."
+    result, report = build_incremental(table, builder, params, store, INPUT_COLS)
+    assert (report["changed"], report["unchanged"]) == (1, 1)
+    assert result.to_csv(index=False) == full_csv(table, builder, params)
+
+
+def test_id_keys_keep_values_apart():
+    keys = id_keys(pd.Series([1, "1", " 1", None, 1], dtype=object))
+    assert keys[0] == keys[4]
+    assert len({keys[0], keys[1], keys[2]}) == 3
+    assert keys[3] is None
+    categorical = pd.Series(pd.Categorical(["b", "a", "b"]))
+    assert id_keys(categorical).tolist() == id_keys(pd.Series(["b", "a", "b"])).tolist()
+
+
+# -----------------------
+# Store cleanup
+# -----------------------
+def make_store(root, name: str, size: int, used: float) -> str:
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    with open(os.path.join(path, "output.parquet"), "wb") as fh:
+        fh.write(b"x" * size)
+    for f in os.scandir(path):
+        os.utime(f.path, (used, used))
+    os.utime(path, (used, used))
+    return os.path.realpath(path)
+
+
+def test_prune_stores_expires_old_stores(tmp_path):
+    now = 1_000_000.0
+    old = make_store(tmp_path, "old", 10, now - 100)
+    fresh = make_store(tmp_path, "fresh", 10, now - 10)
+    assert prune_stores(root=str(tmp_path), limit_bytes=1_000, max_age=50, now=now) == [old]
+    assert not os.path.exists(old) and os.path.exists(fresh)
+
+
+def test_prune_stores_caps_total_size(tmp_path):
+    now = 1_000_000.0
+    a = make_store(tmp_path, "a", 400, now - 30)
+    b = make_store(tmp_path, "b", 400, now - 20)
+    c = make_store(tmp_path, "c", 400, now - 10)
+    kept = make_store(tmp_path, "kept", 400, now - 40)  # the store just built, though its files are older
+    removed = prune_stores(keep=kept, root=str(tmp_path), limit_bytes=1_000, max_age=1e9, now=now)
+    assert removed == [a, b]
+    assert os.path.exists(c) and os.path.exists(kept)
+
+
+def test_prune_stores_drops_a_store_over_the_limit_alone(tmp_path):
+    kept = make_store(tmp_path, "big", 2_000, 100.0)
+    assert prune_stores(keep=kept, root=str(tmp_path), limit_bytes=1_000, max_age=1e9, now=200.0) == [kept]
+    assert prune_stores(root=str(tmp_path / "missing")) == []
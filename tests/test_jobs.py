@@ -0,0 +1,125 @@
+# tests/test_jobs.py
+"""The job manager: per-owner limits, cancellation, expiry, and the handles tasks own."""
+import io
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from core.jobs import JobLimitError, JobManager, batches_task, chunked_build_task, private_copy
+from core.streaming import spooled_writer
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def wait_for(job, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while job.active:
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+    return job
+
+
+def blocking_task(release: threading.Event):
+    """A task that runs until `release` is set, checking for cancellation meanwhile."""
+    def task(job):
+        while not release.wait(0.01):
+            job.check_cancelled()
+        return "result"
+    return task
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=1, max_active_per_owner=1, ttl_s=60, clock=FakeClock())
+    yield manager
+    manager._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def test_active_job_limit_per_owner(manager):
+    release = threading.Event()
+    first = manager.submit("alice", "page", "first", blocking_task(release))
+    with pytest.raises(JobLimitError, match="1 job"):
+        manager.submit("alice", "page", "second", blocking_task(release))
+    other = manager.submit("bob", "page", "other", blocking_task(release))  # queued behind alice's job
+    release.set()
+    assert wait_for(first).status == "done" and first.result == "result"
+    assert wait_for(other).status == "done"
+    # finished jobs no longer count
+    assert wait_for(manager.submit("alice", "page", "third", lambda job: 3)).result == 3
+    assert [j.label for j in manager.jobs("alice")] == ["third", "first"]
+
+
+def test_cancel_running_and_queued_jobs(manager):
+    release, ran = threading.Event(), []
+    running = manager.submit("alice", "page", "running", blocking_task(release))
+    queued = manager.submit("bob", "page", "queued", lambda job: ran.append(job))
+    while running.status != "running":
+        time.sleep(0.01)
+    queued.cancel()
+    running.cancel()
+    assert wait_for(running).status == "cancelled" and running.result is None
+    assert wait_for(queued).status == "cancelled" and ran == []
+    assert manager.stats()["cancelled"] == 2
+
+
+def test_failed_job_keeps_its_error(manager):
+    def task(job):
+        raise ValueError("bad column")
+    job = wait_for(manager.submit("alice", "page", "fails", task))
+    assert job.status == "failed" and job.error == "ValueError: bad column"
+
+
+def test_finished_jobs_expire_after_ttl(manager):
+    clock = manager._clock
+    old = wait_for(manager.submit("alice", "page", "old", lambda job: 1))
+    assert old.finished == clock.now
+    clock.now += 30
+    wait_for(manager.submit("alice", "page", "newer", lambda job: 2))
+    clock.now += 31  # the first job is now past the TTL, the second not
+    wait_for(manager.submit("bob", "page", "trigger", lambda job: 3))
+    assert [j.label for j in manager.jobs("alice")] == ["newer"]
+    clock.now += 61
+    manager.submit("bob", "page", "trigger again", lambda job: 4)
+    assert manager.jobs("alice") == []
+
+
+# -----------------------
+# Handles owned by tasks
+# -----------------------
+def frame_batches(n: int):
+    for i in range(n):
+        yield pd.DataFrame({"x": [i]})
+
+
+def test_task_closes_its_sources(manager, tmp_path):
+    path = tmp_path / "upload.csv"
+    path.write_text("ID,Text\n1,Hi.\n")
+    source = private_copy(path)
+    job = wait_for(manager.submit("alice", "page", "ok", batches_task(frame_batches(3), spooled_writer("CSV"),
+                                                                     sources=[source])))
+    assert job.status == "done" and job.result.rows == 3 and source.closed
+
+    source = private_copy(io.BytesIO(b"data"))
+    failing = chunked_build_task([pd.DataFrame({"x": [1]})], lambda chunk: 1 / 0, {}, spooled_writer("CSV"),
+                                 sources=[source])
+    assert wait_for(manager.submit("alice", "page", "fails", failing)).status == "failed" and source.closed
+
+
+def test_job_cancelled_while_queued_closes_its_sources(manager):
+    release = threading.Event()
+    running = manager.submit("alice", "page", "running", blocking_task(release))
+    source = private_copy(io.BytesIO(b"data"))
+    queued = manager.submit("bob", "page", "queued", batches_task(frame_batches(2), spooled_writer("CSV"),
+                                                                 sources=[source]))
+    queued.cancel()
+    release.set()
+    wait_for(running)
+    assert wait_for(queued).status == "cancelled" and source.closed
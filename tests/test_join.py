@@ -0,0 +1,88 @@
+# tests/test_join.py
+"""The join engine against pd.merge, the preflight against real joins, out-of-core against in-memory."""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.join import JOIN_TYPES, join_frames, key_counts, partitioned_join, preflight
+
+
+def random_pair(seed: int, same_name: bool, missing: bool = False) -> tuple[pd.DataFrame, pd.DataFrame, str, str]:
+    """Two frames with skewed integer keys (many-to-many on a few of them), optionally with missing keys."""
+    rng = random.Random(seed)
+    key1, key2 = ("id", "id") if same_name else ("id", "user")
+
+    def keys(n):
+        return [np.nan if missing and rng.random() < 0.1 else rng.choice([0, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
+                for _ in range(n)]
+
+    n1, n2 = rng.randint(0, 60), rng.randint(0, 60)
+    df1 = pd.DataFrame({key1: keys(n1), "a": [f"a{i}" for i in range(n1)], "shared": range(n1)})
+    df2 = pd.DataFrame({key2: keys(n2), "b": [f"b{i}" for i in range(n2)], "shared": range(n2)})
+    return df1, df2, key1, key2
+
+
+def sorted_rows(df: pd.DataFrame) -> pd.DataFrame:
+    return df.astype(str).sort_values(list(df.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("how", JOIN_TYPES)
+@pytest.mark.parametrize("same_name", [True, False])
+def test_join_frames_matches_merge(seed, how, same_name):
+    df1, df2, key1, key2 = random_pair(seed, same_name)
+    expected = pd.merge(df1, df2, left_on=key1, right_on=key2, how=how)
+    for normalize in (False, True):
+        result = join_frames(df1, df2, key1, key2, how=how, normalize=normalize)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_normalized_keys_match_across_types():
+    df1 = pd.DataFrame({"id": [1, 2, 3], "a": ["x", "y", "z"]})
+    df2 = pd.DataFrame({"id": [" 1", "2.0", "3"], "b": ["p", "q", "r"]})
+    assert join_frames(df1, df2, "id", "id", normalize=True)["a"].tolist() == ["x", "z"]
+    df2["id"] = [1.0, 2.0, 3.5]
+    assert join_frames(df1, df2, "id", "id", normalize=True)["a"].tolist() == ["x", "y"]
+
+
+@pytest.mark.parametrize("how", JOIN_TYPES)
+@pytest.mark.parametrize("normalize", [True, False])
+def test_missing_keys_never_match(how, normalize):
+    # unlike pd.merge, which pairs NaN with NaN
+    df1 = pd.DataFrame({"id": [1, np.nan, 2], "a": ["x", "y", "z"]})
+    df2 = pd.DataFrame({"id": [np.nan, 1], "b": ["p", "q"]})
+    result = join_frames(df1, df2, "id", "id", how=how, normalize=normalize)
+    both = result.dropna(subset=["a", "b"])
+    assert both["a"].tolist() == ["x"] and both["b"].tolist() == ["q"]
+    assert len(result) == {"inner": 1, "left": 3, "right": 2}[how]
+
+
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("normalize", [True, False])
+def test_preflight_counts_are_exact(seed, normalize):
+    df1, df2, key1, key2 = random_pair(seed, same_name=False, missing=True)
+    counts1, counts2 = key_counts(df1[key1], normalize), key_counts(df2[key2], normalize)
+    report = preflight(counts1, counts2, len(df1) - int(counts1.sum()), len(df2) - int(counts2.sum()))
+    for how in JOIN_TYPES:
+        assert report["rows"][how] == len(join_frames(df1, df2, key1, key2, how=how, normalize=normalize))
+    overlap = set(counts1.index) & set(counts2.index)
+    assert report["overlap_keys"] == len(overlap)
+    assert report["many_to_many_keys"] == sum(counts1[k] > 1 and counts2[k] > 1 for k in overlap)
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("how", JOIN_TYPES)
+@pytest.mark.parametrize("normalize", [True, False])
+def test_partitioned_join_matches_in_memory(tmp_path, seed, how, normalize):
+    df1, df2, key1, key2 = random_pair(seed, same_name=seed % 2 == 0, missing=True)
+    left, right = tmp_path / "left.csv", tmp_path / "right.csv"
+    df1.to_csv(left, index=False)
+    df2.to_csv(right, index=False)
+    expected = join_frames(pd.read_csv(left), pd.read_csv(right), key1, key2, how=how, normalize=normalize)
+    batches = list(partitioned_join(str(left), str(right), key1, key2, how=how, normalize=normalize,
+                                    partitions=4, chunksize=7))
+    result = pd.concat(batches, ignore_index=True) if batches else expected.iloc[:0]
+    assert list(result.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(sorted_rows(result), sorted_rows(expected))
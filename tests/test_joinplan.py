@@ -0,0 +1,153 @@
+# tests/test_joinplan.py
+"""The multi-table join plan against a pd.merge chain in the listed order."""
+import random
+
+import pandas as pd
+import pytest
+
+from core.join import key_counts
+from core.joinplan import execute_plan, output_columns, plan_joins, table_labels, validate_specs
+
+LABELS = ["a", "b", "c", "d"]
+
+
+def random_frames(rng: random.Random, n_tables: int = 4) -> list[pd.DataFrame]:
+    """Tables sharing the column names "k" and "v" (renamed in the output) plus one of their own."""
+    frames = []
+    for t in range(n_tables):
+        n = rng.randint(0, 25)
+        frames.append(pd.DataFrame({
+            "k": [rng.randint(0, 6) for _ in range(n)],
+            f"k{t}": [rng.randint(0, 6) for _ in range(n)],
+            "v": [f"{LABELS[t]}{i}" for i in range(n)],
+        }))
+    return frames
+
+
+def random_specs(rng: random.Random, n_tables: int, join_types: list[str]) -> list[dict]:
+    specs = []
+    for t in range(1, n_tables):
+        other = rng.randrange(t)
+        ends = [(other, rng.choice(["k", f"k{other}"])), (t, rng.choice(["k", f"k{t}"]))]
+        if rng.random() < 0.5:
+            ends.reverse()  # the new table on the left
+        (left, left_key), (right, right_key) = ends
+        specs.append({"left": left, "left_key": left_key, "right": right, "right_key": right_key,
+                      "how": rng.choice(join_types)})
+    return specs
+
+
+def plan(frames: list[pd.DataFrame], specs: list[dict]) -> list[dict]:
+    counts = {(t, key): key_counts(frames[t][key]) for spec in specs
+              for t, key in ((spec["left"], spec["left_key"]), (spec["right"], spec["right_key"]))}
+    return plan_joins(counts, [len(f) for f in frames], specs, LABELS[:len(frames)])
+
+
+def listed_merge(frames: list[pd.DataFrame], specs: list[dict]) -> pd.DataFrame:
+    """Join the specs in the listed order with pd.merge, the result always on the left."""
+    names = output_columns([list(f.columns) for f in frames], LABELS[:len(frames)])
+    tables = [f.rename(columns=names[t]) for t, f in enumerate(frames)]
+    result, joined = tables[specs[0]["left"]], {specs[0]["left"]}
+    for spec in specs:
+        if spec["left"] in joined:
+            (t_in, k_in), (t_new, k_new), how = ((spec["left"], spec["left_key"]),
+                                                 (spec["right"], spec["right_key"]), spec["how"])
+        else:
+            how = {"left": "right", "right": "left"}.get(spec["how"], spec["how"])
+            (t_in, k_in), (t_new, k_new) = (spec["right"], spec["right_key"]), (spec["left"], spec["left_key"])
+        result = pd.merge(result, tables[t_new], left_on=names[t_in][k_in], right_on=names[t_new][k_new], how=how)
+        joined.add(t_new)
+    return result[[c for t in range(len(frames)) for c in names[t].values()]].reset_index(drop=True)
+
+
+def sorted_rows(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(list(df.columns), na_position="first").reset_index(drop=True)
+
+
+# -----------------------
+# Tests
+# -----------------------
+def test_table_labels_are_unique():
+    assert table_labels(["x/chats.csv", "y/chats.csv", "users.parquet"]) == ["chats", "chats_2", "users"]
+
+
+@pytest.mark.parametrize("specs,message", [
+    ([{"left": 0, "right": 1}], "3 tables need 2 joins"),
+    ([{"left": 0, "right": 0}, {"left": 1, "right": 2}], "Join 1 must link two different tables"),
+    ([{"left": 0, "right": 3}, {"left": 1, "right": 2}], "Join 1 must link two different tables"),
+    ([{"left": 0, "right": 1}, {"left": 0, "right": 1}], "Join 2 must link one table joined before"),
+    ([{"left": 0, "right": 1}, {"left": 2, "right": 2}], "Join 2 must link two different tables"),
+])
+def test_validate_specs_rejects(specs, message):
+    with pytest.raises(ValueError, match=message):
+        validate_specs(3, specs)
+
+
+def test_validate_specs_accepts_any_connected_order():
+    validate_specs(4, [{"left": 2, "right": 1}, {"left": 3, "right": 2}, {"left": 1, "right": 0}])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_plan_keeps_listed_order_with_outer_joins(seed):
+    rng = random.Random(seed)
+    frames = random_frames(rng)
+    specs = random_specs(rng, len(frames), ["inner", "left", "right"])
+    specs[rng.randrange(len(specs))]["how"] = rng.choice(["left", "right"])
+    steps = plan(frames, specs)
+    assert [s["spec"] for s in steps] == list(range(len(specs)))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_plan_steps_stay_connected(seed):
+    rng = random.Random(seed)
+    frames = random_frames(rng)
+    specs = random_specs(rng, len(frames), ["inner"])
+    steps = plan(frames, specs)
+    assert sorted(s["spec"] for s in steps) == list(range(len(specs)))
+    joined = {steps[0]["left"], steps[0]["right"]}
+    for step in steps[1:]:
+        assert len({step["left"], step["right"]} & joined) == 1
+        joined |= {step["left"], step["right"]}
+    # the first step is sized exactly
+    first = steps[0]
+    assert first["estimated_rows"] == len(pd.merge(frames[first["left"]], frames[first["right"]],
+                                                   left_on=first["left_key"], right_on=first["right_key"]))
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("normalize", [True, False])
+def test_execute_plan_inner_matches_listed_merge(seed, normalize):
+    rng = random.Random(seed)
+    frames = random_frames(rng)
+    specs = random_specs(rng, len(frames), ["inner"])
+    expected = listed_merge(frames, specs)
+    result = execute_plan(frames, plan(frames, specs), LABELS, normalize=normalize)
+    assert list(result.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(sorted_rows(result), sorted_rows(expected), check_dtype=False)
+    # the rows come out by source row position, so every plan gives the same frame
+    listed_steps = [{**spec, "spec": i} for i, spec in enumerate(specs)]
+    pd.testing.assert_frame_equal(result, execute_plan(frames, listed_steps, LABELS, normalize=normalize))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_execute_plan_outer_matches_listed_merge(seed):
+    rng = random.Random(seed)
+    frames = random_frames(rng)
+    specs = random_specs(rng, len(frames), ["inner", "left", "right"])
+    specs[rng.randrange(len(specs))]["how"] = rng.choice(["left", "right"])
+    expected = listed_merge(frames, specs)
+    result = execute_plan(frames, plan(frames, specs), LABELS, normalize=False)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_execute_plan_order_does_not_depend_on_the_plan(seed):
+    rng = random.Random(seed)
+    frames = random_frames(rng)
+    specs = [{"left": 0, "left_key": "k", "right": 1, "right_key": "k", "how": "inner"},
+             {"left": 0, "left_key": "k0", "right": 2, "right_key": "k", "how": "inner"},
+             {"left": 3, "left_key": "k", "right": 1, "right_key": "k1", "how": "inner"}]
+    listed = [{**spec, "spec": i} for i, spec in enumerate(specs)]
+    reordered = [listed[i] for i in (2, 0, 1)]
+    pd.testing.assert_frame_equal(execute_plan(frames, reordered, LABELS), execute_plan(frames, listed, LABELS))
@@ -0,0 +1,83 @@
+# tests/test_keysketch.py
+"""The key sketches against exact counts, on seeded random keys."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.join import key_counts, preflight
+from core.keysketch import HLL_PRECISION, KeySketch, sketch_keys, sketch_preflight
+
+# HyperLogLog's standard error; estimates must stay within three of them
+HLL_ERROR = 1.04 / np.sqrt(2**HLL_PRECISION)
+
+
+def skewed_keys(rng: np.random.Generator, n: int, n_keys: int, offset: int = 0) -> pd.Series:
+    """Zipf-distributed keys: a few hot keys and a long tail."""
+    return pd.Series(rng.zipf(1.5, n) % n_keys + offset)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("n", [500, 20_000, 300_000])
+def test_hll_distinct_within_bound(seed, n):
+    keys = pd.Series(np.random.default_rng(seed).integers(0, 10**12, n))
+    estimate = sketch_keys(keys, chunksize=50_000).distinct()
+    assert abs(estimate / keys.nunique() - 1) <= 3 * HLL_ERROR
+
+
+def test_merged_sketches_equal_one_pass():
+    keys = skewed_keys(np.random.default_rng(1), 50_000, 5_000)
+    whole = sketch_keys(keys)
+    merged = sketch_keys(keys.iloc[:20_000]).merge(sketch_keys(keys.iloc[20_000:]))
+    assert np.array_equal(whole.registers, merged.registers)
+    assert np.allclose(whole.counts, merged.counts)
+    assert whole.sample["hash"].tolist() == merged.sample["hash"].tolist()
+    assert whole.sample["rows"].tolist() == merged.sample["rows"].tolist()
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("heavy_keys", [8, 32])
+def test_misra_gries_reports_heavy_keys(seed, heavy_keys):
+    n = 100_000
+    keys = skewed_keys(np.random.default_rng(seed), n, 5_000)
+    sketch = KeySketch(heavy_keys=heavy_keys)
+    for lo in range(0, n, 7_000):  # chunk summaries merged one by one
+        sketch.update(keys.iloc[lo:lo + 7_000])
+    exact = key_counts(keys)
+    assert set(exact[exact > n / heavy_keys].index) <= set(sketch.heavy.index)
+    assert sketch.heavy_error <= n / (heavy_keys + 1)
+    true = exact.reindex(sketch.heavy.index)
+    assert ((sketch.heavy <= true) & (true - sketch.heavy <= sketch.heavy_error)).all()
+
+
+def test_sample_counts_are_exact():
+    keys = skewed_keys(np.random.default_rng(3), 200_000, 40_000)
+    sketch = sketch_keys(keys, chunksize=30_000)
+    exact = key_counts(keys)
+    assert len(sketch.sample) == sketch.sample_size
+    assert (sketch.sample.set_index("key")["rows"] == exact.reindex(sketch.sample["key"]).to_numpy()).all()
+
+
+def uniform_pair(rng):
+    return pd.Series(rng.integers(0, 100_000, 200_000)), pd.Series(rng.integers(50_000, 150_000, 150_000))
+
+
+def skewed_pair(rng):
+    left = skewed_keys(rng, 200_000, 40_000)
+    right = skewed_keys(rng, 150_000, 40_000)
+    right = right.where(rng.random(len(right)) >= 0.3, rng.integers(40_000, 80_000, len(right)))
+    return left, right
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("make_pair", [uniform_pair, skewed_pair])
+def test_sketch_preflight_close_to_exact(seed, make_pair):
+    left, right = make_pair(np.random.default_rng(seed))
+    exact = preflight(key_counts(left), key_counts(right))
+    approx = sketch_preflight(sketch_keys(left), sketch_keys(right))
+    for how in ("inner", "left", "right"):
+        assert approx["rows"][how] == pytest.approx(exact["rows"][how], rel=0.05)
+    for name in ("left_keys", "right_keys"):
+        assert approx[name] == pytest.approx(exact[name], rel=3 * HLL_ERROR)
+    # extrapolated from the 4096-key sample
+    for name in ("overlap_keys", "many_to_many_keys"):
+        assert approx[name] == pytest.approx(exact[name], rel=0.15)
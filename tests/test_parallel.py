@@ -0,0 +1,48 @@
+# tests/test_parallel.py
+"""ID sharding and the process pool against one build over the whole frame."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.parallel import iter_csv_parallel, shard_by_id
+from core.preprocess import select_builder
+
+from conftest import random_table
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("n_shards", [1, 3, 7, 1000])
+@pytest.mark.parametrize("sort", [False, True])
+def test_shards_hold_whole_ids_in_group_order(seed, n_shards, sort):
+    df = random_table(seed)
+    shards = shard_by_id(df, "ID", n_shards, sort=sort)
+    assert 1 <= len(shards) <= n_shards
+    # each shard is the rows of its IDs in input order, and the shards cut the groupby order into runs
+    ids = [list(pd.unique(s["ID"])) for s in shards]
+    for shard, shard_ids in zip(shards, ids):
+        pd.testing.assert_frame_equal(shard, df[df["ID"].isin(shard_ids)])
+    groups = list(df.groupby("ID", sort=sort).groups)
+    assert [i for shard_ids in ids for i in sorted(shard_ids, key=groups.index)] == groups
+
+
+def test_shard_by_id_without_ids():
+    assert shard_by_id(pd.DataFrame({"ID": [np.nan, np.nan], "Text": ["a", "b"]}), "ID", 4) == []
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("lazy", [False, True])
+@pytest.mark.parametrize("data_type,statement_cut,options", [
+    ("chat", "sentence", dict(rolling_N=3)),
+    ("chat", "turn", dict(whole_context=True)),
+    ("chat", "sentence", dict(rolling_N=4, context_budget=30)),
+    ("post", "sentence", dict(rolling_N=2)),
+    ("post", "turn", dict(whole_context=True, keep_hashtags=False)),
+])
+def test_process_pool_matches_one_process(seed, lazy, data_type, statement_cut, options):
+    df = random_table(seed, n_rows=500)
+    chat = data_type == "chat"
+    builder, params = select_builder(data_type, statement_cut, "ID", "Text", turn_col="Turn" if chat else None,
+                                     speaker_col="Speaker" if chat else None, lazy=lazy, **options)
+    expected = builder(df, **dict(params, lazy=False)).to_csv(index=False).encode()
+    # lazy results are written batch by batch in the workers
+    assert b"".join(iter_csv_parallel(df, builder, params, workers=2, shard_rows=70, batch_size=25)) == expected
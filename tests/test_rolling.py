@@ -0,0 +1,68 @@
+# tests/test_rolling.py
+"""rolling_context() against the Rolling Context page's per-conversation loop."""
+import pandas as pd
+import pytest
+
+from core.rolling import rolling_context
+
+
+# -----------------------
+# Reference: pages/rolling_context_app.py before core/rolling.py
+# -----------------------
+def reference_frame(df, id_col, text_col, speaker_col, selected_speakers, window_size):
+    # stable sort: the engine keeps upload order inside a conversation, which the
+    # page's default quicksort only did for small inputs
+    df_sorted = df.sort_values(by=[id_col], kind="stable").reset_index(drop=True)
+    result_rows = []
+
+    for conv_id in df_sorted[id_col].unique():
+        conv_df = df_sorted[df_sorted[id_col] == conv_id].reset_index(drop=True)
+        for i in range(len(conv_df)):
+            current_row = conv_df.loc[i]
+
+            if speaker_col != "(None)" and current_row[speaker_col] not in selected_speakers:
+                continue
+
+            past_window = conv_df.loc[max(0, i - window_size):i - 1]
+            if speaker_col != "(None)":
+                past_window = past_window[past_window[speaker_col].isin(selected_speakers)]
+
+            # str() per value: pandas 3's astype(str) keeps NaN in string columns
+            context = " ".join(str(v) for v in past_window[text_col].tolist())
+            entry = {
+                id_col: conv_id,
+                'Statement': current_row[text_col],
+                'Context': context
+            }
+
+            if speaker_col != "(None)":
+                entry['Speaker'] = current_row[speaker_col]
+                speaker_history = " | ".join(str(v) for v in past_window[speaker_col].tolist())
+                entry['Speaker_History'] = speaker_history
+
+            result_rows.append(entry)
+
+    return pd.DataFrame(result_rows)
+
+
+# -----------------------
+# Tests
+# -----------------------
+@pytest.mark.parametrize("window_size", [0, 1, 3, 20])
+def test_rolling_context_matches_reference(table_csv, read, window_size):
+    expected = reference_frame(pd.read_csv(table_csv), "ID", "Text", "(None)", [], window_size)
+    result = rolling_context(read(table_csv), "ID", "Text", window_size)
+    assert result.to_csv(index=False) == expected.to_csv(index=False)
+
+
+@pytest.mark.parametrize("window_size", [0, 2, 20])
+@pytest.mark.parametrize("selected", [["A", "C"], ["B"], ["A", "B", "C", "Agent B"]])
+def test_rolling_context_speaker_filter(table_csv, read, window_size, selected):
+    expected = reference_frame(pd.read_csv(table_csv), "ID", "Text", "Speaker", selected, window_size)
+    result = rolling_context(read(table_csv), "ID", "Text", window_size, "Speaker", selected)
+    assert result.to_csv(index=False) == expected.to_csv(index=False)
+
+
+def test_rolling_context_no_speakers_selected(table_csv, read):
+    result = rolling_context(read(table_csv), "ID", "Text", 3, "Speaker", [])
+    assert result.empty
@@ -0,0 +1,42 @@
+# tests/test_spool.py
+"""The upload spool: one file per session and slot, under its disk quota."""
+import io
+
+import pytest
+
+from core.spool import SpooledUpload, SpoolLimitError, UploadSpool
+
+
+def upload(data: bytes, name: str = "chats.csv") -> io.BytesIO:
+    buf = io.BytesIO(data)
+    buf.name = name
+    return buf
+
+
+def test_spool_writes_each_upload_once(tmp_path):
+    spool = UploadSpool(str(tmp_path), limit_bytes=1_000)
+    first = spool.spool(upload(b"ID,Text\n1,Hi.\n"), "s1", "file")
+    assert isinstance(first, SpooledUpload) and open(first, "rb").read() == b"ID,Text\n1,Hi.\n"
+    assert spool.spool(upload(b"ID,Text\n1,Hi.\n"), "s1", "file") is first
+    changed = spool.spool(upload(b"ID,Text\n2,Bye.\n"), "s1", "file")  # a new upload in the slot replaces it
+    assert changed.path != first.path and not (tmp_path / first.path).exists()
+    assert spool.stats()["files"] == 1
+
+
+def test_spool_rejects_an_upload_over_the_quota(tmp_path):
+    spool = UploadSpool(str(tmp_path), limit_bytes=100)
+    with pytest.raises(SpoolLimitError, match="does not fit"):
+        spool.spool(upload(b"x" * 101), "s1", "file")
+    assert spool.stats() == {"files": 0, "bytes": 0, "limit_bytes": 100} and list(tmp_path.iterdir()) == []
+
+
+def test_spool_makes_room_from_other_sessions_only(tmp_path):
+    spool = UploadSpool(str(tmp_path), limit_bytes=100)
+    other = spool.spool(upload(b"a" * 60), "s1", "file")
+    mine = spool.spool(upload(b"b" * 30), "s2", "left")
+    spool.spool(upload(b"c" * 60), "s2", "right")  # s1's file goes to make room
+    assert not (tmp_path / other.path).exists() and (tmp_path / mine.path).exists()
+    with pytest.raises(SpoolLimitError):
+        spool.spool(upload(b"d" * 20), "s2", "third")  # this session's own files are never dropped
+    spool.release_session("s2")
+    assert spool.stats()["files"] == 0 and list(tmp_path.iterdir()) == []
@@ -0,0 +1,134 @@
+# tests/test_streaming.py
+"""Streaming mode: chunked reads against loading the whole file, spooled writers against pd.concat."""
+import gzip
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from core.preprocess import select_builder
+from core.streaming import DOWNLOAD_FORMATS, NonContiguousIDError, iter_id_chunks, spooled_writer
+from core.tableio import iter_table_chunks, read_table
+from core.tokenizer import tokenize_frame
+
+from conftest import random_table
+
+
+def csv_of(frames) -> str:
+    return "".join(f.to_csv(index=False, header=(i == 0)) for i, f in enumerate(frames) if len(f))
+
+
+@pytest.fixture
+def mixed_types_csv(tmp_path):
+    """Column types only a later chunk reveals: ints then floats, numbers then text."""
+    n = 50
+    df = pd.DataFrame({
+        "ID": [i // 5 for i in range(n)],
+        "score": [i if i < 30 else i + 0.5 for i in range(n)],
+        "code": [str(i) if i < 40 else f"x{i}" for i in range(n)],
+        "Text": [f"Line {i}. Next one!" for i in range(n)],
+    })
+    path = tmp_path / "mixed.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_id_chunks_keep_types_across_chunks(mixed_types_csv):
+    chunks = list(iter_id_chunks(mixed_types_csv, "ID", chunksize=10))
+    assert len(chunks) > 1
+    assert all(list(c.dtypes) == list(chunks[0].dtypes) for c in chunks)
+    assert csv_of(chunks) == pd.read_csv(mixed_types_csv).to_csv(index=False)
+
+
+def test_id_chunks_hold_whole_ids(mixed_types_csv):
+    seen = set()
+    for chunk in iter_id_chunks(mixed_types_csv, "ID", chunksize=7):
+        ids = set(chunk["ID"])
+        assert not ids & seen
+        seen |= ids
+
+
+def test_id_chunks_reject_split_ids(tmp_path):
+    path = tmp_path / "interleaved.csv"
+    pd.DataFrame({"ID": [1, 2] * 20, "Text": ["Hi."] * 40}).to_csv(path, index=False)
+    with pytest.raises(NonContiguousIDError, match="not contiguous"):
+        list(iter_id_chunks(str(path), "ID", chunksize=10))
+
+
+def test_table_chunks_keep_types_across_chunks(mixed_types_csv):
+    chunks = list(iter_table_chunks(mixed_types_csv, 10, stable_types=True))
+    assert all(list(c.dtypes) == list(chunks[0].dtypes) for c in chunks)
+    assert csv_of(chunks) == pd.read_csv(mixed_types_csv).to_csv(index=False)
+
+
+@pytest.mark.parametrize("rules", ["basic", "page"])
+def test_streamed_tokenizer_handles_interleaved_ids(table_csv, rules):
+    # the tokenizer pages stream plain row chunks: interleaved IDs are fine
+    params = dict(id_col="ID", text_col="Text", speaker_col="Speaker", rules=rules)
+    streamed = [tokenize_frame(chunk, **params) for chunk in iter_table_chunks(table_csv, 37, stable_types=True)]
+    assert csv_of(streamed) == tokenize_frame(read_table(table_csv), **params).to_csv(index=False)
+
+
+@pytest.mark.parametrize("data_type,statement_cut", [("chat", "sentence"), ("chat", "turn"), ("post", "sentence")])
+@pytest.mark.parametrize("whole_context", [False, True])
+def test_streamed_configurator_matches_full_build(tmp_path, data_type, statement_cut, whole_context):
+    path = tmp_path / "sorted.csv"
+    random_table(5, n_rows=600).sort_values("ID", kind="stable").to_csv(path, index=False)
+    chat = data_type == "chat"
+    builder, params = select_builder(data_type, statement_cut, "ID", "Text", turn_col="Turn" if chat else None,
+                                     speaker_col="Speaker" if chat else None, rolling_N=3,
+                                     whole_context=whole_context, lazy=False)
+    streamed = [builder(chunk, **params) for chunk in iter_id_chunks(str(path), "ID", chunksize=50)]
+    assert csv_of(streamed) == builder(read_table(str(path)), **params).to_csv(index=False)
+
+
+# -----------------------
+# Spooled writers
+# -----------------------
+def result_batches(seed: int) -> list[pd.DataFrame]:
+    """Output-like batches of uneven size; one holds no text at all, so its column type differs."""
+    table = random_table(seed, n_rows=300)
+    cuts = [0, 7, 100, 101, 220, 300]
+    batches = [table.iloc[a:b] for a, b in zip(cuts, cuts[1:])]
+    batches[2] = batches[2].assign(Text=np.nan)
+    return batches
+
+
+def read_back(fmt: str, data: bytes) -> pd.DataFrame | str:
+    """The file's table, or its CSV text for the CSV formats."""
+    if fmt == "CSV":
+        return data.decode("utf-8")
+    if fmt == "CSV (gzip)":
+        return gzip.decompress(data).decode("utf-8")
+    if fmt == "CSV (zstd)":
+        return pa.input_stream(pa.BufferReader(data), compression="zstd").read().decode("utf-8")
+    if fmt == "Parquet":
+        return pd.read_parquet(io.BytesIO(data))
+    return pd.read_feather(io.BytesIO(data))
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("fmt", list(DOWNLOAD_FORMATS))
+@pytest.mark.parametrize("max_memory", [64, None])  # rolled over to disk after the first write, or kept in memory
+def test_writer_round_trip(seed, fmt, max_memory):
+    batches = result_batches(seed)
+    options = {} if max_memory is None else {"max_memory": max_memory}
+    writer = DOWNLOAD_FORMATS[fmt](preview_rows=20, **options).write_all(batches)
+    expected = pd.concat(batches, ignore_index=True)
+    assert writer.rows == len(expected)
+    pd.testing.assert_frame_equal(writer.preview, expected.head(20), check_dtype=False)
+
+    result = read_back(fmt, writer.reader().read())
+    if fmt.startswith("CSV"):
+        assert result == expected.to_csv(index=False)
+    else:
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    assert writer.reader().read() == writer.reader().read()  # reading again gives the same file
+
+
+@pytest.mark.parametrize("fmt", list(DOWNLOAD_FORMATS))
+def test_writer_without_batches(fmt):
+    writer = spooled_writer(fmt).write_all([pd.DataFrame()])
+    assert writer.empty and writer.preview is None
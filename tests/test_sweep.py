@@ -0,0 +1,70 @@
+# tests/test_sweep.py
+"""Window sweeps against one single-window build per window size, in both layouts."""
+import pandas as pd
+import pytest
+
+from core.preprocess import build_sweep, select_builder
+from core.rolling import rolling_context, rolling_context_sweep
+from core.sweep import parse_windows
+
+from conftest import random_table
+
+WINDOWS = [0, 1, 2, 5, 30]
+
+
+def per_window(sweep: pd.DataFrame, windows: list[int], layout: str, columns: list[str]) -> dict[int, pd.DataFrame]:
+    """The sweep cut back into one frame per window size, with the single-window column names."""
+    if layout == "long":
+        return {n: sweep[sweep["Window"] == n].drop(columns="Window").reset_index(drop=True) for n in windows}
+    other = [c for c in sweep.columns if not any(c.startswith(f"{name}_N") for name in columns)]
+    out = {}
+    for n in windows:
+        frame = sweep[other].copy()
+        for name in columns:
+            frame[name] = sweep[f"{name}_N{n}"]
+        out[n] = frame
+    return out
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("layout", ["wide", "long"])
+@pytest.mark.parametrize("data_type,statement_cut", [("chat", "sentence"), ("chat", "turn"),
+                                                      ("post", "sentence"), ("post", "turn")])
+@pytest.mark.parametrize("budget", [None, (25, "chars"), (4, "tokens")])
+def test_builder_sweep_matches_single_windows(seed, layout, data_type, statement_cut, budget):
+    df = random_table(seed)
+    chat = data_type == "chat"
+    options = dict(context_budget=budget[0], budget_unit=budget[1]) if budget else {}
+    builder, params = select_builder(data_type, statement_cut, "ID", "Text", turn_col="Turn" if chat else None,
+                                     speaker_col="Speaker" if chat else None, lazy=False, **options)
+    sweep = build_sweep(df, builder, WINDOWS, layout, **params)
+    for n, frame in per_window(sweep, WINDOWS, layout, ["Context"]).items():
+        single = builder(df, **dict(params, rolling_N=n))
+        pd.testing.assert_frame_equal(frame[list(single.columns)], single)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("layout", ["wide", "long"])
+@pytest.mark.parametrize("speakers", [None, ["A", "Agent B"]])
+@pytest.mark.parametrize("budget", [None, (25, "chars"), (4, "tokens")])
+def test_rolling_sweep_matches_single_windows(seed, layout, speakers, budget):
+    df = random_table(seed)
+    options = dict(context_budget=budget[0], budget_unit=budget[1]) if budget else {}
+    if speakers:
+        options.update(speaker_col="Speaker", speakers=speakers)
+    sweep = rolling_context_sweep(df, "ID", "Text", WINDOWS, layout=layout, **options)
+    columns = ["Context", "Speaker_History"] if speakers else ["Context"]
+    for n, frame in per_window(sweep, WINDOWS, layout, columns).items():
+        single = rolling_context(df, "ID", "Text", n, **options)
+        assert frame[list(single.columns)].to_csv(index=False) == single.to_csv(index=False)
+
+
+def test_sweep_of_empty_input():
+    df = pd.DataFrame({"ID": [1, 2], "Text": ["", "..."]})
+    builder, params = select_builder("post", "turn", "ID", "Text", lazy=False)
+    assert build_sweep(df, builder, [1, 2], "long", **params).empty
+
+
+@pytest.mark.parametrize("text,expected", [("1-3, 5", [1, 2, 3, 5]), ("4 2 2", [2, 4]), ("0 - 2", [0, 1, 2])])
+def test_parse_windows(text, expected):
+    assert parse_windows(text) == expected
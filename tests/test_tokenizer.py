@@ -0,0 +1,84 @@
+# tests/test_tokenizer.py
+"""tokenize_frame() against the per-row iterrows loops of both tokenizer pages."""
+import re
+
+import pandas as pd
+import pytest
+
+from core.tokenizer import tokenize, tokenize_frame
+
+
+# -----------------------
+# Reference: the pages' code before core/tokenizer.py
+# -----------------------
+def tokenize_basic(text):
+    text = str(text).strip()
+    tags = re.findall(r'#\w+', text)
+    clean = re.sub(r'#\w+', '', text)
+    parts = re.split(r'(?<=[.!?])\s+(?=[A-Z])', clean)
+    parts = [p.strip() for p in parts if p.strip()]
+    if tags:
+        parts.append(' '.join(tags))
+    return parts
+
+
+def tokenize_page(text):
+    text = str(text).strip()
+    tags = re.findall(r'#\w+', text)
+    clean = re.sub(r'#\w+', '', text)
+    clean = re.sub(r'<br\s*/?>', ' [BR] ', clean, flags=re.IGNORECASE)
+    parts = re.split(r'(?<=[.!?])\s+|[,;:]|\[BR\]', clean)
+    parts = [p.strip() for p in parts if p.strip() and not re.fullmatch(r'[.?!,:;"\'\-]+', p)]
+    if tags:
+        parts.append(' '.join(tags))
+    return parts
+
+
+REFERENCE = {"basic": tokenize_basic, "page": tokenize_page}
+
+
+def reference_frame(df, id_col, context_col, speaker_col, tokenize_fn, selected_speakers=None):
+    data = []
+    for _, row in df.iterrows():
+        if selected_speakers is not None and speaker_col and row[speaker_col] not in selected_speakers:
+            continue
+        sentences = tokenize_fn(row[context_col])
+        for i, s in enumerate(sentences, 1):
+            entry = {
+                'ID': row[id_col],
+                'Sentence ID': i,
+                'Context': row[context_col],
+                'Statement': s
+            }
+            if speaker_col:
+                entry['Speaker'] = row[speaker_col]
+            data.append(entry)
+    return pd.DataFrame(data)
+
+
+# -----------------------
+# Tests
+# -----------------------
+@pytest.mark.parametrize("rules", ["basic", "page"])
+def test_tokenize_matches_reference(table_csv, rules):
+    for text in pd.read_csv(table_csv)["Text"]:
+        assert tokenize(text, rules) == REFERENCE[rules](text)
+
+
+@pytest.mark.parametrize("rules", ["basic", "page"])
+@pytest.mark.parametrize("speaker_col", [None, "Speaker"])
+def test_tokenize_frame_matches_reference(table_csv, read, rules, speaker_col):
+    expected = reference_frame(pd.read_csv(table_csv), "ID", "Text", speaker_col, REFERENCE[rules])
+    result = tokenize_frame(read(table_csv), "ID", "Text", speaker_col, rules=rules)
+    assert result.to_csv(index=False) == expected.to_csv(index=False)
+
+
+@pytest.mark.parametrize("rules", ["basic", "page"])
+@pytest.mark.parametrize("selected", [["A", "C"], ["B"], [], ["A", "B", "C", "Agent B"]])
+def test_tokenize_frame_speaker_filter(table_csv, read, rules, selected):
+    expected = reference_frame(pd.read_csv(table_csv), "ID", "Text", "Speaker", REFERENCE[rules], selected)
+    result = tokenize_frame(read(table_csv), "ID", "Text", "Speaker", rules=rules, speakers=selected)
+    if expected.empty:  # the per-row loop had no rows to take the columns from
+        assert result.empty and list(result.columns) == ["ID", "Sentence ID", "Context", "Statement", "Speaker"]
+    else:
+        assert result.to_csv(index=False) == expected.to_csv(index=False)